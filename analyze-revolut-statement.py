@@ -9,8 +9,12 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 import os
+import sys
 from collections import defaultdict
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'financial_diagnosis'))
+from bank_formats import RevolutFormat
+
 # Configuration
 OUTPUT_DIR = "financial-analysis-output/"
 EXTRACTED_FILE = f"{OUTPUT_DIR}extracted-text.txt"
@@ -47,86 +51,15 @@ else:
     money_in = 59299.56
     closing_balance = 288.22
 
-# Parse transactions
-transactions = []
-
-# Pattern for date-based transactions
+# Parse transactions with the shared Revolut line parser
 # Format: "DD Mon YYYY Description €amount Balance"
-lines = text.split('\n')
-i = 0
-current_date = None
-current_desc = None
-current_amount_out = None
-current_amount_in = None
-current_balance = None
-
-while i < len(lines):
-    line = lines[i].strip()
-    
-    # Match date pattern: "1 Jan 2025" or "26 Nov 2025"
-    date_match = re.match(r'^(\d{1,2})\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+(\d{4})', line)
-    
-    if date_match:
-        # Parse the transaction
-        day = date_match.group(1)
-        month = date_match.group(2)
-        year = date_match.group(3)
-        date_str = f"{day} {month} {year}"
-        
-        # Extract description and amounts from the rest of the line
-        rest = line[date_match.end():].strip()
-        
-        # Look for amounts (€XX.XX or €X,XXX.XX)
-        amount_pattern = r'€([\d,]+\.\d{2})'
-        amounts = re.findall(amount_pattern, rest)
-        
-        # Get description (everything before the first €)
-        desc_match = re.match(r'^(.+?)(?=€|$)', rest)
-        description = desc_match.group(1).strip() if desc_match else rest
-        
-        # Determine money in/out based on position or keywords
-        money_out_amt = 0.0
-        money_in_amt = 0.0
-        balance = 0.0
-        
-        if len(amounts) >= 2:
-            # Last is balance, second-to-last is transaction amount
-            balance = float(amounts[-1].replace(',', ''))
-            transaction_amt = float(amounts[-2].replace(',', ''))
-            
-            # Determine if money in or out based on description keywords
-            if any(word in description.lower() for word in ['transfer from', 'payment from', 'pocket withdrawal', 'from:']):
-                money_in_amt = transaction_amt
-            elif any(word in description.lower() for word in ['to pocket', 'transfer to', 'to:', 'purchase of']):
-                money_out_amt = transaction_amt
-            else:
-                # Default: if it's a merchant, it's money out
-                if 'card:' in rest.lower() or any(word in description.lower() for word in ['lidl', 'circle k', 'amazon', 'ryanair']):
-                    money_out_amt = transaction_amt
-                else:
-                    # Check next lines for "To:" which indicates money out
-                    if i + 1 < len(lines) and lines[i+1].strip().lower().startswith('to:'):
-                        money_out_amt = transaction_amt
-                    else:
-                        money_in_amt = transaction_amt
-        elif len(amounts) == 1:
-            balance = float(amounts[0].replace(',', ''))
-        
-        transactions.append({
-            'date': date_str,
-            'description': description,
-            'money_out': money_out_amt,
-            'money_in': money_in_amt,
-            'balance': balance
-        })
-    
-    i += 1
+transactions = list(RevolutFormat().iter_records(text.split('\n')))
 
 # Convert to DataFrame
 df = pd.DataFrame(transactions)
 
 if len(df) > 0:
-    df['date'] = pd.to_datetime(df['date'], format='%d %b %Y')
+    df['date'] = pd.to_datetime(df['date'])
     df = df.sort_values('date')
     print(f"✓ Parsed {len(df)} transactions")
 else:
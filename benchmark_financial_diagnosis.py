@@ -0,0 +1,537 @@
+"""
+Performance Benchmarks for Financial Diagnosis Module
+Compares the optimized code paths against the original implementations
+"""
+
+import os
+import sys
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from financial_diagnosis.categorizer import PortugueseTransactionCategorizer, CategoryCache
+from financial_diagnosis.bank_formats import RevolutFormat
+from financial_diagnosis.advanced_analytics import detect_recurring_transactions, simulate_savings_goals
+from financial_diagnosis.analytics import analyze_finances
+from financial_diagnosis.incremental import AnalysisState, AnalysisStateStore, INCREMENTAL_SECTIONS
+from financial_diagnosis.cohort_benchmarks import BenchmarkStore, cohort_for
+from financial_diagnosis.merchants import merchant_compression
+from financial_diagnosis.batch import score_households
+from financial_diagnosis.categorizer import get_categorizer
+from financial_diagnosis.diagnostic_engine import FinancialDiagnostics
+from financial_diagnosis.prepared import PreparedTransactions
+from financial_diagnosis import user_store
+from financial_diagnosis.password_hashing import PasswordHashingBusy, PasswordHashingPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+SAMPLE_DESCRIPTIONS = [
+    'COMPRA LIDL LISBOA 4411', 'Pingo Doce Porto', 'Continente Online',
+    'Farmacia Central', 'Morgadi Cafe', 'Renda Apartamento Janeiro',
+    'Propinas Universidade', 'Creche Os Pequenos', 'Transferencia poupanca',
+    'DEGIRO deposit', 'Fidelidade Seguro Auto', 'Prestacao Credito Habitacao',
+    'EDP Comercial', 'Galp Energia', 'Uber Eats Lisboa', 'Netflix.com',
+    'Zara Colombo', 'Clinica Dentaria Sorriso', 'IKEA Loures', 'IRS Pagamento',
+    'Salario Empresa XYZ', 'Stock market fees', 'MB WAY Joao Silva',
+    'Levantamento ATM', 'Card: Amazon EU', 'Via Verde Portagens',
+]
+
+
+def make_transactions(n_rows, seed=42):
+    """Build a synthetic statement with realistic description repetition"""
+    rng = np.random.default_rng(seed)
+    descriptions = np.array(SAMPLE_DESCRIPTIONS, dtype=object)
+    picks = descriptions[rng.integers(0, len(descriptions), n_rows)]
+    # Append terminal references so that not every row is an exact repeat
+    refs = rng.integers(0, 500, n_rows).astype(str)
+    picks = picks + ' REF' + refs
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n_rows), unit='D')
+    types = np.where(np.char.startswith(picks.astype(str), 'Salario'), 'income', 'expense')
+    return pd.DataFrame({
+        'date': dates,
+        'description': picks,
+        'amount': rng.gamma(2.0, 40.0, n_rows).round(2),
+        'type': types,
+        'category': 'Uncategorized',
+    })
+
+
+def timed(func, *args, **kwargs):
+    """Run func once and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def benchmark_categorization(n_rows=200_000):
+    """Combined keyword engine vs the original per-row regex walk"""
+    df = make_transactions(n_rows)
+    categorizer = PortugueseTransactionCategorizer()
+
+    def per_row(frame):
+        return frame.apply(
+            lambda row: categorizer.categorize_transaction(row['description'], row['category']),
+            axis=1
+        )
+
+    legacy, legacy_time = timed(per_row, df)
+    vectorized, vectorized_time = timed(categorizer.categorize_dataframe, df)
+
+    identical = bool((legacy == vectorized['category']).all())
+    print(f"{'✅' if identical else '❌'} Categorization of {n_rows:,} rows")
+    print(f"   Per-row path:    {legacy_time:8.3f}s")
+    print(f"   Combined engine: {vectorized_time:8.3f}s ({legacy_time / vectorized_time:.1f}x)")
+
+    cached = PortugueseTransactionCategorizer(cache=CategoryCache())
+    cached.categorize_dataframe(df)
+    _, warm_time = timed(cached.categorize_dataframe, df)
+    stats = cached.cache.stats()
+    print(f"   Warm cache:      {warm_time:8.3f}s ({legacy_time / warm_time:.1f}x, "
+          f"{stats['size']:,} entries, hit rate {stats['hit_rate']:.0%})")
+    return identical
+
+
+def make_revolut_lines(n_lines, seed=42):
+    """Build synthetic Revolut statement text lines"""
+    rng = np.random.default_rng(seed)
+    descriptions = ['Lidl', 'Transfer from Ana', 'To pocket EUR Savings', 'Circle K', 'Spotify']
+    months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
+    lines = ['Revolut Bank UAB', 'Date Description Money out Money in Balance']
+    while len(lines) < n_lines:
+        lines.append(
+            f"{rng.integers(1, 29)} {months[rng.integers(0, 6)]} 2025 "
+            f"{descriptions[rng.integers(0, 5)]} €{rng.integers(1, 900)}.{rng.integers(0, 100):02d} "
+            f"€{rng.integers(100, 5000):,}.00"
+        )
+        if rng.random() < 0.3:
+            lines.append('To: Someone')
+    return lines
+
+
+def benchmark_bank_format_parsing(n_lines=500_000):
+    """Throughput of the streaming Revolut line parser"""
+    lines = make_revolut_lines(n_lines)
+    transactions, elapsed = timed(lambda: sum(1 for _ in RevolutFormat().parse_lines(lines)))
+    ok = transactions > 0
+    print(f"{'✅' if ok else '❌'} Revolut line parser: {len(lines):,} lines, {transactions:,} transactions")
+    print(f"   Throughput:      {len(lines) / elapsed:12,.0f} lines/sec")
+    return ok
+
+
+SUBSCRIPTIONS = [
+    ('NETFLIX.COM SUBSCRIPTION', 12.99, 30),
+    ('EDP COMERCIAL FATURA', 64.20, 30),
+    ('GINASIO FITNESS HUT', 34.90, 30),
+    ('SPOTIFY PREMIUM', 10.99, 30),
+    ('VODAFONE PORTUGAL', 42.50, 30),
+    ('MERCADO SEMANAL FEIRA', 25.00, 7),
+]
+
+
+def make_statement_with_recurring(n_rows, seed=42):
+    """
+    Build a statement of two years of subscriptions plus card purchases.
+
+    Card purchases carry a unique reference, so the statement has thousands
+    of distinct descriptions, as real card statements do.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2023-01-02')
+    rows = []
+    for description, amount, every in SUBSCRIPTIONS:
+        for i in range(0, 730, every):
+            rows.append((start + pd.Timedelta(days=i), description, amount))
+    subscriptions = pd.DataFrame(rows, columns=['date', 'description', 'amount'])
+
+    n_purchases = max(0, n_rows - len(subscriptions))
+    merchants = np.array(SAMPLE_DESCRIPTIONS, dtype=object)
+    purchases = pd.DataFrame({
+        'date': start + pd.to_timedelta(rng.integers(0, 730, n_purchases), unit='D'),
+        'description': ('CARD ' + rng.integers(0, 10**9, n_purchases).astype(str) + ' '
+                        + merchants[rng.integers(0, len(merchants), n_purchases)]),
+        'amount': rng.gamma(2.0, 30.0, n_purchases).round(2),
+    })
+    df = pd.concat([subscriptions, purchases], ignore_index=True)
+    df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    df['type'] = 'expense'
+    df['category'] = 'Uncategorized'
+    return df
+
+
+def benchmark_recurring_detection(n_rows=5_000, large_rows=1_000_000):
+    """Grouped recurring detection vs the per-description substring scan"""
+    df = make_statement_with_recurring(n_rows)
+    legacy, legacy_time = timed(detect_recurring_transactions, df, method='scan')
+    grouped, grouped_time = timed(detect_recurring_transactions, df)
+
+    same = ({r['description'].lower()[:20] for r in legacy}
+            == {r['description'].lower()[:20] for r in grouped})
+    print(f"{'✅' if same else '❌'} Recurring detection on {n_rows:,} rows "
+          f"({len(grouped)} patterns)")
+    print(f"   Substring scan:  {legacy_time:8.3f}s")
+    print(f"   Grouped:         {grouped_time:8.3f}s ({legacy_time / grouped_time:.1f}x)")
+
+    compression = merchant_compression(df['description'])
+    print(f"   Merchant keys:   {compression['raw_descriptions']:,} descriptions -> "
+          f"{compression['merchant_keys']:,} keys ({compression['compression_ratio']:.0f}x)")
+
+    large = make_statement_with_recurring(large_rows)
+    _, large_time = timed(detect_recurring_transactions, large)
+    print(f"   Grouped on {large_rows:,} rows: {large_time:.3f}s")
+    return same
+
+
+def benchmark_end_to_end(n_rows=50_000):
+    """Full analyze_finances run with per-section timings"""
+    df = make_statement_with_recurring(n_rows)
+    df['date'] = df['date'].dt.strftime('%d/%m/%Y')
+    accounts = pd.DataFrame({'name': ['Main'], 'balance': [5000.0], 'type': ['cash']})
+
+    result, elapsed = timed(analyze_finances, df, accounts)
+    errors = [name for name, value in result.items() if isinstance(value, dict) and 'error' in value]
+    print(f"{'✅' if not errors else '❌'} analyze_finances on {n_rows:,} rows: {elapsed:.3f}s")
+    slowest = sorted(result['section_timings'].items(), key=lambda x: x[1], reverse=True)[:5]
+    for name, seconds in slowest:
+        print(f"   {name:<24} {seconds:8.3f}s")
+    return not errors
+
+
+def benchmark_savings_simulation(simulations=10_000, horizon_months=120):
+    """Monte Carlo savings-goal projection for several goals at once"""
+    rng = np.random.default_rng(42)
+    months = pd.period_range('2023-01', periods=24, freq='M').to_timestamp()
+    df = pd.DataFrame({
+        'date': np.concatenate([months, months + pd.Timedelta(days=5)]),
+        'amount': np.concatenate([rng.normal(3000, 150, 24), rng.normal(2500, 300, 24)]),
+        'type': ['income'] * 24 + ['expense'] * 24,
+        'description': ['Salario'] * 24 + ['Despesas'] * 24,
+    })
+    goals = [
+        {'name': 'Emergency fund', 'target': 8000},
+        {'name': 'Car', 'target': 20000, 'deadline': '2030-01-01'},
+        {'name': 'House deposit', 'target': 60000},
+    ]
+    results, elapsed = timed(simulate_savings_goals, df, 1000, goals, simulations, horizon_months, 42)
+    ok = elapsed < 1.0 and len(results) == len(goals)
+    print(f"{'✅' if ok else '❌'} {simulations:,} paths x {horizon_months} months, {len(goals)} goals: {elapsed:.3f}s")
+    for result in results:
+        print(f"   {result['name']:<16} P(success) {result['success_probability']:6.1%}  "
+              f"median {result['completion_dates']['p50']}")
+    return ok
+
+
+def benchmark_incremental_update(n_rows=50_000):
+    """Load, fold the last month into and save stored state vs. re-analyzing the full history"""
+    df = make_statement_with_recurring(n_rows).sort_values('date', kind='stable').reset_index(drop=True)
+    accounts = pd.DataFrame({'name': ['Main'], 'balance': [5000.0], 'type': ['cash']})
+    month = df['date'].dt.to_period('M')
+    history, latest = df[month < month.max()], df[month == month.max()]
+    # Both paths categorize against a warm description cache
+    get_categorizer().categorize_dataframe(df)
+
+    sections = INCREMENTAL_SECTIONS + ['recurring_transactions', 'unusual_transactions']
+    full, full_time = timed(analyze_finances, df, accounts, sections=sections)
+
+    store = AnalysisStateStore(tempfile.mkdtemp())
+    state = AnalysisState()
+    state.append(history)
+    store.save('user', state)
+
+    def update():
+        state = store.load('user')
+        state.append(latest)
+        result = state.analyze(accounts)
+        store.save('user', state)
+        return result
+
+    result, incremental_time = timed(update)
+    state_size = os.path.getsize(store._path('user'))
+
+    same = (np.isclose(full['total_expenses'], result['total_expenses'])
+            and full['recurring_transactions'] == result['recurring_transactions'])
+    ok = same and incremental_time < full_time
+    print(f"{'✅' if ok else '❌'} Monthly update of {len(latest):,} rows onto {len(history):,} rows of history")
+    print(f"   Full re-analysis: {full_time:8.3f}s")
+    print(f"   Incremental:      {incremental_time:8.3f}s ({full_time / incremental_time:.1f}x, "
+          f"state {state_size / 1024:,.0f} KiB, including load and save)")
+    return ok
+
+
+def benchmark_cohort_lookup(n_users=50_000, n_lookups=100_000):
+    """Percentile-table refresh over many users, then per-request percentile lookups"""
+    rng = np.random.default_rng(42)
+    store = BenchmarkStore(os.path.join(tempfile.mkdtemp(), 'benchmarks.db'), refresh_batch=n_users + 1,
+                           salt='benchmark')
+    ages = rng.integers(18, 80, n_users)
+    incomes = rng.gamma(2.0, 1200.0, n_users)
+    households = rng.choice(['single', 'couple', 'family', 'single_parent'], n_users)
+    cohorts = [cohort_for({'age': int(a), 'household': h}, float(i)) for a, i, h in zip(ages, incomes, households)]
+    savings_rates = rng.normal(10, 8, n_users)
+    overall_scores = rng.uniform(20, 95, n_users)
+    store.record_many(
+        (user, cohorts[user], {'savings_rate': savings_rates[user], 'overall_score': overall_scores[user]})
+        for user in range(n_users)
+    )
+
+    _, refresh_time = timed(store.refresh)
+    values = rng.normal(10, 8, n_lookups)
+    start = time.perf_counter()
+    ranks = [store.percentile(cohorts[i % n_users], 'savings_rate', v)['percentile'] for i, v in enumerate(values)]
+    lookup_time = time.perf_counter() - start
+
+    ok = all(rank is not None for rank in ranks) and abs(float(np.median(ranks)) - 50) < 5
+    print(f"{'✅' if ok else '❌'} Cohort percentiles for {n_users:,} users, {len(store.tables):,} tables")
+    print(f"   Refresh:         {refresh_time:8.3f}s")
+    print(f"   Lookups:         {n_lookups / lookup_time:12,.0f} lookups/sec")
+    return ok
+
+
+def benchmark_batch_scoring(n_users=1_000, rows_per_user=200):
+    """Score many households in one grouped pass vs. one diagnostic run per user"""
+    df = make_transactions(n_users * rows_per_user)
+    df['user_id'] = np.repeat(np.arange(n_users), rows_per_user)
+    df.loc[df['type'] == 'income', 'amount'] *= 30
+    accounts = pd.DataFrame({'user_id': np.arange(n_users), 'balance': 5000.0})
+
+    batch, batch_time = timed(score_households, df, accounts)
+
+    def per_user():
+        categorized = get_categorizer().categorize_dataframe(df)
+        return {
+            user: FinancialDiagnostics(
+                PreparedTransactions.from_frame(rows.drop(columns='user_id')),
+                accounts[accounts['user_id'] == user].drop(columns='user_id')
+            ).run_full_diagnostic()
+            for user, rows in categorized.groupby('user_id', sort=False)
+        }
+
+    loop, loop_time = timed(per_user)
+    same = all(batch[user]['overall_score'] == report['overall_score'] for user, report in loop.items())
+    print(f"{'✅' if same else '❌'} Scoring {n_users:,} households of {rows_per_user} transactions")
+    print(f"   Per-user loop:   {n_users / loop_time:12,.0f} households/sec")
+    print(f"   Batch:           {n_users / batch_time:12,.0f} households/sec ({loop_time / batch_time:.1f}x)")
+    return same
+
+
+def benchmark_user_store_concurrency(n_threads=16, ops_per_thread=1_000, n_users=1_000):
+    """Concurrent entitlement checks and writes: per-thread WAL connections vs a connection per call"""
+    emails = [f'user{i}@example.com' for i in range(n_users)]
+    directory = tempfile.mkdtemp()
+
+    def seed(conn):
+        conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL, '
+                     'password_hash TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, '
+                     'paid INTEGER DEFAULT 0, is_admin INTEGER DEFAULT 0)')
+        conn.executemany('INSERT INTO users (email, password_hash) VALUES (?, ?)', [(e, 'x') for e in emails])
+        conn.commit()
+
+    # Original access pattern: every call opens, queries and closes its own connection
+    legacy_path = os.path.join(directory, 'legacy.db')
+    with sqlite3.connect(legacy_path) as conn:
+        seed(conn)
+
+    def legacy_has_paid(email):
+        conn = sqlite3.connect(legacy_path)
+        conn.row_factory = sqlite3.Row
+        user = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+        conn.close()
+        return bool(user and user['paid'])
+
+    def legacy_mark_paid(email):
+        conn = sqlite3.connect(legacy_path)
+        conn.execute('UPDATE users SET paid = 1 WHERE email = ?', (email,))
+        conn.commit()
+        conn.close()
+
+    user_store.DB_PATH = os.path.join(directory, 'users.db')
+    seed(user_store.get_connection())
+
+    def run(has_paid, mark_paid):
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(ops_per_thread):
+                    email = emails[(offset * ops_per_thread + i) % n_users]
+                    # One write for every nine entitlement reads
+                    if i % 10 == 0:
+                        mark_paid(email)
+                    else:
+                        has_paid(email)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors, time.perf_counter() - start
+
+    # Measure database access, not the user record cache
+    ttl, user_store.user_cache.ttl = user_store.user_cache.ttl, 0
+    legacy_errors, legacy_time = run(legacy_has_paid, legacy_mark_paid)
+    pooled_errors, pooled_time = run(user_store.has_paid, user_store.mark_paid)
+    user_store.user_cache.ttl = ttl
+    user_store.close_connection()
+
+    total = n_threads * ops_per_thread
+    ok = not pooled_errors
+    print(f"{'✅' if ok else '❌'} {total:,} user store calls from {n_threads} threads (10% writes)")
+    print(f"   Connection per call: {total / legacy_time:10,.0f} calls/sec, {len(legacy_errors)} threads failed")
+    print(f"   Per-thread WAL:      {total / pooled_time:10,.0f} calls/sec, {len(pooled_errors)} threads failed "
+          f"({legacy_time / pooled_time:.1f}x)")
+    return ok
+
+
+def benchmark_user_cache(n_users=1_000, n_checks=200_000):
+    """Entitlement checks on every request: user record cache vs a query per check"""
+    rng = np.random.default_rng(42)
+    user_store.DB_PATH = os.path.join(tempfile.mkdtemp(), 'users.db')
+    user_store.init_db()
+    emails = [f'user{i}@example.com' for i in range(n_users)]
+    with user_store.transaction() as conn:
+        conn.executemany('INSERT INTO users (email, password_hash, paid) VALUES (?, ?, ?)',
+                         [(email, 'x', i % 2) for i, email in enumerate(emails)])
+    # Requests come mostly from a few active users
+    picks = [emails[i] for i in np.minimum(rng.zipf(1.5, n_checks) - 1, n_users - 1)]
+
+    def check_all():
+        return [user_store.has_paid(email) and not user_store.is_admin(email) for email in picks]
+
+    cache = user_store.user_cache
+    ttl, cache.ttl = cache.ttl, 0
+    uncached, uncached_time = timed(check_all)
+    cache.ttl = ttl
+    cache.clear()
+    cached, cached_time = timed(check_all)
+    # A cached unpaid user sees the update at once, also when another worker made it
+    user_store.mark_paid(emails[0])
+    paid_after_update = user_store.has_paid(emails[0])
+    conn = sqlite3.connect(user_store.DB_PATH)
+    with conn:
+        conn.execute('UPDATE users SET paid = 1 WHERE email = ?', (emails[2],))
+    conn.close()
+    paid_after_other_worker = user_store.has_paid(emails[2])
+    stats = user_store.user_cache_stats()
+    user_store.close_connection()
+
+    ok = cached == uncached and paid_after_update and paid_after_other_worker
+    print(f"{'✅' if ok else '❌'} {n_checks:,} gated requests (paid and admin checks) over {n_users:,} users")
+    print(f"   Query per check: {uncached_time:8.3f}s")
+    print(f"   Cached:          {cached_time:8.3f}s ({uncached_time / cached_time:.1f}x, "
+          f"hit rate {stats['hit_rate']:.1%})")
+    return ok
+
+
+def benchmark_login_burst(burst=32, workers=2, max_queue=6):
+    """Burst of simultaneous logins: inline password checks vs the bounded hashing pool"""
+    password_hash = generate_password_hash('correct horse')
+
+    def run(check):
+        latencies, rejected = [], []
+        barrier = threading.Barrier(burst)
+
+        def login():
+            barrier.wait()
+            start = time.perf_counter()
+            try:
+                assert check(password_hash, 'correct horse')
+                latencies.append(time.perf_counter() - start)
+            except PasswordHashingBusy:
+                rejected.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=login) for _ in range(burst)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(latencies), rejected
+
+    inline, _ = run(check_password_hash)
+    pool = PasswordHashingPool(workers=workers, max_queue=max_queue)
+    pooled, rejected = run(pool.check)
+
+    async def check_many():
+        return await asyncio.gather(*(pool.check_async(password_hash, 'correct horse') for _ in range(workers)))
+
+    awaited = asyncio.run(check_many())
+    stats = pool.stats()
+    pool.shutdown()
+
+    ok = len(pooled) == workers + max_queue and all(awaited) and stats['peak_in_flight'] <= workers + max_queue
+    print(f"{'✅' if ok else '❌'} Burst of {burst} logins")
+    print(f"   Inline:          {len(inline)} served, p95 latency {inline[int(0.95 * len(inline))]:.3f}s")
+    print(f"   Pool ({workers} + {max_queue} queued): {len(pooled)} served, p95 latency "
+          f"{pooled[int(0.95 * len(pooled))]:.3f}s, {len(rejected)} rejected (429) "
+          f"within {max(rejected, default=0) * 1000:.2f}ms")
+    print(f"   Hash p50 {stats['hash_ms']['p50']:.0f}ms, queue wait p95 {stats['queue_wait_ms']['p95']:.0f}ms")
+    return ok
+
+
+def main():
+    print("=" * 60)
+    print("FINANCIAL DIAGNOSIS BENCHMARKS")
+    print("=" * 60)
+    print()
+
+    results = []
+
+    print("Benchmark 1: Transaction Categorization")
+    results.append(benchmark_categorization())
+    print()
+
+    print("Benchmark 2: Bank Format Line Parsing")
+    results.append(benchmark_bank_format_parsing())
+    print()
+
+    print("Benchmark 3: Recurring Transaction Detection")
+    results.append(benchmark_recurring_detection())
+    print()
+
+    print("Benchmark 4: End-to-End Analysis")
+    results.append(benchmark_end_to_end())
+    print()
+
+    print("Benchmark 5: Savings Goal Simulation")
+    results.append(benchmark_savings_simulation())
+    print()
+
+    print("Benchmark 6: Incremental Monthly Update")
+    results.append(benchmark_incremental_update())
+    print()
+
+    print("Benchmark 7: Cohort Percentile Lookup")
+    results.append(benchmark_cohort_lookup())
+    print()
+
+    print("Benchmark 8: Batch Household Scoring")
+    results.append(benchmark_batch_scoring())
+    print()
+
+    print("Benchmark 9: Concurrent User Store Access")
+    results.append(benchmark_user_store_concurrency())
+    print()
+
+    print("Benchmark 10: User Record Cache")
+    results.append(benchmark_user_cache())
+    print()
+
+    print("Benchmark 11: Login Burst")
+    results.append(benchmark_login_burst())
+    print()
+
+    print("=" * 60)
+    passed = sum(results)
+    print(f"Passed: {passed}/{len(results)}")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
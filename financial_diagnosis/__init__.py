@@ -6,7 +6,12 @@ Provides comprehensive personal finance analysis and diagnostics
 from .analytics import analyze_finances, load_sample_data
 from .diagnostic_engine import run_diagnostics
 from .file_parsers import parse_file
-from .categorizer import PortugueseTransactionCategorizer, enhance_transaction_categorization
+from .categorizer import (
+    PortugueseTransactionCategorizer,
+    enhance_transaction_categorization,
+    get_categorizer,
+    categorizer_cache_stats
+)
 
 __all__ = [
     'analyze_finances', 
@@ -14,5 +19,7 @@ __all__ = [
     'run_diagnostics', 
     'parse_file',
     'PortugueseTransactionCategorizer',
-    'enhance_transaction_categorization'
+    'enhance_transaction_categorization',
+    'get_categorizer',
+    'categorizer_cache_stats'
 ]
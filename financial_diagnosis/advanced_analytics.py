@@ -6,22 +6,113 @@ import numpy as np
 from datetime import datetime, timedelta
 from collections import defaultdict
 import re
+from .prepared import prepare_transactions
+from .merchants import merchant_keys
 
 
-def detect_recurring_transactions(df, min_occurrences=3, tolerance_days=3):
+def _recurring_frequency(avg_interval):
+    """Label an average interval in days (monthly ~30 days, weekly ~7 days)"""
+    return 'Monthly' if 25 <= avg_interval <= 35 else \
+           'Weekly' if 5 <= avg_interval <= 9 else \
+           'Bi-weekly' if 12 <= avg_interval <= 16 else \
+           f'Every {int(avg_interval)} days'
+
+
+def _recurring_entry(description, avg_amount, occurrences, last_date, avg_interval):
+    next_due = last_date + timedelta(days=int(avg_interval))
+    return {
+        'description': description[:50],
+        'amount': float(avg_amount),
+        'frequency': _recurring_frequency(avg_interval),
+        'occurrences': int(occurrences),
+        'last_date': last_date.strftime('%Y-%m-%d'),
+        'next_due': next_due.strftime('%Y-%m-%d') if next_due > datetime.now() else 'Overdue',
+        'avg_interval_days': int(avg_interval)
+    }
+
+
+def detect_recurring_transactions(df, min_occurrences=3, tolerance_days=3, method='grouped'):
     """
     Detect recurring transactions (subscriptions, bills, etc.)
     
     Args:
-        df: Transaction DataFrame
+        df: Transaction DataFrame or PreparedTransactions
         min_occurrences: Minimum number of times to be considered recurring
         tolerance_days: Days of tolerance for matching (e.g., monthly ±3 days)
+        method: 'grouped' groups expenses by merchant key in one pass;
+            'scan' is the original per-description substring scan, which is
+            quadratic in the number of descriptions
     
     Returns:
         List of recurring transaction patterns
     """
+    expense_df = prepare_transactions(df).expenses
+    if method == 'scan':
+        return _detect_recurring_scan(expense_df, min_occurrences, tolerance_days)
+    if method != 'grouped':
+        raise ValueError(f"Unknown recurring detection method: {method}")
+    
+    descriptions = expense_df['description'].fillna('').astype(str)
+    frame = pd.DataFrame({
+        'key': merchant_keys(expense_df['description']).array,
+        'date': expense_df['date'].to_numpy(),
+        'amount': expense_df['amount'].to_numpy(),
+        'position': np.arange(len(expense_df)),
+    })
+    frame = frame[frame['key'].notna()]
+    
+    # Sort once by (key, date); consecutive rows of a key give its intervals
+    frame = frame.sort_values(['key', 'date'], kind='stable')
+    frame['interval'] = frame.groupby('key', sort=False, observed=True)['date'].diff().dt.days
+    
+    grouped = frame.groupby('key', sort=False, observed=True)
+    stats = grouped.agg(
+        occurrences=('amount', 'size'),
+        avg_amount=('amount', 'mean'),
+        first_position=('position', 'min'),
+        last_date=('date', 'max'),
+        intervals=('interval', 'count'),
+        avg_interval=('interval', 'mean'),
+    )
+    stats['std_amount'] = grouped['amount'].std(ddof=0)
+    stats['std_interval'] = grouped['interval'].std(ddof=0)
+    stats['description'] = descriptions.to_numpy()[stats['first_position'].to_numpy()]
+    return recurring_patterns(stats, min_occurrences, tolerance_days)
+
+
+def recurring_patterns(stats, min_occurrences=3, tolerance_days=3):
+    """
+    Select recurring patterns from per-merchant statistics.
+    
+    Args:
+        stats: DataFrame with one row per merchant and columns description,
+            occurrences, avg_amount, std_amount, first_position, last_date,
+            intervals, avg_interval and std_interval (population standard
+            deviations)
+    
+    Returns:
+        List of recurring transaction patterns, highest amount first
+    """
+    # Enough occurrences, less than 10% amount variation and consistent intervals
+    recurring_stats = stats[
+        (stats['occurrences'] >= min_occurrences)
+        & (stats['std_amount'] / stats['avg_amount'] < 0.1)
+        & (stats['intervals'] > 0)
+        & (stats['std_interval'] < tolerance_days)
+    ].sort_values('first_position', kind='stable')
+    
+    recurring = [
+        _recurring_entry(
+            row.description, row.avg_amount, row.occurrences, row.last_date, row.avg_interval
+        )
+        for row in recurring_stats.itertuples()
+    ]
+    return sorted(recurring, key=lambda x: x['amount'], reverse=True)
+
+
+def _detect_recurring_scan(expense_df, min_occurrences, tolerance_days):
+    """Original implementation: one substring scan per unique description"""
     recurring = []
-    expense_df = df[df['type'] == 'expense'].copy()
     
     # Group by similar amounts and descriptions
     for desc in expense_df['description'].unique():
@@ -46,22 +137,9 @@ def detect_recurring_transactions(df, min_occurrences=3, tolerance_days=3):
                     
                     # If intervals are consistent (monthly ~30 days, weekly ~7 days)
                     if std_interval < tolerance_days:
-                        frequency = 'Monthly' if 25 <= avg_interval <= 35 else \
-                                  'Weekly' if 5 <= avg_interval <= 9 else \
-                                  'Bi-weekly' if 12 <= avg_interval <= 16 else \
-                                  f'Every {int(avg_interval)} days'
-                        
-                        next_due = dates[-1] + timedelta(days=int(avg_interval))
-                        
-                        recurring.append({
-                            'description': desc[:50],
-                            'amount': avg_amount,
-                            'frequency': frequency,
-                            'occurrences': len(desc_txs),
-                            'last_date': dates[-1].strftime('%Y-%m-%d'),
-                            'next_due': next_due.strftime('%Y-%m-%d') if next_due > datetime.now() else 'Overdue',
-                            'avg_interval_days': int(avg_interval)
-                        })
+                        recurring.append(_recurring_entry(
+                            desc, avg_amount, len(desc_txs), dates[-1], avg_interval
+                        ))
     
     return sorted(recurring, key=lambda x: x['amount'], reverse=True)
 
@@ -70,14 +148,16 @@ def calculate_monthly_trends(df, num_months=6):
     """
     Calculate spending and income trends over time.
     
+    Args:
+        df: Transaction DataFrame or PreparedTransactions
+    
     Returns:
         Dictionary with monthly trends data
     """
-    df = df.copy()
-    df['month'] = df['date'].dt.to_period('M')
+    cube = prepare_transactions(df).cube
     
-    # Group by month and type
-    monthly_summary = df.groupby(['month', 'type'])['amount'].sum().unstack(fill_value=0)
+    # Monthly totals by type
+    monthly_summary = cube.sums(['month', 'type']).unstack(fill_value=0)
     
     # Get last N months
     if len(monthly_summary) > num_months:
@@ -149,30 +229,112 @@ def predict_next_month(monthly_trends):
     }
 
 
+def _fit_linear_trends(matrix):
+    """
+    Fit y = slope * x + intercept to every column of a months x series matrix.
+
+    All columns are solved by one least-squares call.
+
+    Returns:
+        (slope, intercept, r_squared) arrays, one value per column
+    """
+    num_months = matrix.shape[0]
+    design = np.column_stack([np.arange(num_months), np.ones(num_months)])
+    (slope, intercept), *_ = np.linalg.lstsq(design, matrix, rcond=None)
+    
+    fitted = design @ np.vstack([slope, intercept])
+    ss_res = ((matrix - fitted) ** 2).sum(axis=0)
+    ss_tot = ((matrix - matrix.mean(axis=0)) ** 2).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_squared = np.where(ss_tot > 0, 1 - ss_res / ss_tot, 0.0)
+    return slope, intercept, r_squared
+
+
+def predict_next_month_batch(df, by='category', num_months=6, smoothing=None, min_active_months=1):
+    """
+    Predict next month's expenses for every category or merchant at once.
+    
+    Args:
+        df: Transaction DataFrame or PreparedTransactions
+        by: 'category' or 'merchant' (normalized merchant key)
+        num_months: Number of recent months to fit
+        smoothing: Optional exponential smoothing factor in (0, 1]; the
+            monthly series are smoothed before the trend is fitted
+        min_active_months: Skip series with spending in fewer months
+    
+    Returns:
+        Dict of {category or merchant: prediction}, each in the
+        predict_next_month format plus the fitted 'slope'
+    """
+    prepared = prepare_transactions(df)
+    recent_months = prepared.cube.months[-num_months:]
+    
+    if by == 'category':
+        monthly = prepared.cube.sums(['month', 'category'], 'expense', recent_months).unstack(fill_value=0)
+    elif by == 'merchant':
+        expense_df = prepared.expenses
+        expense_df = expense_df[expense_df['month'].isin(recent_months)]
+        monthly = (
+            expense_df['amount']
+            .groupby([expense_df['month'], merchant_keys(expense_df['description'])], observed=True)
+            .sum()
+            .unstack(fill_value=0)
+        )
+    else:
+        raise ValueError(f"Unknown forecast grouping: {by}")
+    
+    # Months without spending count as zero
+    monthly = monthly.reindex(recent_months, fill_value=0)
+    monthly = monthly.loc[:, (monthly > 0).sum() >= min_active_months]
+    if monthly.shape[1] == 0:
+        return {}
+    if smoothing is not None:
+        monthly = monthly.ewm(alpha=smoothing, adjust=False).mean()
+    
+    matrix = monthly.to_numpy(dtype=float)
+    if len(matrix) < 2:
+        return {
+            key: {'predicted_expenses': float(last), 'confidence': 'Low'}
+            for key, last in zip(monthly.columns, matrix[-1])
+        }
+    
+    slope, intercept, r_squared = _fit_linear_trends(matrix)
+    predicted = np.maximum(0, slope * len(matrix) + intercept)
+    
+    return {
+        key: {
+            'predicted_expenses': float(p),
+            'trend': 'Increasing' if b > 0 else 'Decreasing',
+            'confidence': 'High' if r2 > 0.7 else 'Medium' if r2 > 0.4 else 'Low',
+            'r_squared': float(r2),
+            'slope': float(b)
+        }
+        for key, p, b, r2 in zip(monthly.columns, predicted, slope, r_squared)
+    }
+
+
 def analyze_category_trends(df, top_n=5):
     """
     Analyze spending trends by category.
+    
+    Args:
+        df: Transaction DataFrame or PreparedTransactions
     """
-    expense_df = df[df['type'] == 'expense'].copy()
-    expense_df['month'] = expense_df['date'].dt.to_period('M')
+    cube = prepare_transactions(df).cube
     
     # Get top categories
-    top_categories = (
-        expense_df.groupby('category')['amount']
-        .sum()
-        .nlargest(top_n)
-        .index.tolist()
-    )
+    category_totals = cube.sums('category', 'expense')
+    top_categories = category_totals.nlargest(top_n).index.tolist()
+    category_monthly = cube.sums(['category', 'month'], 'expense')
     
     category_trends = {}
     for cat in top_categories:
-        cat_data = expense_df[expense_df['category'] == cat]
-        monthly = cat_data.groupby('month')['amount'].sum()
+        monthly = category_monthly.loc[cat]
         
         category_trends[cat] = {
             'months': [str(m) for m in monthly.index],
             'amounts': [float(x) for x in monthly.values],
-            'total': float(cat_data['amount'].sum()),
+            'total': float(category_totals[cat]),
             'avg_monthly': float(monthly.mean())
         }
     
@@ -184,17 +346,18 @@ def calculate_budget_status(df, budgets):
     Compare spending against budgets.
     
     Args:
-        df: Transaction DataFrame
+        df: Transaction DataFrame or PreparedTransactions
         budgets: Dict of category budgets {category: amount}
     
     Returns:
         Budget status for each category
     """
-    expense_df = df[df['type'] == 'expense'].copy()
-    latest_month = expense_df['date'].max().to_period('M')
-    current_month_df = expense_df[expense_df['date'].dt.to_period('M') == latest_month]
+    monthly_spending = prepare_transactions(df).cube.sums(['month', 'category'], 'expense')
     
-    spending = current_month_df.groupby('category')['amount'].sum().to_dict()
+    spending = {}
+    if len(monthly_spending) > 0:
+        latest_month = monthly_spending.index.get_level_values('month').max()
+        spending = monthly_spending.loc[latest_month].to_dict()
     
     budget_status = []
     for category, budget in budgets.items():
@@ -216,44 +379,176 @@ def calculate_budget_status(df, budgets):
     return sorted(budget_status, key=lambda x: x['percent_used'], reverse=True)
 
 
-def detect_unusual_spending(df, threshold=2.0):
+# Scale factor making the MAD a consistent estimator of the standard deviation
+MAD_SCALE = 1.4826
+
+
+def _anomaly_scores(expense_df, method):
+    """
+    Score every expense against its category in one grouped pass.
+
+    Returns:
+        (score, typical) arrays; score is NaN for rows of categories with
+        fewer than 3 transactions or no spread
+    """
+    amount = expense_df['amount']
+    grouped = amount.groupby(expense_df['category'], observed=True)
+    count = grouped.transform('size')
+
+    if method == 'zscore':
+        typical = grouped.transform('mean')
+        scale = grouped.transform('std')
+        score = (amount - typical) / scale
+    elif method == 'mad':
+        typical = grouped.transform('median')
+        deviation = (amount - typical).abs()
+        scale = MAD_SCALE * deviation.groupby(expense_df['category'], observed=True).transform('median')
+        score = (amount - typical) / scale
+    elif method == 'iqr':
+        # Distance above the upper quartile in interquartile ranges
+        typical = grouped.transform('median')
+        upper = grouped.transform('quantile', 0.75)
+        scale = upper - grouped.transform('quantile', 0.25)
+        score = (amount - upper) / scale
+    else:
+        raise ValueError(f"Unknown anomaly method: {method}")
+
+    valid = (count >= 3) & (scale > 0)
+    return score.where(valid).to_numpy(dtype=float), typical.to_numpy(dtype=float)
+
+
+def detect_unusual_spending(df, threshold=2.0, method='zscore', top_k=10):
     """
     Detect unusual/anomalous transactions (outliers).
     
     Args:
-        threshold: Number of standard deviations to consider unusual
+        df: Transaction DataFrame or PreparedTransactions
+        threshold: Score above which a transaction is unusual
+        method: 'zscore' (standard deviations above the category mean),
+            'mad' (robust z-score around the category median) or 'iqr'
+            (interquartile ranges above the category's upper quartile)
+        top_k: Number of most unusual transactions to return
     """
-    expense_df = df[df['type'] == 'expense'].copy()
+    expense_df = prepare_transactions(df).expenses
+    score, typical = _anomaly_scores(expense_df, method)
+    
+    candidates = np.flatnonzero(score > threshold)
+    if top_k <= 0:
+        candidates = candidates[:0]
+    elif len(candidates) > top_k:
+        # Select the k highest scores without sorting every outlier
+        candidates = candidates[np.argpartition(-score[candidates], top_k - 1)[:top_k]]
+    
+    # Highest score first; ties keep category first-appearance order, then row order
+    category_codes = expense_df['category'].cat.codes.to_numpy()
+    seen_codes, first_rows = np.unique(category_codes, return_index=True)
+    category_rank = np.zeros(len(expense_df['category'].cat.categories), dtype=np.int64)
+    category_rank[seen_codes] = first_rows
+    order = np.lexsort((candidates, category_rank[category_codes[candidates]], -score[candidates]))
+    selected = candidates[order]
+    
+    rows = expense_df.iloc[selected]
+    if 'description' in rows.columns:
+        descriptions = rows['description'].fillna('Unknown').astype(str).str[:50]
+    else:
+        descriptions = pd.Series('Unknown', index=rows.index)
     
-    unusual = []
-    for category in expense_df['category'].unique():
-        cat_df = expense_df[expense_df['category'] == category]
-        
-        if len(cat_df) < 3:
-            continue
-        
-        mean_amount = cat_df['amount'].mean()
-        std_amount = cat_df['amount'].std()
+    return [
+        {
+            'date': date.strftime('%Y-%m-%d'),
+            'category': category,
+            'description': description,
+            'amount': float(amount),
+            'typical_amount': float(typical_amount),
+            'deviation': float(deviation)
+        }
+        for date, category, description, amount, typical_amount, deviation in zip(
+            rows['date'], rows['category'], descriptions, rows['amount'],
+            typical[selected], score[selected]
+        )
+    ]
+
+
+def _months_until(deadline, today):
+    deadline = pd.Timestamp(deadline)
+    return (deadline.year - today.year) * 12 + (deadline.month - today.month)
+
+
+def simulate_savings_goals(df, current_savings, goals, simulations=10_000, horizon_months=120, seed=None):
+    """
+    Monte Carlo projection of savings goals.
+    
+    Monthly savings paths are bootstrapped from the observed monthly
+    (income - expenses), drawing whole months so income and spending of a
+    month stay together. All paths are generated as one simulations x
+    months array and every goal is evaluated against it at once.
+    
+    Args:
+        df: Transaction DataFrame or PreparedTransactions with the history
+        current_savings: Current total savings
+        goals: List of goal dicts with 'name', 'target', 'deadline' (optional)
+        simulations: Number of simulated paths
+        horizon_months: Months simulated per path
+        seed: Optional random seed
+    
+    Returns:
+        One dict per goal with success_probability (by the deadline, or
+        within the horizon; only paths reaching the goal within the horizon
+        count), p10/p50/p90 completion dates (None when that
+        share of paths does not reach the goal) and success_curve, the
+        probability of having reached the goal after each month
+    """
+    cube = prepare_transactions(df).cube
+    monthly_net = cube.sums('month', 'income').sub(cube.sums('month', 'expense'), fill_value=0)
+    history = monthly_net.to_numpy(dtype=float) if len(monthly_net) > 0 else np.zeros(1)
+    
+    rng = np.random.default_rng(seed)
+    paths = history[rng.integers(0, len(history), size=(simulations, horizon_months))]
+    balances = current_savings + np.cumsum(paths, axis=1)
+    # Goals count as reached the first time the balance gets there
+    peaks = np.maximum.accumulate(balances, axis=1)
+    
+    targets = np.array([float(goal['target']) for goal in goals])
+    # Months before reaching each goal: (simulations, goals); horizon + 1 means never
+    months_to_goal = (peaks[:, :, None] < targets).sum(axis=1) + 1
+    months_to_goal[:, targets <= current_savings] = 0
+    never = horizon_months + 1
+    
+    today = pd.Timestamp.now().normalize()
+    results = []
+    for i, goal in enumerate(goals):
+        months = months_to_goal[:, i]
+        counts = np.bincount(months, minlength=never + 1)[:never]
+        success_curve = np.cumsum(counts)[1:] / simulations
         
-        if std_amount == 0:
-            continue
+        if goal.get('deadline'):
+            deadline_month = _months_until(goal['deadline'], today)
+            # Paths that never get there within the horizon fail even when
+            # the deadline lies beyond it
+            reached = (months < never) & (months <= deadline_month)
+            success = float(reached.mean()) if deadline_month >= 0 else 0.0
+        else:
+            success = float((months < never).mean())
         
-        outliers = cat_df[cat_df['amount'] > mean_amount + threshold * std_amount]
+        completion = {}
+        for label, q in (('p10', 0.1), ('p50', 0.5), ('p90', 0.9)):
+            month = int(np.quantile(months, q, method='inverted_cdf'))
+            completion[label] = (
+                (today + pd.DateOffset(months=month)).strftime('%Y-%m-%d') if month < never else None
+            )
         
-        for _, row in outliers.iterrows():
-            unusual.append({
-                'date': row['date'].strftime('%Y-%m-%d'),
-                'category': row['category'],
-                'description': row.get('description', 'Unknown')[:50],
-                'amount': float(row['amount']),
-                'typical_amount': float(mean_amount),
-                'deviation': float((row['amount'] - mean_amount) / std_amount)
-            })
+        results.append({
+            'name': goal['name'],
+            'success_probability': success,
+            'completion_dates': completion,
+            'success_curve': [float(p) for p in success_curve]
+        })
     
-    return sorted(unusual, key=lambda x: x['deviation'], reverse=True)[:10]
+    return results
 
 
-def calculate_savings_goals(current_savings, monthly_savings, goals):
+def calculate_savings_goals(current_savings, monthly_savings, goals, transactions=None,
+                            simulations=0, horizon_months=120, seed=None):
     """
     Calculate progress and time to reach savings goals.
     
@@ -261,6 +556,11 @@ def calculate_savings_goals(current_savings, monthly_savings, goals):
         current_savings: Current total savings
         monthly_savings: Average monthly savings amount
         goals: List of goal dicts with 'name', 'target', 'deadline' (optional)
+        transactions: Transaction history, required for simulations
+        simulations: When > 0, add a Monte Carlo 'simulation' entry to each
+            goal (see simulate_savings_goals)
+        horizon_months: Months simulated per path
+        seed: Optional random seed for the simulation
     """
     goal_progress = []
     
@@ -292,84 +592,107 @@ def calculate_savings_goals(current_savings, monthly_savings, goals):
             'status': status
         })
     
+    if simulations > 0:
+        if transactions is None:
+            raise ValueError('transactions are required to simulate savings goals')
+        simulated = simulate_savings_goals(
+            transactions, current_savings, goals, simulations, horizon_months, seed
+        )
+        for progress, simulation in zip(goal_progress, simulated):
+            progress['simulation'] = simulation
+    
     return goal_progress
 
 
-def analyze_spending_optimization(df, num_months=6):
+def monthly_category_pivot(df, num_months=6):
+    """
+    Month x category table of expense totals for the last num_months months.
+    
+    Months in which a category has no expenses are NaN. Columns are in order
+    of first appearance, as analyze_spending_optimization expects.
+    """
+    cube = prepare_transactions(df).cube
+    recent_months = cube.months[-num_months:]
+    
+    pivot = cube.sums(['month', 'category'], 'expense', recent_months).unstack()
+    recent_categories = cube.totals('category', 'expense', recent_months)['first'].sort_values().index
+    return pivot.reindex(index=recent_months, columns=recent_categories)
+
+
+def analyze_spending_optimization(df, num_months=6, pivot=None):
     """
     Analyze spending patterns to identify cost-cutting opportunities and savings increase strategies.
     
     Args:
-        df: Transaction DataFrame with date, amount, type, category, description
+        df: Transaction DataFrame (date, amount, type, category, description)
+            or PreparedTransactions
         num_months: Number of recent months to analyze
+        pivot: Optional precomputed monthly_category_pivot(df, num_months)
         
     Returns:
         Dictionary with month-by-month comparison and optimization recommendations
     """
-    df = df.copy()
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df = df.dropna(subset=['date'])
-    df['month'] = df['date'].dt.to_period('M')
+    cube = prepare_transactions(df).cube
     
     # Get last N months
-    recent_months = sorted(df['month'].unique())[-num_months:]
-    df_recent = df[df['month'].isin(recent_months)]
-    
-    # Monthly expense breakdown by category
-    monthly_category_spend = df_recent[df_recent['type'] == 'expense'].groupby(['month', 'category'])['amount'].sum().reset_index()
-    
-    # Calculate category averages and identify overspending
-    category_stats = []
-    for category in df_recent[df_recent['type'] == 'expense']['category'].unique():
-        cat_data = monthly_category_spend[monthly_category_spend['category'] == category]
-        
-        if len(cat_data) > 0:
-            amounts = cat_data['amount'].values
-            avg_spend = float(np.mean(amounts))
-            max_spend = float(np.max(amounts))
-            min_spend = float(np.min(amounts))
-            std_spend = float(np.std(amounts)) if len(amounts) > 1 else 0
-            
-            # Identify potential savings (difference between max and minimum)
-            potential_savings = max_spend - min_spend
-            
-            # Calculate variability (high variability = room for optimization)
-            variability = (std_spend / avg_spend * 100) if avg_spend > 0 else 0
-            
-            # Flag categories with high variability or consistently high spending
-            is_optimizable = variability > 30 or avg_spend > 200
-            
-            category_stats.append({
-                'category': category,
-                'avg_monthly': avg_spend,
-                'min_monthly': min_spend,
-                'max_monthly': max_spend,
-                'std_dev': std_spend,
-                'variability_percent': variability,
-                'potential_monthly_savings': potential_savings / len(amounts),
-                'is_optimizable': is_optimizable,
-                'months_analyzed': len(amounts)
-            })
+    recent_months = cube.months[-num_months:]
+    if pivot is None:
+        pivot = monthly_category_pivot(df, num_months)
+    
+    # Category averages and spread over the months each category was active
+    months_analyzed = pivot.count()
+    pivot = pivot.loc[:, months_analyzed > 0]
+    months_analyzed = months_analyzed[months_analyzed > 0]
+    avg_spend = pivot.mean()
+    min_spend = pivot.min()
+    max_spend = pivot.max()
+    std_spend = pivot.std(ddof=0)
+    
+    # Variability (high variability = room for optimization)
+    variability = (std_spend / avg_spend * 100).where(avg_spend > 0, 0.0)
+    
+    stats = pd.DataFrame({
+        'category': pivot.columns.astype(object),
+        'avg_monthly': avg_spend.to_numpy(dtype=float),
+        'min_monthly': min_spend.to_numpy(dtype=float),
+        'max_monthly': max_spend.to_numpy(dtype=float),
+        'std_dev': std_spend.to_numpy(dtype=float),
+        'variability_percent': variability.to_numpy(dtype=float),
+        # Potential savings: difference between max and minimum month
+        'potential_monthly_savings': ((max_spend - min_spend) / months_analyzed).to_numpy(dtype=float),
+        # Flag categories with high variability or consistently high spending
+        'is_optimizable': ((variability > 30) | (avg_spend > 200)).to_numpy(),
+        'months_analyzed': months_analyzed.to_numpy(dtype=int),
+    })
     
     # Sort by potential savings (highest first)
-    category_stats = sorted(category_stats, key=lambda x: x['potential_monthly_savings'], reverse=True)
-    
-    # Month-over-month comparison
-    monthly_totals = []
-    for month in recent_months:
-        month_data = df_recent[df_recent['month'] == month]
-        income = float(month_data[month_data['type'] == 'income']['amount'].sum())
-        expenses = float(month_data[month_data['type'] == 'expense']['amount'].sum())
-        savings = income - expenses
-        savings_rate = (savings / income * 100) if income > 0 else 0
-        
-        monthly_totals.append({
+    stats = stats.sort_values('potential_monthly_savings', ascending=False, kind='stable')
+    category_stats = [
+        {**row, 'is_optimizable': bool(row['is_optimizable']), 'months_analyzed': int(row['months_analyzed'])}
+        for row in stats.to_dict('records')
+    ]
+    
+    # Month-over-month comparison from one month x type aggregation
+    month_totals = (
+        cube.sums(['month', 'type'], months=recent_months)
+        .unstack(fill_value=0)
+        .reindex(recent_months, fill_value=0)
+    )
+    incomes = month_totals['income'] if 'income' in month_totals.columns else pd.Series(0.0, index=recent_months)
+    expenses = month_totals['expense'] if 'expense' in month_totals.columns else pd.Series(0.0, index=recent_months)
+    savings = incomes - expenses
+    savings_rates = (savings / incomes * 100).where(incomes > 0, 0.0)
+    
+    monthly_totals = [
+        {
             'month': str(month),
-            'income': income,
-            'expenses': expenses,
-            'savings': savings,
-            'savings_rate': savings_rate
-        })
+            'income': float(income),
+            'expenses': float(expense),
+            'savings': float(saving),
+            'savings_rate': float(rate)
+        }
+        for month, income, expense, saving, rate in zip(recent_months, incomes, expenses, savings, savings_rates)
+    ]
     
     # Calculate trends
     if len(monthly_totals) >= 2:
@@ -0,0 +1,106 @@
+"""
+Month x category x type aggregate cube.
+Sums, counts and sums of squares are computed once per analysis in a single
+groupby; trend, budget, optimization and diagnostic stages read their
+monthly and per-category totals from the cube instead of rescanning rows.
+"""
+import numpy as np
+import pandas as pd
+
+
+CUBE_KEYS = ['month', 'category', 'type']
+
+
+class AggregateCube:
+    """
+    Additive per-(month, category, type) aggregates of transaction amounts.
+
+    The table is indexed by CUBE_KEYS with columns sum, count, sumsq and
+    first, the position of the cell's first row in the source frame (used to
+    keep first-appearance ordering). Only observed cells are stored, so
+    rolling the cube up to any subset of keys gives the same groups as a
+    groupby over the rows would.
+    """
+
+    def __init__(self, table, rows=0):
+        self.table = table
+        self.rows = rows
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build the cube from a prepared transactions frame.
+
+        Args:
+            df: Frame with month, category, type and float amount columns
+        """
+        amount = df['amount']
+        cells = pd.DataFrame({
+            'month': df['month'],
+            'category': df['category'],
+            'type': df['type'],
+            'amount': amount,
+            'amount_sq': amount * amount,
+            'position': np.arange(len(df)),
+        })
+        table = cells.groupby(CUBE_KEYS, observed=True).agg(
+            sum=('amount', 'sum'),
+            count=('amount', 'size'),
+            sumsq=('amount_sq', 'sum'),
+            first=('position', 'min'),
+        )
+        return cls(table, rows=len(df))
+
+    def merge(self, other):
+        """
+        Return a cube covering the rows of self followed by those of other.
+
+        Sums, counts and sums of squares add; other's first positions are
+        offset by self.rows.
+        """
+        shifted = other.table.assign(first=other.table['first'] + self.rows)
+        combined = pd.concat([self.table, shifted])
+        grouped = combined.groupby(level=CUBE_KEYS, observed=True)
+        table = grouped[['sum', 'count', 'sumsq']].sum()
+        table['first'] = grouped['first'].min()
+        return AggregateCube(table, rows=self.rows + other.rows)
+
+    @property
+    def months(self):
+        """Sorted months with at least one transaction of any type."""
+        return sorted(self.table.index.get_level_values('month').unique())
+
+    def _select(self, transaction_type=None, months=None):
+        table = self.table
+        if transaction_type is not None:
+            table = table[table.index.get_level_values('type') == transaction_type]
+        if months is not None:
+            table = table[table.index.get_level_values('month').isin(months)]
+        return table
+
+    def totals(self, by, transaction_type=None, months=None):
+        """
+        Roll the cube up to the given keys.
+
+        Args:
+            by: Key or list of keys from CUBE_KEYS
+            transaction_type: Only include this type (e.g. 'expense')
+            months: Only include these months
+
+        Returns:
+            DataFrame indexed by `by` with sum, count, sumsq, first, mean and
+            std (sample standard deviation of the underlying amounts)
+        """
+        table = self._select(transaction_type, months)
+        grouped = table.groupby(level=by, observed=True)
+        totals = grouped[['sum', 'count', 'sumsq']].sum()
+        totals['first'] = grouped['first'].min()
+        totals['mean'] = totals['sum'] / totals['count']
+        variance = (totals['sumsq'] - totals['sum'] * totals['mean']) / (totals['count'] - 1)
+        totals['std'] = np.sqrt(variance.clip(lower=0)).where(totals['count'] > 1)
+        return totals
+
+    def sums(self, by, transaction_type=None, months=None):
+        """Total amount per group of `by`; see totals()."""
+        table = self._select(transaction_type, months)
+        return table['sum'].groupby(level=by, observed=True).sum()
@@ -1,16 +1,27 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from advanced_analytics import (
+from .advanced_analytics import (
     detect_recurring_transactions,
     calculate_monthly_trends,
     predict_next_month,
+    predict_next_month_batch,
     analyze_category_trends,
     detect_unusual_spending,
     analyze_spending_optimization
 )
-from diagnostic_engine import FinancialDiagnostics
-from categorizer import enhance_transaction_categorization
+from .diagnostic_engine import FinancialDiagnostics
+from .categorizer import get_categorizer
+from .prepared import PreparedTransactions
+from .merchants import merchant_compression
+from .cohort_benchmarks import cohort_for
 
 
 def load_sample_data():
@@ -19,167 +30,474 @@ def load_sample_data():
     return tx, acct
 
 
-def analyze_finances(transactions_df: pd.DataFrame, accounts_df: pd.DataFrame):
-    # Normalize columns
-    df = transactions_df.copy()
-    
+# Pool size and kind ('thread' or 'process') for the parallel sections;
+# 1 worker runs every section serially
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '1'))
+ANALYSIS_EXECUTOR = os.getenv('ANALYSIS_EXECUTOR', 'thread')
+
+AnalysisStep = namedtuple('AnalysisStep', ['name', 'requires', 'func', 'parallel'])
+
+ANALYSIS_STEPS = {}
+
+# Inputs of analyze_finances that steps may list in requires
+ANALYSIS_INPUTS = ('transactions', 'accounts', 'profile', 'benchmark_store')
+
+# Internal steps whose results only feed other steps
+INTERNAL_STEPS = ('prepared', 'cube', 'category_spend')
+
+
+def analysis_step(name, requires=(), parallel=False):
+    """
+    Register an analysis step; usable as a function decorator.
+
+    The step function receives a context dict holding the inputs and step
+    results listed in requires, and returns the step's result. Parallel
+    steps are the expensive, independent ones that analyze_finances may run
+    on a worker pool; the rest run inline.
+    """
+    def register(func):
+        ANALYSIS_STEPS[name] = AnalysisStep(name, tuple(requires), func, parallel)
+        return func
+    return register
+
+
+def resolve_sections(sections=None):
+    """
+    Order the steps needed for the requested sections.
+
+    Args:
+        sections: Section names, or None for every section
+
+    Returns:
+        Step names, prerequisites before the steps that need them
+    """
+    if sections is None:
+        sections = [name for name in ANALYSIS_STEPS if name not in INTERNAL_STEPS]
+    unknown = [name for name in sections if name not in ANALYSIS_STEPS or name in INTERNAL_STEPS]
+    if unknown:
+        raise ValueError(f"Unknown analysis sections: {', '.join(unknown)}")
+
+    order = []
+    def visit(name):
+        if name in order:
+            return
+        for requirement in ANALYSIS_STEPS[name].requires:
+            if requirement not in ANALYSIS_INPUTS:
+                visit(requirement)
+        order.append(name)
+
+    for name in sections:
+        visit(name)
+    return order
+
+
+@analysis_step('prepared', requires=['transactions'])
+def _prepare(context):
     # ENHANCED CATEGORIZATION - Automatically identify all spending categories
-    df, category_analysis = enhance_transaction_categorization(df)
-    
-    # Flexible date parsing - handle multiple formats
-    try:
-        df['date'] = pd.to_datetime(df['date'], format='mixed', dayfirst=True, errors='coerce')
-    except:
-        # Fallback: try common formats
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    
-    # Remove rows with invalid dates
-    df = df.dropna(subset=['date'])
+    categorized = get_categorizer().categorize_dataframe(context['transactions'])
     
-    df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-    df = df.dropna(subset=['amount'])  # Remove rows with invalid amounts
-    
-    df['type'] = df['type'].str.lower()
-    df['category'] = df['category'].fillna('Uncategorized')
+    # Normalize dates, amounts, types and categories once; every step below
+    # shares this prepared frame instead of copying and re-parsing it
+    return PreparedTransactions.from_frame(categorized, copy=False)
+
+
+@analysis_step('cube', requires=['prepared'])
+def _cube(context):
+    # Build the aggregate cube once, before the sections that share it fan out
+    return context['prepared'].cube
+
 
+@analysis_step('category_analysis', requires=['prepared'])
+def _category_analysis(context):
+    return get_categorizer().analyze_spending_by_category(context['prepared'].frame)
+
+
+@analysis_step('totals', requires=['cube'])
+def _totals(context):
     # Income and expenses
-    income = float(df[df['type'] == 'income']['amount'].sum())
-    expenses = float(df[df['type'] == 'expense']['amount'].sum())
+    type_totals = context['cube'].sums('type')
+    income = float(type_totals.get('income', 0.0))
+    expenses = float(type_totals.get('expense', 0.0))
     savings_rate = (income - expenses) / income if income > 0 else 0
+    return {'income': income, 'expenses': expenses, 'savings_rate': savings_rate}
 
+
+@analysis_step('category_spend', requires=['cube', 'totals'])
+def _category_spend(context):
     # Category breakdown
     category_spend = (
-        df[df['type'] == 'expense']
-        .groupby('category')['amount']
-        .sum()
+        context['cube'].sums('category', 'expense')
+        .rename('amount')
         .sort_values(ascending=False)
         .reset_index()
     )
+    total_expenses = max(context['totals']['expenses'], 1e-9)
+    category_spend['percent'] = category_spend['amount'] / total_expenses
+    return category_spend
 
+
+@analysis_step('overspending', requires=['category_spend'])
+def _overspending(context):
     # Overspending flags: top categories above 20% of total expenses
-    total_expenses = max(expenses, 1e-9)
-    category_spend['percent'] = category_spend['amount'] / total_expenses
+    category_spend = context['category_spend']
     overspending = category_spend[category_spend['percent'] >= 0.20]
 
+    # Convert overspending dataframe to dict with native types
+    overspending_list = []
+    for _, row in overspending.iterrows():
+        overspending_list.append({
+            'category': str(row['category']),
+            'amount': float(row['amount']),
+            'percent': float(row['percent'])
+        })
+    return overspending_list
+
+
+@analysis_step('savings_progress', requires=['prepared', 'accounts'])
+def _savings_progress(context):
+    prepared = context['prepared']
+
     # Accounts and emergency fund check
-    acct = accounts_df.copy()
+    acct = context['accounts'].copy()
     acct['balance'] = pd.to_numeric(acct['balance'], errors='coerce')
     acct = acct.dropna(subset=['balance'])  # Remove invalid balances
     
     liquid_savings = float(acct[acct['type'].isin(['cash', 'savings'])]['balance'].sum())
     
     # Calculate monthly expenses more safely
-    if len(df) > 0:
-        latest_date = df['date'].max()
+    if len(prepared) > 0:
+        latest_date = prepared.frame['date'].max()
         one_month_ago = latest_date - pd.DateOffset(months=1)
-        monthly_expenses = float(df[(df['type'] == 'expense') & (df['date'] >= one_month_ago)]['amount'].sum())
+        monthly_expenses = float(prepared.expenses.loc[prepared.expenses['date'] >= one_month_ago, 'amount'].sum())
     else:
         monthly_expenses = 0.0
     
     target_emergency = monthly_expenses * 3  # 3 months basic guideline
-    has_emergency_fund = liquid_savings >= target_emergency
+    return {
+        'liquid_savings': float(liquid_savings),
+        'target_emergency': float(target_emergency),
+        'has_emergency_fund': liquid_savings >= target_emergency,
+    }
 
-    # Alerts
+
+@analysis_step('alerts', requires=['totals', 'savings_progress'])
+def _alerts(context):
+    totals = context['totals']
     alerts = []
-    if income <= expenses:
+    if totals['income'] <= totals['expenses']:
         alerts.append('Spending meets or exceeds income. Review budget urgently.')
-    if not has_emergency_fund:
+    if not context['savings_progress']['has_emergency_fund']:
         alerts.append('No adequate emergency fund (3 months). Increase savings.')
-    if savings_rate < 0.10:
+    if totals['savings_rate'] < 0.10:
         alerts.append('Savings rate below 10%. Aim to raise gradually.')
+    return alerts
+
 
-    # Recommendations
+@analysis_step('recommendations', requires=['totals'])
+def _recommendations(context):
+    income, expenses = context['totals']['income'], context['totals']['expenses']
     recommended_cut = min(0.15, (expenses - income) / expenses if expenses else 0)
     monthly_savings_gain = recommended_cut * expenses
-    recommendations = [
+    return [
         f"Reduce discretionary spend by {int(recommended_cut*100)}% to free €{monthly_savings_gain:,.0f}/month",
     ]
 
-    # Simple benchmarks (dummy age group average 12%)
-    benchmarks = {
-        'your_savings_rate': float(round(savings_rate * 100, 1)),
-        'age_group_average': 12.0,
-    }
 
-    # Prepare chart data for Plotly - convert all to native Python types
-    # Build values list explicitly
-    chart_values = []
-    chart_values.append(float(income))
-    chart_values.append(float(expenses))
-    
-    charts = {
-        'income_vs_expenses': {
-            'labels': ['Income', 'Expenses'],
-            'data': chart_values,
-        },
-        'category_breakdown': {
-            'labels': [str(x) for x in category_spend['category'].tolist()],
-            'data': [float(x) for x in category_spend['amount'].tolist()],
-        },
-        'savings_progress': {
-            'liquid_savings': float(liquid_savings),
-            'target_emergency': float(target_emergency),
-        },
+# Savings rate shown as the peer average without peer data
+DEFAULT_AGE_GROUP_AVERAGE = 12.0
+
+
+@analysis_step('benchmarks', requires=['cube', 'totals', 'profile', 'benchmark_store'])
+def _benchmarks(context):
+    # Savings rate against the user's cohort (age, income and household)
+    savings_rate = float(round(context['totals']['savings_rate'] * 100, 1))
+    store = context['benchmark_store']
+    if store is None:
+        return {'your_savings_rate': savings_rate, 'age_group_average': DEFAULT_AGE_GROUP_AVERAGE}
+    monthly_income = context['cube'].sums('month', 'income')
+    cohort = cohort_for(context['profile'], float(monthly_income.mean()) if len(monthly_income) else 0.0)
+    peers = store.percentile(cohort, 'savings_rate', savings_rate)
+    return {
+        'your_savings_rate': savings_rate,
+        'age_group_average': DEFAULT_AGE_GROUP_AVERAGE if peers['mean'] is None else peers['mean'],
+        'savings_rate_percentile': peers['percentile'],
+        'cohort': cohort,
+        'peer_cohort': peers['cohort'],
+        'peer_count': peers['cohort_size'],
     }
-    
-    # Convert overspending dataframe to dict with native types
-    overspending_list = []
-    for _, row in overspending.iterrows():
-        overspending_list.append({
-            'category': str(row['category']),
-            'amount': float(row['amount']),
-            'percent': float(row['percent'])
-        })
 
-    # ADVANCED ANALYTICS
-    # Monthly trends and predictions
-    monthly_trends = calculate_monthly_trends(df, num_months=6)
-    prediction = predict_next_month(monthly_trends)
-    
-    # Recurring transactions
-    recurring_transactions = detect_recurring_transactions(df)
-    
-    # Category trends
-    category_trends = analyze_category_trends(df, top_n=5)
-    
-    # Unusual spending detection
-    unusual_transactions = detect_unusual_spending(df)
-    
-    # Spending optimization analysis
-    optimization = analyze_spending_optimization(df, num_months=6)
-    
-    # Comprehensive diagnostic analysis
-    diagnostic_engine = FinancialDiagnostics(transactions_df, accounts_df)
-    diagnostic_report = diagnostic_engine.run_full_diagnostic()
-    
-    # Add to charts
-    charts['monthly_trends'] = {
-        'months': monthly_trends['months'],
-        'income': monthly_trends['income'],
-        'expenses': monthly_trends['expenses'],
-        'savings': monthly_trends['savings']
+
+@analysis_step('income_vs_expenses', requires=['totals'])
+def _income_vs_expenses_chart(context):
+    # Chart data for Plotly - native Python types
+    return {
+        'labels': ['Income', 'Expenses'],
+        'data': [float(context['totals']['income']), float(context['totals']['expenses'])],
     }
 
+
+@analysis_step('category_breakdown', requires=['category_spend'])
+def _category_breakdown_chart(context):
+    category_spend = context['category_spend']
     return {
-        'total_income': float(income),
-        'total_expenses': float(expenses),
-        'net_savings': float(income - expenses),
-        'savings_rate': float(savings_rate * 100),  # As percentage
-        'alerts': alerts,
-        'recommendations': recommendations,
-        'benchmarks': benchmarks,
-        'overspending': overspending_list,
-        'charts': charts,
-        # Enhanced categorization results
-        'category_analysis': category_analysis,
-        'expense_by_category': category_analysis['by_category'],
-        'top_spending_categories': category_analysis['top_categories'],
-        # Advanced features
-        'monthly_trends': monthly_trends,
-        'prediction': prediction,
-        'recurring_transactions': recurring_transactions,
-        'category_trends': category_trends,
-        'unusual_transactions': unusual_transactions,
-        'optimization': optimization,
-        'diagnostic_report': diagnostic_report,
+        'labels': [str(x) for x in category_spend['category'].tolist()],
+        'data': [float(x) for x in category_spend['amount'].tolist()],
     }
+
+
+@analysis_step('merchant_compression', requires=['prepared'])
+def _merchant_compression(context):
+    # Distinct raw descriptions per canonical merchant key
+    return merchant_compression(context['prepared'].frame['description'])
+
+
+# ADVANCED ANALYTICS
+@analysis_step('monthly_trends', requires=['prepared', 'cube'])
+def _monthly_trends(context):
+    return calculate_monthly_trends(context['prepared'], num_months=6)
+
+
+@analysis_step('prediction', requires=['monthly_trends'])
+def _prediction(context):
+    return predict_next_month(context['monthly_trends'])
+
+
+@analysis_step('category_predictions', requires=['prepared', 'cube'])
+def _category_predictions(context):
+    return predict_next_month_batch(context['prepared'], by='category', num_months=6)
+
+
+@analysis_step('merchant_predictions', requires=['prepared', 'cube'], parallel=True)
+def _merchant_predictions(context):
+    # Merchants seen in at least half of the fitted months
+    return predict_next_month_batch(context['prepared'], by='merchant', num_months=6, min_active_months=3)
+
+
+@analysis_step('recurring_transactions', requires=['prepared'], parallel=True)
+def _recurring_transactions(context):
+    return detect_recurring_transactions(context['prepared'])
+
+
+@analysis_step('category_trends', requires=['prepared', 'cube'], parallel=True)
+def _category_trends(context):
+    return analyze_category_trends(context['prepared'], top_n=5)
+
+
+@analysis_step('unusual_transactions', requires=['prepared'], parallel=True)
+def _unusual_transactions(context):
+    return detect_unusual_spending(context['prepared'])
+
+
+@analysis_step('optimization', requires=['prepared', 'cube'], parallel=True)
+def _optimization(context):
+    # Spending optimization analysis
+    return analyze_spending_optimization(context['prepared'], num_months=6)
+
+
+@analysis_step('diagnostic_report', requires=['prepared', 'cube', 'accounts', 'profile', 'benchmark_store'],
+               parallel=True)
+def _diagnostic_report(context):
+    # Comprehensive diagnostic analysis (on the categorized, prepared frame)
+    return FinancialDiagnostics(
+        context['prepared'], context['accounts'], context['profile'], benchmark_store=context['benchmark_store']
+    ).run_full_diagnostic()
+
+
+def _build_result(context):
+    """Lay the computed steps out in the analyze_finances result format"""
+    result = {}
+    charts = {}
+
+    if 'totals' in context:
+        totals = context['totals']
+        result.update({
+            'total_income': float(totals['income']),
+            'total_expenses': float(totals['expenses']),
+            'net_savings': float(totals['income'] - totals['expenses']),
+            'savings_rate': float(totals['savings_rate'] * 100),  # As percentage
+        })
+    for name in ('alerts', 'recommendations', 'benchmarks', 'overspending'):
+        if name in context:
+            result[name] = context[name]
+
+    for name in ('income_vs_expenses', 'category_breakdown'):
+        if name in context:
+            charts[name] = context[name]
+    if 'savings_progress' in context:
+        charts['savings_progress'] = {
+            'liquid_savings': context['savings_progress']['liquid_savings'],
+            'target_emergency': context['savings_progress']['target_emergency'],
+        }
+    if 'monthly_trends' in context:
+        monthly_trends = context['monthly_trends']
+        charts['monthly_trends'] = {
+            'months': monthly_trends['months'],
+            'income': monthly_trends['income'],
+            'expenses': monthly_trends['expenses'],
+            'savings': monthly_trends['savings']
+        }
+    if charts:
+        result['charts'] = charts
+
+    # Enhanced categorization results
+    if 'category_analysis' in context:
+        category_analysis = context['category_analysis']
+        result['category_analysis'] = category_analysis
+        result['expense_by_category'] = category_analysis['by_category']
+        result['top_spending_categories'] = category_analysis['top_categories']
+    if 'merchant_compression' in context:
+        result['merchant_compression'] = context['merchant_compression']
+
+    # Advanced features
+    for name in ('monthly_trends', 'prediction', 'category_predictions', 'merchant_predictions',
+                 'recurring_transactions', 'category_trends', 'unusual_transactions',
+                 'optimization', 'diagnostic_report'):
+        if name in context:
+            result[name] = context[name]
+    return result
+
+
+def _run_step(name, context):
+    """
+    Run one step and time it.
+
+    Returns:
+        (result, error message or None, seconds)
+    """
+    start = time.perf_counter()
+    try:
+        result, error = ANALYSIS_STEPS[name].func(context), None
+    except Exception as e:
+        result, error = None, str(e) or type(e).__name__
+    return result, error, time.perf_counter() - start
+
+
+def _create_pool(workers, executor):
+    if executor == 'thread':
+        return ThreadPoolExecutor(max_workers=workers)
+    if executor == 'process':
+        # Workers start from a fork server (or are spawned), never forked from a threaded server process
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        )
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    raise ValueError(f"Unknown analysis executor: {executor}")
+
+
+# Worker pools by (executor, size), created on first use and shared by every analysis
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(workers, executor):
+    with _pools_lock:
+        pool = _pools.get((executor, workers))
+        if pool is None:
+            pool = _pools[(executor, workers)] = _create_pool(workers, executor)
+        return pool
+
+
+def _discard_pool(workers, executor, pool):
+    with _pools_lock:
+        if _pools.get((executor, workers)) is pool:
+            del _pools[(executor, workers)]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def analyze_finances(transactions_df: pd.DataFrame, accounts_df: pd.DataFrame, sections=None,
+                     workers=None, executor=None, prepared=None, profile=None, benchmark_store=None):
+    """
+    Run the financial analysis.
+
+    Args:
+        transactions_df: Transactions (date, amount, type, category, description)
+        accounts_df: Accounts (balance, type)
+        sections: Names of the sections to compute, e.g. ['income_vs_expenses'];
+            their prerequisite steps are computed too. None computes everything.
+        workers: Pool size for the independent sections (default
+            ANALYSIS_WORKERS); 1 runs every section serially
+        executor: 'thread' or 'process' (default ANALYSIS_EXECUTOR)
+        prepared: PreparedTransactions to analyze instead of transactions_df,
+            e.g. an incremental state's recent rows and aggregate cube
+        profile: User profile (age, household, goals) for peer benchmarks
+            and the diagnostics
+        benchmark_store: Optional BenchmarkStore to rank the user against
+            their cohort; without one, 'benchmarks' holds only the savings
+            rate and the default peer average
+
+    Returns:
+        Analysis dict holding the requested sections, plus 'section_timings'
+        with the seconds spent in each step that ran. A section that fails,
+        or whose prerequisite failed, is returned as {'error': message}
+        instead of aborting the analysis.
+    """
+    order = resolve_sections(sections)
+    workers = ANALYSIS_WORKERS if workers is None else workers
+    executor = ANALYSIS_EXECUTOR if executor is None else executor
+    parallel_steps = [name for name in order if ANALYSIS_STEPS[name].parallel]
+    pool = _get_pool(workers, executor) if min(workers, len(parallel_steps)) > 1 else None
+
+    context = {'transactions': transactions_df, 'accounts': accounts_df, 'profile': profile or {},
+               'benchmark_store': benchmark_store}
+    if prepared is not None:
+        context['prepared'] = prepared
+    timings = {}
+    errors = {}
+    failure_roots = {}
+    futures = {}
+
+    def record(name, result, error, seconds):
+        timings[name] = seconds
+        if error is None:
+            context[name] = result
+        else:
+            errors[name] = error
+
+    def collect(name):
+        try:
+            record(name, *futures.pop(name).result())
+        except Exception as e:
+            # The pool itself failed, e.g. a worker process died; later analyses start a new one
+            if isinstance(e, BrokenExecutor):
+                _discard_pool(workers, executor, pool)
+            errors[name] = str(e) or type(e).__name__
+
+    try:
+        for name in order:
+            if name in context:
+                continue
+            step = ANALYSIS_STEPS[name]
+            for requirement in step.requires:
+                if requirement in futures:
+                    collect(requirement)
+            failed = [requirement for requirement in step.requires if requirement in errors]
+            if failed:
+                root = failure_roots.get(failed[0], failed[0])
+                failure_roots[name] = root
+                errors[name] = f"Requires failed section '{root}': {errors[root]}"
+                continue
+
+            inputs = {requirement: context[requirement] for requirement in step.requires}
+            if pool is not None and step.parallel:
+                try:
+                    futures[name] = pool.submit(_run_step, name, inputs)
+                    continue
+                except BrokenExecutor:
+                    # Broken by an earlier analysis; run the rest inline
+                    _discard_pool(workers, executor, pool)
+                    pool = None
+            record(name, *_run_step(name, inputs))
+
+        for name in list(futures):
+            collect(name)
+    finally:
+        # The pool outlives the call; drop work that is no longer needed
+        for future in futures.values():
+            future.cancel()
+
+    result = _build_result(context)
+    for name, message in errors.items():
+        if name not in INTERNAL_STEPS:
+            result[name] = {'error': message}
+    result['section_timings'] = {name: timings[name] for name in order if name in timings}
+    return result
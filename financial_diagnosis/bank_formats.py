@@ -0,0 +1,152 @@
+"""
+Bank statement format registry.
+Each registered format recognises its own statements from the first page's
+text and parses the text lines into transactions, so text-layout statements
+do not depend on PDF table extraction.
+"""
+import re
+from datetime import datetime
+
+
+BANK_FORMATS = []
+
+
+def register_bank_format(format_class):
+    """
+    Register a BankFormat subclass; usable as a class decorator.
+
+    Formats are tried in registration order.
+    """
+    BANK_FORMATS.append(format_class())
+    return format_class
+
+
+def detect_bank_format(first_page_text):
+    """Return the first registered format matching the page text, or None."""
+    for bank_format in BANK_FORMATS:
+        if bank_format.matches(first_page_text):
+            return bank_format
+    return None
+
+
+class BankFormat:
+    """
+    Base class for a bank's statement layout.
+
+    Subclasses implement matches() to fingerprint the first page and
+    parse_lines() to turn text lines into transaction dicts with the
+    standard columns: date, description, amount, type, category.
+    """
+
+    name = 'generic'
+
+    def matches(self, first_page_text):
+        raise NotImplementedError
+
+    def parse_lines(self, lines):
+        raise NotImplementedError
+
+
+@register_bank_format
+class RevolutFormat(BankFormat):
+    """
+    Revolut account statements.
+
+    Transaction lines start with a date such as "26 Nov 2025", followed by
+    the description and the amounts, the last of which is the balance.
+    Money in and out share one amount column, so the direction is inferred
+    from the description and from a "To:" line following the transaction.
+    """
+
+    name = 'revolut'
+
+    FINGERPRINT = re.compile(r'\brevolut\b', re.IGNORECASE)
+    COLUMN_HEADER = re.compile(r'money\s+(?:out|in)', re.IGNORECASE)
+    DATE_LINE = re.compile(r'^(\d{1,2})\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\s+(\d{4})')
+    AMOUNT = re.compile(r'€([\d,]+\.\d{2})')
+    DESCRIPTION = re.compile(r'^(.+?)(?=€|$)')
+
+    MONEY_IN_KEYWORDS = ('transfer from', 'payment from', 'pocket withdrawal', 'from:')
+    MONEY_OUT_KEYWORDS = ('to pocket', 'transfer to', 'to:', 'purchase of')
+    MERCHANT_KEYWORDS = ('lidl', 'circle k', 'amazon', 'ryanair')
+
+    def matches(self, first_page_text):
+        return bool(
+            self.FINGERPRINT.search(first_page_text)
+            and self.COLUMN_HEADER.search(first_page_text)
+        )
+
+    def iter_records(self, lines):
+        """
+        Yield one record per dated line with money_in, money_out and balance.
+
+        Lines with a single amount carry only the balance and yield zero
+        money in and out. One line of lookahead is kept for the "To:" check.
+        """
+        pending = None
+        for raw_line in lines:
+            line = raw_line.strip()
+            if pending is not None:
+                yield self._finish(pending, line)
+                pending = None
+
+            date_match = self.DATE_LINE.match(line)
+            if date_match:
+                pending = (date_match, line)
+
+        if pending is not None:
+            yield self._finish(pending, '')
+
+    def _finish(self, pending, next_line):
+        date_match, line = pending
+        day, month, year = date_match.groups()
+        rest = line[date_match.end():].strip()
+
+        amounts = self.AMOUNT.findall(rest)
+        desc_match = self.DESCRIPTION.match(rest)
+        description = desc_match.group(1).strip() if desc_match else rest
+        description_lower = description.lower()
+
+        money_in = money_out = balance = 0.0
+        if len(amounts) >= 2:
+            # Last is balance, second-to-last is transaction amount
+            balance = float(amounts[-1].replace(',', ''))
+            amount = float(amounts[-2].replace(',', ''))
+
+            if any(word in description_lower for word in self.MONEY_IN_KEYWORDS):
+                money_in = amount
+            elif any(word in description_lower for word in self.MONEY_OUT_KEYWORDS):
+                money_out = amount
+            elif 'card:' in rest.lower() or any(word in description_lower for word in self.MERCHANT_KEYWORDS):
+                money_out = amount
+            elif next_line.lower().startswith('to:'):
+                money_out = amount
+            else:
+                money_in = amount
+        elif len(amounts) == 1:
+            balance = float(amounts[0].replace(',', ''))
+
+        return {
+            'date': datetime.strptime(f'{day} {month} {year}', '%d %b %Y'),
+            'description': description,
+            'money_in': money_in,
+            'money_out': money_out,
+            'balance': balance,
+        }
+
+    def parse_lines(self, lines):
+        """Yield standard transaction dicts, skipping balance-only lines."""
+        for record in self.iter_records(lines):
+            if record['money_out'] > 0:
+                amount, transaction_type = record['money_out'], 'expense'
+            elif record['money_in'] > 0:
+                amount, transaction_type = record['money_in'], 'income'
+            else:
+                continue
+            yield {
+                'date': record['date'],
+                'description': record['description'],
+                'amount': amount,
+                'type': transaction_type,
+                'category': 'Uncategorized',
+            }
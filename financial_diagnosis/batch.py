@@ -0,0 +1,293 @@
+"""
+Batch scoring of many households at once.
+Advisors' uploads arrive as one long-format frame with a user_id column.
+Categorization, monthly aggregates and the ten diagnostic scores are
+computed with grouped operations over all users together, instead of one
+analyze_finances and FinancialDiagnostics run per user.
+"""
+import numpy as np
+import pandas as pd
+
+from .categorizer import get_categorizer
+from .diagnostic_engine import DIAGNOSTIC_PLUGINS, ESSENTIAL_KEYWORDS, grade_for, tag_descriptions
+from .merchants import merchant_keys
+from .prepared import PreparedTransactions
+
+
+def _status(score):
+    return np.select([score >= 80, score >= 60, score >= 40], ['excellent', 'good', 'fair'], 'poor')
+
+
+def _monthly_stats(monthly, users):
+    """
+    Per-user statistics of monthly totals, matching what the diagnostics
+    compute on one user's month-sorted Series.
+
+    Args:
+        monthly: Series indexed by (user_id, month), sorted by month within
+            each user; NaN where the user had no rows of this kind that month
+        users: Index of all users
+
+    Returns:
+        DataFrame indexed by users with count, mean, std, recent (mean of the
+        last 3 months) and older (mean of the earlier months, or recent if
+        there are none)
+    """
+    values = monthly.dropna()
+    grouped = values.groupby(level='user_id', sort=False)
+    recent = grouped.cumcount(ascending=False).to_numpy() < 3
+    stats = pd.DataFrame({
+        'count': grouped.size(),
+        'mean': grouped.mean(),
+        'std': grouped.std(),
+        'recent': values[recent].groupby(level='user_id', sort=False).mean(),
+        'older': values[~recent].groupby(level='user_id', sort=False).mean(),
+    }).reindex(users)
+    stats['count'] = stats['count'].fillna(0)
+    stats['older'] = stats['older'].fillna(stats['recent'])
+    return stats
+
+
+def _per_user(values, users, fill_value=0):
+    """Align a Series grouped by user_id with users."""
+    return values.reindex(users, fill_value=fill_value).to_numpy()
+
+
+def _tagged_stats(frame, mask, users):
+    """Row count, monthly-sum mean, active months and distinct descriptions of tagged rows"""
+    rows = frame[mask]
+    monthly = rows.groupby(['user_id', 'month'], sort=False)['amount'].sum()
+    by_user = monthly.groupby(level='user_id', sort=False)
+    return {
+        'count': _per_user(rows.groupby('user_id', sort=False).size(), users),
+        'monthly_mean': _per_user(by_user.mean(), users, np.nan),
+        'months': _per_user(by_user.size(), users),
+        'descriptions': _per_user(rows.groupby('user_id', sort=False)['description'].nunique(), users),
+    }
+
+
+def score_households(transactions_df, accounts_df=None, profiles=None):
+    """
+    Score many households' finances in one grouped pass.
+
+    Gives the same totals, scores, statuses, overall score and grade as
+    running analyze_finances and FinancialDiagnostics.run_full_diagnostic
+    per user; gaps, risks and per-diagnostic details are not produced.
+
+    Args:
+        transactions_df: Long-format transactions of every user (user_id,
+            date, amount, type, category, description)
+        accounts_df: Optional accounts with user_id and balance columns
+        profiles: Optional dict of user_id to profile (e.g. 'goals')
+
+    Returns:
+        Dict of user_id to that user's result, in order of first appearance
+    """
+    if 'user_id' not in transactions_df.columns:
+        raise ValueError("Batch scoring requires a 'user_id' column")
+    profiles = profiles or {}
+    users = pd.Index(pd.unique(transactions_df['user_id']), name='user_id')
+
+    # One categorization and normalization pass over every user's rows
+    categorized = get_categorizer().categorize_dataframe(transactions_df)
+    frame = PreparedTransactions.from_frame(categorized, copy=False).frame
+    is_income = (frame['type'] == 'income').to_numpy()
+    is_expense = (frame['type'] == 'expense').to_numpy()
+    income_rows, expense_rows = frame[is_income], frame[is_expense]
+
+    # Monthly income and expense totals per user, NaN for months without any
+    monthly = (
+        frame[is_income | is_expense]
+        .groupby(['user_id', 'month', 'type'], observed=True)['amount'].sum()
+        .unstack('type')
+        .reindex(columns=['income', 'expense'])
+    )
+    monthly.columns = list(monthly.columns)
+    income = _monthly_stats(monthly['income'], users)
+    expense = _monthly_stats(monthly['expense'], users)
+
+    # Month-by-month savings: over months with both (mean, sign counts), and
+    # the number of months with either
+    savings = monthly['income'] - monthly['expense']
+    by_user = savings.groupby(level='user_id', sort=False)
+    savings_mean = _per_user(by_user.mean(), users, np.nan)
+    savings_std = _per_user(by_user.std(), users, np.nan)
+    savings_months = _per_user(by_user.size(), users)
+    negative_months = _per_user((savings < 0).groupby(level='user_id', sort=False).sum(), users)
+    positive_months = _per_user((savings > 0).groupby(level='user_id', sort=False).sum(), users)
+
+    rows = _per_user(frame.groupby('user_id', sort=False).size(), users)
+    income_total = _per_user(income_rows.groupby('user_id', sort=False)['amount'].sum(), users)
+    income_count = _per_user(income_rows.groupby('user_id', sort=False).size(), users)
+    expense_total = _per_user(expense_rows.groupby('user_id', sort=False)['amount'].sum(), users)
+    expense_count = _per_user(expense_rows.groupby('user_id', sort=False).size(), users)
+    has_income, has_expense = income_count > 0, expense_count > 0
+
+    income_mean, income_std = income['mean'].to_numpy(), income['std'].to_numpy()
+    expense_mean, expense_std = expense['mean'].to_numpy(), expense['std'].to_numpy()
+    # Average monthly income/expenses, with the defaults the diagnostics use
+    # for users without such rows
+    avg_income_or_0 = np.where(income['count'] > 0, income_mean, 0)
+    avg_income_or_1 = np.where(income['count'] > 0, income_mean, 1)
+    avg_expense_or_1 = np.where(expense['count'] > 0, expense_mean, 1)
+
+    tags = tag_descriptions(frame['description'])
+    tagged = {tag: _tagged_stats(frame, tags[tag].to_numpy(), users) for tag in tags.columns}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores, statuses = {}, {}
+
+        # Income: level, stability, dependence on the main payer and growth
+        sources = (
+            income_rows.assign(merchant=merchant_keys(income_rows['description']))
+            .groupby(['user_id', 'merchant'], observed=True)['amount'].sum()
+        )
+        primary_income = _per_user(sources.groupby(level='user_id', sort=False).max(), users)
+        primary_dependency = np.where(income_total > 0, primary_income / income_total, 1)
+        stability = np.where(income_mean > 0, 1 - income_std / income_mean, 0)
+        recent, older = income['recent'].to_numpy(), income['older'].to_numpy()
+        score = (
+            np.select([income_mean > 3000, income_mean > 2000, income_mean > 1000], [30, 20, 10], 0)
+            + np.select([stability > 0.8, stability > 0.6, stability > 0.4], [30, 20, 10], 0)
+            + np.select([primary_dependency < 0.8, primary_dependency < 0.95], [20, 10], 0)
+            + np.where(income['count'] >= 3, np.select([recent > older * 1.1, recent > older], [20, 10], 0), 0)
+        )
+        scores['income'] = np.where(has_income, np.minimum(score, 100), 0)
+        statuses['income'] = np.where(has_income, _status(score), 'critical')
+
+        # Expenses: ratio to income, essential share and trend
+        category_spend = expense_rows.groupby(['user_id', 'category'], observed=True)['amount'].sum()
+        categories = category_spend.index.get_level_values('category')
+        essential = np.array([any(kw in str(cat).lower() for kw in ESSENTIAL_KEYWORDS) for cat in categories],
+                             dtype=bool)
+        essential_spend = _per_user(category_spend[essential].groupby(level='user_id', sort=False).sum(), users)
+        essential_ratio = np.where(expense_total > 0, essential_spend / expense_total, 0)
+        expense_ratio = np.where(avg_income_or_0 > 0, expense_mean / avg_income_or_0, 1)
+        recent, older = expense['recent'].to_numpy(), expense['older'].to_numpy()
+        score = (
+            np.select([expense_ratio < 0.5, expense_ratio < 0.7, expense_ratio < 0.9], [40, 30, 20], 0)
+            + np.select([(essential_ratio > 0.5) & (essential_ratio < 0.8), essential_ratio >= 0.8], [30, 20], 10)
+            + np.where(expense['count'] >= 3, np.select([recent < older * 1.1, recent < older * 1.2], [30, 15], 0), 0)
+        )
+        scores['expenses'] = np.where(has_expense, score, 50)
+        statuses['expenses'] = np.where(has_expense, _status(score), 'unknown')
+
+        # Debt: debt-to-income ratio
+        debt = tagged['debt']
+        debt_to_income = np.where(avg_income_or_1 > 0, debt['monthly_mean'] / avg_income_or_1, 0)
+        score = np.select(
+            [debt_to_income > 0.5, debt_to_income > 0.36, debt_to_income > 0.28, debt_to_income > 0.15],
+            [20, 40, 60, 80], 100
+        )
+        scores['debt_liabilities'] = np.where(debt['count'] > 0, score, 70)
+        statuses['debt_liabilities'] = np.where(debt['count'] > 0, _status(score), 'assumed_no_debt')
+
+        # Assets: emergency fund, investment activity and assets to income
+        if accounts_df is not None and len(accounts_df) > 0:
+            balance = _per_user(accounts_df.groupby('user_id', sort=False)['balance'].sum(), users)
+        else:
+            balance = np.zeros(len(users))
+        emergency_months = np.where(avg_expense_or_1 > 0, balance / avg_expense_or_1, 0)
+        investments = tagged['investment']['count']
+        investment_rate = np.where(rows > 0, investments / rows, 0)
+        asset_to_income = np.where(avg_income_or_1 > 0, balance / (avg_income_or_1 * 12), 0)
+        score = (
+            np.select([emergency_months >= 6, emergency_months >= 3, emergency_months >= 1], [40, 30, 15], 0)
+            + np.where(investments > 0,
+                       30 + np.select([investment_rate > 0.05, investment_rate > 0.02], [20, 10], 0), 10)
+            + np.where(asset_to_income > 1, 10, 0)
+        )
+        scores['assets_investments'] = score
+        statuses['assets_investments'] = _status(score)
+
+        # Insurance: number of policies and premium share of income
+        insurance = tagged['insurance']
+        insurance_ratio = np.where(avg_income_or_1 > 0, insurance['monthly_mean'] / avg_income_or_1, 0)
+        score = (
+            50 + np.where(insurance['descriptions'] >= 2, 20, 0)
+            + np.where((insurance_ratio > 0.02) & (insurance_ratio < 0.15), 30, 0)
+        )
+        scores['insurance'] = np.where(insurance['count'] > 0, score, 30)
+        statuses['insurance'] = np.where(insurance['count'] > 0, 'partial', 'unknown')
+
+        # Goals: defined in the profile, with positive average savings
+        has_goals = np.array([bool((profiles.get(user) or {}).get('goals')) for user in users], dtype=bool)
+        saving = has_income & has_expense & (savings_mean > 0)
+        scores['financial_goals'] = np.where(has_goals, 60 + np.where(saving, 40, 0), 40)
+        statuses['financial_goals'] = np.where(has_goals, 'defined', 'undefined')
+
+        # Budgeting: savings rate, overspending months and savings consistency
+        savings_rate = np.where(income_mean > 0, savings_mean / income_mean * 100, 0)
+        consistency = np.where(savings_mean != 0, 1 - savings_std / savings_mean, 0)
+        # max(0, min(1, nan)) is 1 in the per-user diagnostic
+        consistency = np.where(np.isnan(consistency), 1, np.clip(consistency, 0, 1))
+        score = (
+            np.select([savings_rate >= 20, savings_rate >= 15, savings_rate >= 10, savings_rate > 0],
+                      [40, 30, 20, 10], 0)
+            + np.select([negative_months == 0, negative_months <= savings_months * 0.2,
+                         negative_months <= savings_months * 0.4], [30, 20, 10], 0)
+            + np.select([consistency > 0.7, consistency > 0.5, consistency > 0.3], [30, 20, 10], 0)
+        )
+        budgeted = has_income & has_expense
+        scores['budgeting'] = np.where(budgeted, score, 50)
+        statuses['budgeting'] = np.where(budgeted, _status(score), 'unknown')
+
+        # Credit: card payments relative to income and regularity
+        credit = tagged['credit']
+        credit_to_income = np.where(avg_income_or_1 > 0, credit['monthly_mean'] / avg_income_or_1, 0)
+        score = (
+            50 + np.select([credit_to_income < 0.1, credit_to_income < 0.2, credit_to_income < 0.3], [30, 20, 10], 0)
+            + np.where(credit['months'] >= 3, 20, 0)
+        )
+        scores['credit_health'] = np.where(credit['count'] > 0, score, 60)
+        statuses['credit_health'] = np.where(credit['count'] > 0, 'fair', 'unknown')
+
+        # Taxes: payments and effective rate net of refunds
+        tax_mask = tags['tax'].to_numpy()
+        tax_paid = _per_user(frame[tax_mask & is_expense].groupby('user_id', sort=False)['amount'].sum(), users)
+        tax_payments = _per_user(frame[tax_mask & is_expense].groupby('user_id', sort=False).size(), users)
+        tax_refunds = _per_user(frame[tax_mask & is_income].groupby('user_id', sort=False)['amount'].sum(), users)
+        total_income = np.where(has_income, income_total, 1)
+        tax_rate = np.where(total_income > 0, (tax_paid - tax_refunds) / total_income, 0)
+        score = 70 + np.where(tax_payments > 0, 20, 0) + np.where((tax_rate > 0) & (tax_rate < 0.4), 10, 0)
+        scores['tax_situation'] = np.where(tagged['tax']['count'] > 0, score, 60)
+        statuses['tax_situation'] = np.where(tagged['tax']['count'] > 0, 'compliant', 'unknown')
+
+        # Behavior: expense volatility, saving months and transaction volume
+        volatility = np.where((expense['count'] > 0) & (expense_mean > 0), expense_std / expense_mean, 0)
+        total_months = np.where(savings_months > 0, savings_months, 1)
+        discipline = positive_months / total_months
+        per_month = rows / total_months
+        score = (
+            np.select([volatility < 0.2, volatility < 0.4, volatility < 0.6], [30, 20, 10], 0)
+            + np.select([discipline >= 0.9, discipline >= 0.75, discipline >= 0.5, discipline > 0],
+                        [40, 30, 20, 10], 0)
+            + np.select([per_month < 100, per_month < 200, per_month < 300], [30, 20, 10], 0)
+        )
+        scores['financial_behavior'] = score
+        statuses['financial_behavior'] = _status(score)
+
+    # Weighted in registration order, as FinancialDiagnostics does
+    total_score = np.zeros(len(users))
+    for plugin in DIAGNOSTIC_PLUGINS.values():
+        if plugin.name in scores:
+            total_score = total_score + scores[plugin.name] * plugin.weight
+
+    results = {}
+    for i, user in enumerate(users):
+        overall_score = round(float(total_score[i]), 1)
+        income_i, expenses_i = float(income_total[i]), float(expense_total[i])
+        results[user] = {
+            'total_income': income_i,
+            'total_expenses': expenses_i,
+            'net_savings': income_i - expenses_i,
+            'savings_rate': (income_i - expenses_i) / income_i * 100 if income_i > 0 else 0.0,
+            'avg_monthly_income': float(avg_income_or_0[i]),
+            'avg_monthly_expenses': float(expense_mean[i]) if expense['count'].iloc[i] > 0 else 0.0,
+            'diagnostics': {
+                name: {'score': int(scores[name][i]), 'status': str(statuses[name][i])} for name in scores
+            },
+            'overall_score': overall_score,
+            'grade': grade_for(overall_score),
+        }
+    return results
@@ -4,9 +4,90 @@ Identifies specific spending categories: Shopping, Pharmacies, Morgadi, Rent,
 School, Creches, Savings, Investment, Insurance, Loans, etc.
 """
 
-import pandas as pd
+import os
 import re
-from typing import Dict, List, Tuple
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_descriptions(descriptions: pd.Series) -> pd.Series:
+    """
+    Normalize descriptions into the key used for matching and caching
+    
+    Lower-cases, trims and collapses runs of whitespace, so trivially
+    different spellings of the same merchant share one key.
+    """
+    text = descriptions.where(descriptions.notna(), '').astype(str)
+    return text.str.lower().str.strip().str.replace(r'\s+', ' ', regex=True)
+
+
+class CategoryCache:
+    """
+    Bounded, thread-safe LRU cache of normalized description -> category
+    
+    A cached value of None means the description matched no keyword.
+    """
+    
+    def __init__(self, max_size: int = 50000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get_many(self, keys: Iterable[str]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+        """
+        Look up several keys at once
+        
+        Returns:
+            Tuple of (found key -> category, list of missing keys)
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                else:
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+    
+    def put_many(self, items: Dict[str, Optional[str]]):
+        """Store several key -> category entries, evicting the least recently used"""
+        with self._lock:
+            for key, category in items.items():
+                self._entries[key] = category
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+    
+    def stats(self) -> Dict:
+        """Return size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
 
 
 class PortugueseTransactionCategorizer:
@@ -113,9 +194,17 @@ class PortugueseTransactionCategorizer:
         ]
     }
     
-    def __init__(self):
-        """Initialize the categorizer"""
+    def __init__(self, cache: Optional[CategoryCache] = None):
+        """
+        Initialize the categorizer
+        
+        Args:
+            cache: Optional CategoryCache shared between calls
+        """
+        self.cache = cache
         self.category_patterns = self._compile_patterns()
+        self.categories = list(self.CATEGORY_KEYWORDS.keys())
+        self.keyword_priority, self.combined_pattern = self._compile_combined_pattern()
     
     def _compile_patterns(self) -> Dict[str, List[re.Pattern]]:
         """Compile regex patterns for each category"""
@@ -127,6 +216,29 @@ class PortugueseTransactionCategorizer:
             ]
         return patterns
     
+    def _compile_combined_pattern(self) -> Tuple[Dict[str, int], re.Pattern]:
+        """
+        Compile every keyword into a single alternation
+        
+        The alternation sits inside a lookahead, so a scan reports every
+        position where a keyword starts, overlapping matches included.
+        Keywords are listed in category order, so at any position the
+        highest-priority category wins; the minimum priority over all
+        positions is the category categorize_transaction would return.
+        
+        Returns:
+            Tuple of (keyword -> category priority, compiled pattern)
+        """
+        keyword_priority = {}
+        for priority, keywords in enumerate(self.CATEGORY_KEYWORDS.values()):
+            for keyword in keywords:
+                # Keywords shared by two categories belong to the first one
+                keyword_priority.setdefault(keyword.lower(), priority)
+        
+        alternation = '|'.join(re.escape(keyword) for keyword in keyword_priority)
+        pattern = re.compile(r'(?=\b(' + alternation + r')\b)', re.IGNORECASE)
+        return keyword_priority, pattern
+    
     def categorize_transaction(self, description: str, existing_category: str = None) -> str:
         """
         Categorize a single transaction based on description
@@ -152,6 +264,49 @@ class PortugueseTransactionCategorizer:
         # If no match found, keep existing or mark as uncategorized
         return existing_category if existing_category else 'Uncategorized'
     
+    def match_categories(self, descriptions: pd.Series) -> pd.Series:
+        """
+        Match a whole Series of descriptions against all keywords in one pass
+        
+        Each distinct normalized description is scanned once with the
+        combined pattern, and the result is broadcast back to every row that
+        shares it. With a cache attached, descriptions seen in earlier calls
+        are not scanned again.
+        
+        Args:
+            descriptions: Series of transaction descriptions
+        
+        Returns:
+            Series aligned with descriptions holding the matched category,
+            or None where no keyword matches
+        """
+        codes, uniques = pd.factorize(normalize_descriptions(descriptions))
+        uniques = np.asarray(uniques, dtype=object)
+        
+        if self.cache is not None:
+            found, missing = self.cache.get_many(uniques)
+            scanned = dict(zip(missing, self._scan(np.asarray(missing, dtype=object))))
+            self.cache.put_many(scanned)
+            found.update(scanned)
+            unique_categories = np.array([found[key] for key in uniques], dtype=object)
+        else:
+            unique_categories = self._scan(uniques)
+        
+        return pd.Series(unique_categories[codes], index=descriptions.index, dtype=object)
+    
+    def _scan(self, texts: np.ndarray) -> np.ndarray:
+        """Run the combined pattern over distinct normalized descriptions"""
+        unique_categories = np.full(len(texts), None, dtype=object)
+        if len(texts) == 0:
+            return unique_categories
+        
+        matches = pd.Series(texts, dtype=object).str.findall(self.combined_pattern)
+        priorities = matches.explode().map(self.keyword_priority).dropna()
+        best = priorities.groupby(level=0).min().astype(int)
+        category_names = np.asarray(self.categories, dtype=object)
+        unique_categories[best.index.to_numpy()] = category_names[best.to_numpy()]
+        return unique_categories
+    
     def categorize_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Categorize all transactions in a dataframe
@@ -168,14 +323,15 @@ class PortugueseTransactionCategorizer:
         if 'category' not in result.columns:
             result['category'] = 'Uncategorized'
         
-        # Categorize each transaction
-        result['category'] = result.apply(
-            lambda row: self.categorize_transaction(
-                row.get('description', ''),
-                row.get('category', 'Uncategorized')
-            ),
-            axis=1
-        )
+        if 'description' in result.columns:
+            matched = self.match_categories(result['description'])
+        else:
+            matched = pd.Series(None, index=result.index, dtype=object)
+        
+        # If no match found, keep existing or mark as uncategorized
+        existing = result['category']
+        fallback = existing.where(existing.notna() & (existing.astype(str) != ''), 'Uncategorized')
+        result['category'] = matched.fillna(fallback)
         
         return result
     
@@ -201,7 +357,7 @@ class PortugueseTransactionCategorizer:
             }
         
         # Group by category
-        category_totals = expenses.groupby('category')['amount'].agg([
+        category_totals = expenses.groupby('category', observed=True)['amount'].agg([
             ('total', 'sum'),
             ('count', 'count'),
             ('average', 'mean')
@@ -284,6 +440,29 @@ class PortugueseTransactionCategorizer:
         return report
 
 
+# Process-wide categorizer, shared by every request
+CATEGORY_CACHE_SIZE = int(os.getenv('CATEGORY_CACHE_SIZE', '50000'))
+_shared_categorizer = None
+_shared_categorizer_lock = threading.Lock()
+
+
+def get_categorizer() -> PortugueseTransactionCategorizer:
+    """Return the process-wide categorizer, creating it on first use"""
+    global _shared_categorizer
+    if _shared_categorizer is None:
+        with _shared_categorizer_lock:
+            if _shared_categorizer is None:
+                _shared_categorizer = PortugueseTransactionCategorizer(
+                    cache=CategoryCache(max_size=CATEGORY_CACHE_SIZE)
+                )
+    return _shared_categorizer
+
+
+def categorizer_cache_stats() -> Dict:
+    """Return hit/miss/eviction counters of the shared categorizer cache"""
+    return get_categorizer().cache.stats()
+
+
 def enhance_transaction_categorization(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
     """
     Main function to enhance transaction categorization
@@ -294,7 +473,7 @@ def enhance_transaction_categorization(df: pd.DataFrame) -> Tuple[pd.DataFrame,
     Returns:
         Tuple of (enhanced_df, analysis_dict)
     """
-    categorizer = PortugueseTransactionCategorizer()
+    categorizer = get_categorizer()
     
     # Categorize transactions
     enhanced_df = categorizer.categorize_dataframe(df)
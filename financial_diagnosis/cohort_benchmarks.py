@@ -0,0 +1,389 @@
+"""
+Peer benchmarks from anonymized diagnostic results.
+Users' savings rates, diagnostic scores and ratios are stored per cohort
+(age band, income band, household type). Percentile tables are rebuilt in
+batches, so a lookup is a binary search in a small precomputed table rather
+than a scan over other users' data.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'benchmarks.db')
+
+COHORT_FIELDS = ('age_band', 'income_band', 'household')
+
+# Cohorts from most to least specific; a lookup uses the first with enough users
+COHORT_LEVELS = [COHORT_FIELDS, ('age_band', 'income_band'), ('age_band',), ()]
+
+# Upper bounds (exclusive) and labels of the age and monthly income bands
+AGE_BANDS = [(25, '18-24'), (35, '25-34'), (45, '35-44'), (55, '45-54'), (65, '55-64'), (None, '65+')]
+INCOME_BANDS = [(1000, '<1000'), (2000, '1000-2000'), (3000, '2000-3000'), (5000, '3000-5000'), (None, '5000+')]
+HOUSEHOLD_TYPES = ('single', 'couple', 'family', 'single_parent')
+
+UNKNOWN = 'unknown'
+
+# Percentile tables hold the 0th to 100th percentiles of each metric
+TABLE_QUANTILES = np.linspace(0, 1, 101)
+
+
+def _band(value, bands):
+    if value is None or pd.isna(value):
+        return UNKNOWN
+    for upper, label in bands:
+        if upper is None or value < upper:
+            return label
+
+
+def cohort_for(profile, monthly_income):
+    """
+    Cohort of a user.
+
+    Args:
+        profile: Dict with optional 'age' and 'household' (one of HOUSEHOLD_TYPES)
+        monthly_income: Average monthly income
+
+    Returns:
+        Dict with age_band, income_band and household ('unknown' when missing)
+    """
+    profile = profile or {}
+    household = profile.get('household')
+    return {
+        'age_band': _band(profile.get('age'), AGE_BANDS),
+        'income_band': _band(monthly_income, INCOME_BANDS),
+        'household': household if household in HOUSEHOLD_TYPES else UNKNOWN,
+    }
+
+
+def benchmark_metrics(analysis):
+    """
+    Metrics of an analyze_finances result that are benchmarked.
+
+    Returns:
+        Dict with savings_rate, and overall_score, '<diagnostic>_score' and
+        ratios when the diagnostic report is present
+    """
+    metrics = {}
+    if 'savings_rate' in analysis:
+        metrics['savings_rate'] = analysis['savings_rate']
+    report = analysis.get('diagnostic_report')
+    if isinstance(report, dict) and 'diagnostics' in report:
+        metrics['overall_score'] = report['overall_score']
+        for name, result in report['diagnostics'].items():
+            if 'score' in result:
+                metrics[f'{name}_score'] = result['score']
+        for name, key in (('expenses', 'expense_ratio'), ('debt_liabilities', 'debt_to_income'),
+                          ('assets_investments', 'emergency_fund_months')):
+            value = report['diagnostics'].get(name, {}).get(key)
+            if value is not None:
+                metrics[key] = value
+    return {name: float(value) for name, value in metrics.items()}
+
+
+def _cohort_key(cohort, fields):
+    return '|'.join(f'{field}={cohort.get(field, UNKNOWN)}' for field in fields)
+
+
+def _tables(rows):
+    """(cohort, metric) -> (users, mean, breakpoints) from percentile_tables rows"""
+    return {
+        (cohort, metric): (users, mean, [float(x) for x in breakpoints.split(',')])
+        for cohort, metric, users, mean, breakpoints in rows
+    }
+
+
+class BenchmarkStore:
+    """
+    SQLite store of anonymized user metrics and per-cohort percentile tables.
+
+    record() upserts a user's latest metrics under a salted hash of their
+    id; every refresh_batch records the percentile tables of every cohort
+    level are rebuilt in one pass and swapped in. The count of records since
+    the last refresh is kept in the database, so it survives restarts and is
+    shared by every process using the file. Lookups read the in-memory
+    tables, which are reloaded when another process has refreshed them
+    (checked at most every reload_interval seconds).
+
+    The salt (BENCHMARK_SALT by default) is required: user ids are easily
+    enumerated, so unsalted hashes would reveal whose metrics are stored.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, refresh_batch=100, min_cohort_size=20, salt=None,
+                 reload_interval=1.0):
+        self.db_path = db_path
+        self.refresh_batch = refresh_batch
+        self.min_cohort_size = min_cohort_size
+        self.salt = os.getenv('BENCHMARK_SALT') if salt is None else salt
+        if not self.salt:
+            raise ValueError('BenchmarkStore needs a salt: pass salt or set BENCHMARK_SALT')
+        self.reload_interval = reload_interval
+        self._refresh_lock = threading.Lock()
+        self._init_db()
+        self.tables, self.generation = self._load_tables()
+        self._checked_at = time.monotonic()
+
+    def __getstate__(self):
+        # Picklable for the process executor of analyze_finances; locks are per process
+        state = self.__dict__.copy()
+        del state['_refresh_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._refresh_lock = threading.Lock()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_metrics (
+                user_hash TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                value REAL NOT NULL,
+                age_band TEXT NOT NULL,
+                income_band TEXT NOT NULL,
+                household TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_hash, metric)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS percentile_tables (
+                cohort TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                users INTEGER NOT NULL,
+                mean REAL NOT NULL,
+                breakpoints TEXT NOT NULL,
+                refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (cohort, metric)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS refresh_state (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                pending INTEGER NOT NULL,
+                generation INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(refresh_state)')]
+        if 'generation' not in columns:
+            conn.execute('ALTER TABLE refresh_state ADD COLUMN generation INTEGER NOT NULL DEFAULT 0')
+        # A database from before refresh_state: users updated since the last refresh
+        conn.execute('''
+            INSERT OR IGNORE INTO refresh_state (id, pending)
+            SELECT 0, COUNT(DISTINCT user_hash) FROM user_metrics
+            WHERE updated_at > COALESCE((SELECT MAX(refreshed_at) FROM percentile_tables), '')
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _load_tables(self):
+        """(tables, generation) as of the last refresh, read in one transaction"""
+        conn = self._connect()
+        conn.execute('BEGIN')
+        generation = conn.execute('SELECT generation FROM refresh_state').fetchone()[0]
+        rows = conn.execute('SELECT cohort, metric, users, mean, breakpoints FROM percentile_tables').fetchall()
+        conn.close()
+        return _tables(rows), generation
+
+    def _current_tables(self):
+        """The in-memory tables, reloaded first if another process has refreshed them"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            conn = self._connect()
+            generation = conn.execute('SELECT generation FROM refresh_state').fetchone()[0]
+            conn.close()
+            if generation != self.generation:
+                self.tables, self.generation = self._load_tables()
+        return self.tables
+
+    def _user_hash(self, user_id):
+        return hashlib.sha256(f'{self.salt}:{user_id}'.encode()).hexdigest()
+
+    def record(self, user_id, cohort, metrics):
+        """
+        Store a user's latest metrics; refreshes the tables every refresh_batch records.
+
+        Args:
+            user_id: User identifier (only its salted hash is stored)
+            cohort: Dict from cohort_for()
+            metrics: Dict of metric name to value, e.g. from benchmark_metrics()
+        """
+        self.record_many([(user_id, cohort, metrics)])
+
+    def record_many(self, records):
+        """Store (user_id, cohort, metrics) records in one transaction; see record()."""
+        rows = []
+        count = 0
+        for user_id, cohort, metrics in records:
+            user_hash = self._user_hash(user_id)
+            band = tuple(cohort.get(field, UNKNOWN) for field in COHORT_FIELDS)
+            rows.extend((user_hash, metric, float(value)) + band for metric, value in metrics.items())
+            count += 1
+        conn = self._connect()
+        conn.executemany(
+            'INSERT OR REPLACE INTO user_metrics (user_hash, metric, value, age_band, income_band, household) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        conn.execute('UPDATE refresh_state SET pending = pending + ?', (count,))
+        pending = conn.execute('SELECT pending FROM refresh_state').fetchone()[0]
+        conn.commit()
+        conn.close()
+
+        if pending >= self.refresh_batch:
+            self.refresh()
+
+    def user_metrics(self, user_id):
+        """
+        A user's stored metrics.
+
+        Returns:
+            Dict with cohort and metrics, or None when nothing is stored
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            'SELECT metric, value, age_band, income_band, household FROM user_metrics WHERE user_hash = ?',
+            (self._user_hash(user_id),)
+        ).fetchall()
+        conn.close()
+        if not rows:
+            return None
+        return {
+            'cohort': dict(zip(COHORT_FIELDS, rows[0][2:])),
+            'metrics': {metric: value for metric, value, *_ in rows},
+        }
+
+    def delete(self, user_id):
+        """
+        Delete a user's stored metrics; the tables drop them at the next refresh.
+
+        Returns:
+            Whether any metrics were stored
+        """
+        conn = self._connect()
+        deleted = conn.execute('DELETE FROM user_metrics WHERE user_hash = ?', (self._user_hash(user_id),)).rowcount
+        if deleted:
+            conn.execute('UPDATE refresh_state SET pending = pending + 1')
+        pending = conn.execute('SELECT pending FROM refresh_state').fetchone()[0]
+        conn.commit()
+        conn.close()
+
+        if pending >= self.refresh_batch:
+            self.refresh()
+        return deleted > 0
+
+    @property
+    def pending(self):
+        """Records stored since the last refresh"""
+        conn = self._connect()
+        pending = conn.execute('SELECT pending FROM refresh_state').fetchone()[0]
+        conn.close()
+        return pending
+
+    def refresh(self):
+        """Rebuild every cohort's percentile tables from the stored metrics."""
+        with self._refresh_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        conn = self._connect()
+        # Records arriving after this read stay pending for the next refresh
+        pending = conn.execute('SELECT pending FROM refresh_state').fetchone()[0]
+        metrics = pd.read_sql_query(
+            'SELECT metric, value, age_band, income_band, household FROM user_metrics', conn
+        )
+
+        rows = []
+        for fields in COHORT_LEVELS:
+            keys = list(fields) + ['metric']
+            grouped = metrics.groupby(keys, sort=False)['value']
+            stats = grouped.agg(['size', 'mean'])
+            breakpoints = grouped.quantile(TABLE_QUANTILES).unstack()
+            for key, (users, mean), points in zip(stats.index, stats.itertuples(index=False),
+                                                  breakpoints.loc[stats.index].to_numpy()):
+                key = key if isinstance(key, tuple) else (key,)
+                cohort = _cohort_key(dict(zip(fields, key[:-1])), fields)
+                rows.append((cohort, key[-1], int(users), float(mean), ','.join(repr(float(x)) for x in points)))
+
+        conn.execute('DELETE FROM percentile_tables')
+        conn.executemany(
+            'INSERT INTO percentile_tables (cohort, metric, users, mean, breakpoints) VALUES (?, ?, ?, ?, ?)', rows
+        )
+        conn.execute('UPDATE refresh_state SET pending = MAX(pending - ?, 0), generation = generation + 1',
+                     (pending,))
+        generation = conn.execute('SELECT generation FROM refresh_state').fetchone()[0]
+        conn.commit()
+        conn.close()
+        self.tables, self.generation = _tables(rows), generation
+
+    def _table(self, cohort, metric):
+        """
+        Most specific table for the cohort with at least min_cohort_size users.
+        Smaller tables, the global one included, are never used: they would
+        reveal individual users' values.
+        """
+        tables = self._current_tables()
+        for fields in COHORT_LEVELS:
+            key = _cohort_key(cohort, fields)
+            table = tables.get((key, metric))
+            if table is not None and table[0] >= self.min_cohort_size:
+                return key, table
+        return None, None
+
+    def percentile(self, cohort, metric, value):
+        """
+        Percentile rank (0-100) of value among the cohort's users.
+
+        Returns:
+            Dict with percentile, cohort (the key of the table used),
+            cohort_size, median and mean; all None when no cohort level has
+            min_cohort_size users
+        """
+        key, table = self._table(cohort, metric)
+        if table is None or value is None:
+            return {'percentile': None, 'cohort': key, 'cohort_size': 0, 'median': None, 'mean': None}
+        users, mean, breakpoints = table
+        # Position of value among the breakpoints, ties counted half
+        position = (bisect_left(breakpoints, value) + bisect_right(breakpoints, value)) / 2
+        return {
+            'percentile': float(round(100 * position / len(breakpoints), 1)),
+            'cohort': key,
+            'cohort_size': users,
+            'median': breakpoints[len(breakpoints) // 2],
+            'mean': mean,
+        }
+
+    def benchmark(self, cohort, metrics):
+        """Percentile ranks of several metrics; see percentile()."""
+        return {metric: self.percentile(cohort, metric, value) for metric, value in metrics.items()}
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def benchmarks_enabled():
+    """Whether peer benchmarks are configured (they are opt-in, with BENCHMARK_DB_PATH)."""
+    return bool(os.getenv('BENCHMARK_DB_PATH'))
+
+
+def get_benchmark_store():
+    """Return the process-wide benchmark store (database from BENCHMARK_DB_PATH)."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = BenchmarkStore(os.getenv('BENCHMARK_DB_PATH', DEFAULT_DB_PATH))
+    return _default_store
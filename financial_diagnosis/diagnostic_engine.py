@@ -2,10 +2,157 @@
 Comprehensive Financial Diagnostic Engine
 Analyzes data across 10 key financial categories and generates health scores
 """
+import math
+import re
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from collections import defaultdict
+from .prepared import PreparedTransactions
+from .merchants import merchant_keys
+from .cohort_benchmarks import cohort_for
+
+
+# Description keywords (matched case-insensitively anywhere in the text) that
+# tag a transaction for the keyword-based diagnostics
+DIAGNOSTIC_TAGS = {
+    'debt': ['loan', 'credit card', 'mortgage', 'debt', 'financing', 'installment'],
+    'investment': ['invest', 'stock', 'bond', 'etf', 'mutual fund', 'dividend', 'capital gain'],
+    'insurance': ['insurance', 'premium', 'policy', 'coverage', 'insurer'],
+    'credit': ['credit card', 'cc payment', 'visa', 'mastercard', 'amex'],
+    'tax': ['tax', 'irs', 'hmrc', 'revenue', 'withholding', 'refund'],
+}
+
+_TAG_PATTERNS = {
+    tag: re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+    for tag, keywords in DIAGNOSTIC_TAGS.items()
+}
+_ANY_TAG_PATTERN = re.compile('|'.join(pattern.pattern for pattern in _TAG_PATTERNS.values()))
+
+
+def tag_descriptions(descriptions):
+    """
+    Tag descriptions with every DIAGNOSTIC_TAGS tag whose keywords they contain.
+
+    Each distinct description is lower-cased once. One combined pattern finds
+    the descriptions with any keyword, and only those are matched per tag.
+
+    Args:
+        descriptions: Series of transaction descriptions
+
+    Returns:
+        Boolean DataFrame aligned with descriptions, one column per tag
+    """
+    codes, uniques = pd.factorize(descriptions)
+    lowered = pd.Series(uniques, dtype=object).astype(str).str.lower()
+
+    # The extra last row stays False, for missing descriptions (code -1)
+    unique_tags = np.zeros((len(lowered) + 1, len(_TAG_PATTERNS)), dtype=bool)
+    hits = lowered[lowered.str.contains(_ANY_TAG_PATTERN)]
+    for column, pattern in enumerate(_TAG_PATTERNS.values()):
+        unique_tags[hits.index, column] = hits.str.contains(pattern).to_numpy(dtype=bool)
+
+    return pd.DataFrame(unique_tags[codes], index=descriptions.index, columns=list(_TAG_PATTERNS))
+
+
+# Letter grades by minimum overall score
+GRADES = [
+    (90, 'A+'), (85, 'A'), (80, 'A-'), (75, 'B+'), (70, 'B'), (65, 'B-'),
+    (60, 'C+'), (55, 'C'), (50, 'C-'), (45, 'D+'), (40, 'D'),
+]
+
+# Expense categories counted as essential spending
+ESSENTIAL_KEYWORDS = ['grocery', 'groceries', 'rent', 'mortgage', 'utilities', 'insurance', 'health', 'medical']
+
+
+def grade_for(score):
+    """Convert an overall score to a letter grade"""
+    for minimum, grade in GRADES:
+        if score >= minimum:
+            return grade
+    return 'F'
+
+
+DiagnosticPlugin = namedtuple('DiagnosticPlugin', ['name', 'requires', 'func', 'weight'])
+
+# Gaps (missing data to ask the user about) and risks found by one diagnostic
+Findings = namedtuple('Findings', ['gaps', 'risks'])
+
+DIAGNOSTIC_PLUGINS = {}
+
+# Inputs that diagnostics may list in requires
+DIAGNOSTIC_INPUTS = ('transactions', 'prepared', 'cube', 'tags', 'accounts', 'user_profile')
+
+
+def diagnostic(name, requires=(), weight=0.0):
+    """
+    Register a diagnostic plugin; usable as a function decorator.
+
+    The plugin function receives a context dict holding the inputs listed in
+    requires (see DIAGNOSTIC_INPUTS) and a Findings whose gaps and risks
+    lists it may append to, and returns its result dict with a 'score'
+    from 0 to 100. weight is the diagnostic's share of the overall score.
+    """
+    def register(func):
+        DIAGNOSTIC_PLUGINS[name] = DiagnosticPlugin(name, tuple(requires), func, weight)
+        return func
+    return register
+
+
+def resolve_diagnostics(diagnostics=None):
+    """
+    Look up the plugins for the requested diagnostics.
+
+    Args:
+        diagnostics: Diagnostic names, or None for every registered one
+
+    Returns:
+        DiagnosticPlugins in registration order
+    """
+    if diagnostics is None:
+        return list(DIAGNOSTIC_PLUGINS.values())
+    unknown = [name for name in diagnostics if name not in DIAGNOSTIC_PLUGINS]
+    if unknown:
+        raise ValueError(f"Unknown diagnostics: {', '.join(unknown)}")
+    return [plugin for name, plugin in DIAGNOSTIC_PLUGINS.items() if name in diagnostics]
+
+
+def _average_monthly(cube, transaction_type, default):
+    """Mean monthly total for a transaction type, or default when it has no rows"""
+    monthly = cube.sums('month', transaction_type)
+    return float(monthly.mean()) if len(monthly) > 0 else default
+
+
+def _tagged(context, tag):
+    """Transactions whose description carries a DIAGNOSTIC_TAGS tag"""
+    return context['transactions'][context['tags'][tag].to_numpy()]
+
+
+def _run_plugin(plugin, context, trace_memory):
+    """
+    Run one diagnostic and measure it.
+
+    Returns:
+        (result, Findings, seconds, peak bytes allocated or None)
+    """
+    findings = Findings([], [])
+    inputs = {name: context[name] for name in plugin.requires}
+    if trace_memory:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        result = plugin.func(inputs, findings)
+    except Exception as e:
+        # Findings of a diagnostic that did not finish are dropped
+        result, findings = {'error': str(e) or type(e).__name__}, Findings([], [])
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - baseline if trace_memory else None
+    return result, findings, seconds, peak
 
 
 class FinancialDiagnostics:
@@ -14,37 +161,83 @@ class FinancialDiagnostics:
     1. Income, 2. Expenses, 3. Debt & Liabilities, 4. Assets & Investments,
     5. Insurance, 6. Financial Goals, 7. Budgeting, 8. Credit Health,
     9. Tax Situation, 10. Financial Behavior
+    
+    Each category is a plugin in DIAGNOSTIC_PLUGINS; register more with
+    @diagnostic.
     """
     
-    def __init__(self, transactions_df, accounts_df, user_profile=None):
-        self.transactions = transactions_df.copy()
+    def __init__(self, transactions_df, accounts_df, user_profile=None, benchmark_store=None):
+        """
+        Args:
+            transactions_df: Transaction DataFrame, or PreparedTransactions
+                shared with the other analytics stages (used without copying)
+            accounts_df: Accounts DataFrame with a 'balance' column
+            user_profile: Optional dict with user-supplied data such as
+                goals, age and household
+            benchmark_store: Optional BenchmarkStore; when given, the report
+                ranks the scores against the user's cohort
+        """
+        if isinstance(transactions_df, PreparedTransactions):
+            self.transactions = transactions_df
+        else:
+            self.transactions = transactions_df.copy()
         self.accounts = accounts_df.copy()
         self.user_profile = user_profile or {}
+        self.benchmark_store = benchmark_store
         self.diagnostics = {}
         self.gaps = []
         self.risks = []
         self.overall_score = 0
-        
-    def run_full_diagnostic(self):
-        """Execute complete diagnostic analysis across all categories"""
+        self.timings = {}
+        
+    def run_full_diagnostic(self, diagnostics=None, workers=1, trace_memory=False):
+        """
+        Execute complete diagnostic analysis across all categories
+        
+        Args:
+            diagnostics: Names of the diagnostics to run (default: every
+                registered one); the overall score is weighted over these
+            workers: Threads to run the diagnostics on; 1 runs them serially
+            trace_memory: Record each diagnostic's peak allocation with
+                tracemalloc (serial runs only; allocations of concurrent
+                diagnostics can't be told apart)
+        
+        Returns:
+            Report dict; 'timings' holds each diagnostic's seconds and
+            peak_memory_bytes (None unless traced). A diagnostic that raises
+            is reported as {'error': message} and scores 0. With a benchmark
+            store, 'peer_benchmarks' holds the percentile rank of the overall
+            score and of each '<diagnostic>_score'.
+        """
+        plugins = resolve_diagnostics(diagnostics)
         
         # Prepare data
-        self._prepare_data()
-        
-        # Run diagnostics for each category
-        self.diagnostics['income'] = self._diagnose_income()
-        self.diagnostics['expenses'] = self._diagnose_expenses()
-        self.diagnostics['debt_liabilities'] = self._diagnose_debt()
-        self.diagnostics['assets_investments'] = self._diagnose_assets()
-        self.diagnostics['insurance'] = self._diagnose_insurance()
-        self.diagnostics['financial_goals'] = self._diagnose_goals()
-        self.diagnostics['budgeting'] = self._diagnose_budgeting()
-        self.diagnostics['credit_health'] = self._diagnose_credit()
-        self.diagnostics['tax_situation'] = self._diagnose_taxes()
-        self.diagnostics['financial_behavior'] = self._diagnose_behavior()
+        self._prepare_data(plugins)
+        
+        # Run the diagnostics; findings are merged in registration order
+        trace_memory = trace_memory and workers <= 1
+        started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=min(workers, len(plugins))) as pool:
+                    futures = [pool.submit(_run_plugin, plugin, self.context, False) for plugin in plugins]
+                    outcomes = [future.result() for future in futures]
+            else:
+                outcomes = [_run_plugin(plugin, self.context, trace_memory) for plugin in plugins]
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        
+        for plugin, (result, findings, seconds, peak) in zip(plugins, outcomes):
+            self.diagnostics[plugin.name] = result
+            self.gaps.extend(findings.gaps)
+            self.risks.extend(findings.risks)
+            self.timings[plugin.name] = {'seconds': seconds, 'peak_memory_bytes': peak}
         
         # Calculate overall health score
-        self._calculate_overall_score()
+        self._calculate_overall_score(plugins)
         
         # Generate recommendations
         recommendations = self._generate_recommendations()
@@ -52,617 +245,70 @@ class FinancialDiagnostics:
         # Identify data gaps for questionnaire
         questionnaire = self._generate_questionnaire()
         
-        return {
+        report = {
             'diagnostics': self.diagnostics,
             'overall_score': self.overall_score,
             'grade': self._get_grade(self.overall_score),
             'gaps': self.gaps,
             'risks': self.risks,
             'recommendations': recommendations,
-            'questionnaire': questionnaire
-        }
-    
-    def _prepare_data(self):
-        """Prepare and enrich transaction data"""
-        df = self.transactions
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
-        df['month'] = df['date'].dt.to_period('M')
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-        df = df.dropna(subset=['amount'])
-        self.transactions = df
-        
-    def _diagnose_income(self):
-        """Category 1: Income Analysis"""
-        df = self.transactions[self.transactions['type'] == 'income']
-        
-        if len(df) == 0:
-            self.gaps.append('No income data found - unable to assess income stability')
-            return {'score': 0, 'status': 'critical', 'data_available': False}
-        
-        # Extract income sources
-        monthly_income = df.groupby('month')['amount'].sum()
-        avg_monthly_income = float(monthly_income.mean()) if len(monthly_income) > 0 else 0
-        income_stability = 1 - (float(monthly_income.std()) / avg_monthly_income if avg_monthly_income > 0 else 1)
-        
-        # Identify income sources
-        income_sources = df.groupby('description')['amount'].agg(['sum', 'count']).reset_index()
-        income_sources = income_sources.sort_values('sum', ascending=False)
-        
-        primary_income = float(income_sources.iloc[0]['sum']) if len(income_sources) > 0 else 0
-        primary_dependency = primary_income / df['amount'].sum() if df['amount'].sum() > 0 else 1
-        
-        # Scoring
-        score = 0
-        if avg_monthly_income > 3000:
-            score += 30
-        elif avg_monthly_income > 2000:
-            score += 20
-        elif avg_monthly_income > 1000:
-            score += 10
-        
-        if income_stability > 0.8:
-            score += 30
-        elif income_stability > 0.6:
-            score += 20
-        elif income_stability > 0.4:
-            score += 10
-        
-        if primary_dependency < 0.8:  # Diversified income is good
-            score += 20
-        elif primary_dependency < 0.95:
-            score += 10
-        
-        # Income growth
-        if len(monthly_income) >= 3:
-            recent_avg = float(monthly_income.iloc[-3:].mean())
-            older_avg = float(monthly_income.iloc[:-3].mean()) if len(monthly_income) > 3 else recent_avg
-            if recent_avg > older_avg * 1.1:
-                score += 20
-            elif recent_avg > older_avg:
-                score += 10
-        
-        status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
-        
-        return {
-            'score': min(score, 100),
-            'status': status,
-            'avg_monthly_income': avg_monthly_income,
-            'stability': income_stability,
-            'sources': len(income_sources),
-            'primary_dependency': primary_dependency,
-            'data_available': True,
-            'details': {
-                'top_sources': income_sources.head(5).to_dict('records')
-            }
-        }
-    
-    def _diagnose_expenses(self):
-        """Category 2: Expenses Analysis"""
-        df = self.transactions[self.transactions['type'] == 'expense']
-        
-        if len(df) == 0:
-            return {'score': 50, 'status': 'unknown', 'data_available': False}
-        
-        monthly_expenses = df.groupby('month')['amount'].sum()
-        avg_monthly_expenses = float(monthly_expenses.mean())
-        
-        # Categorize expenses
-        category_spending = df.groupby('category')['amount'].sum().sort_values(ascending=False)
-        
-        # Essential vs discretionary (simple heuristics)
-        essential_keywords = ['grocery', 'groceries', 'rent', 'mortgage', 'utilities', 'insurance', 'health', 'medical']
-        essential_spending = sum([float(category_spending.get(cat, 0)) for cat in category_spending.index 
-                                 if any(kw in str(cat).lower() for kw in essential_keywords)])
-        total_spending = float(df['amount'].sum())
-        essential_ratio = essential_spending / total_spending if total_spending > 0 else 0
-        
-        # Get income for comparison
-        income_df = self.transactions[self.transactions['type'] == 'income']
-        avg_income = float(income_df.groupby('month')['amount'].sum().mean()) if len(income_df) > 0 else 0
-        
-        expense_ratio = avg_monthly_expenses / avg_income if avg_income > 0 else 1
-        
-        # Scoring
-        score = 0
-        if expense_ratio < 0.5:
-            score += 40
-        elif expense_ratio < 0.7:
-            score += 30
-        elif expense_ratio < 0.9:
-            score += 20
-        else:
-            score += 0
-            self.risks.append(f'High expense ratio: {expense_ratio*100:.0f}% of income')
-        
-        if essential_ratio > 0.5 and essential_ratio < 0.8:
-            score += 30
-        elif essential_ratio >= 0.8:
-            score += 20
-        else:
-            score += 10
-        
-        # Expense trend
-        if len(monthly_expenses) >= 3:
-            recent = float(monthly_expenses.iloc[-3:].mean())
-            older = float(monthly_expenses.iloc[:-3].mean()) if len(monthly_expenses) > 3 else recent
-            if recent < older * 1.1:
-                score += 30
-            elif recent < older * 1.2:
-                score += 15
-        
-        status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
-        
-        return {
-            'score': score,
-            'status': status,
-            'avg_monthly_expenses': avg_monthly_expenses,
-            'expense_ratio': expense_ratio,
-            'essential_ratio': essential_ratio,
-            'top_categories': category_spending.head(5).to_dict(),
-            'data_available': True
-        }
-    
-    def _diagnose_debt(self):
-        """Category 3: Debt & Liabilities"""
-        df = self.transactions
-        
-        # Identify debt payments
-        debt_keywords = ['loan', 'credit card', 'mortgage', 'debt', 'financing', 'installment']
-        debt_payments = df[df['description'].str.contains('|'.join(debt_keywords), case=False, na=False)]
-        
-        if len(debt_payments) == 0:
-            # Could be good (no debt) or missing data
-            self.gaps.append('No debt payments detected - please confirm if you have any loans or credit cards')
-            return {'score': 70, 'status': 'assumed_no_debt', 'data_available': False}
-        
-        monthly_debt = debt_payments.groupby('month')['amount'].sum()
-        avg_monthly_debt = float(monthly_debt.mean())
-        
-        income_df = self.transactions[self.transactions['type'] == 'income']
-        avg_income = float(income_df.groupby('month')['amount'].sum().mean()) if len(income_df) > 0 else 1
-        
-        debt_to_income = avg_monthly_debt / avg_income if avg_income > 0 else 0
-        
-        # Scoring
-        score = 100
-        if debt_to_income > 0.5:
-            score = 20
-            self.risks.append(f'Very high debt-to-income ratio: {debt_to_income*100:.0f}%')
-        elif debt_to_income > 0.36:
-            score = 40
-            self.risks.append(f'High debt-to-income ratio: {debt_to_income*100:.0f}%')
-        elif debt_to_income > 0.28:
-            score = 60
-        elif debt_to_income > 0.15:
-            score = 80
-        
-        status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
-        
-        return {
-            'score': score,
-            'status': status,
-            'avg_monthly_debt': avg_monthly_debt,
-            'debt_to_income': debt_to_income,
-            'debt_types': len(debt_payments['description'].unique()),
-            'data_available': True
-        }
-    
-    def _diagnose_assets(self):
-        """Category 4: Assets & Investments"""
-        
-        # Check account balances
-        total_balance = float(self.accounts['balance'].sum()) if len(self.accounts) > 0 else 0
-        
-        # Look for investment transactions
-        investment_keywords = ['invest', 'stock', 'bond', 'etf', 'mutual fund', 'dividend', 'capital gain']
-        investments = self.transactions[self.transactions['description'].str.contains('|'.join(investment_keywords), case=False, na=False)]
-        
-        has_investments = len(investments) > 0
-        investment_rate = len(investments) / len(self.transactions) if len(self.transactions) > 0 else 0
-        
-        # Get monthly income for ratio calculation
-        income_df = self.transactions[self.transactions['type'] == 'income']
-        avg_income = float(income_df.groupby('month')['amount'].sum().mean()) if len(income_df) > 0 else 1
-        
-        # Calculate months of expenses covered by assets
-        expense_df = self.transactions[self.transactions['type'] == 'expense']
-        avg_expenses = float(expense_df.groupby('month')['amount'].sum().mean()) if len(expense_df) > 0 else 1
-        emergency_fund_months = total_balance / avg_expenses if avg_expenses > 0 else 0
-        
-        # Scoring
-        score = 0
-        
-        # Emergency fund scoring
-        if emergency_fund_months >= 6:
-            score += 40
-        elif emergency_fund_months >= 3:
-            score += 30
-        elif emergency_fund_months >= 1:
-            score += 15
-        else:
-            self.risks.append(f'Insufficient emergency fund: only {emergency_fund_months:.1f} months of expenses')
-        
-        # Investment activity
-        if has_investments:
-            score += 30
-            if investment_rate > 0.05:
-                score += 20
-            elif investment_rate > 0.02:
-                score += 10
-        else:
-            self.gaps.append('No investment activity detected - consider building an investment portfolio')
-            score += 10
-        
-        # Asset to income ratio
-        asset_to_income = total_balance / (avg_income * 12) if avg_income > 0 else 0
-        if asset_to_income > 1:
-            score += 10
-        
-        status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
-        
-        return {
-            'score': score,
-            'status': status,
-            'total_balance': total_balance,
-            'emergency_fund_months': emergency_fund_months,
-            'has_investments': has_investments,
-            'investment_activity': investment_rate * 100,
-            'data_available': True
-        }
-    
-    def _diagnose_insurance(self):
-        """Category 5: Insurance Coverage"""
-        
-        insurance_keywords = ['insurance', 'premium', 'policy', 'coverage', 'insurer']
-        insurance_payments = self.transactions[
-            self.transactions['description'].str.contains('|'.join(insurance_keywords), case=False, na=False)
-        ]
-        
-        if len(insurance_payments) == 0:
-            self.gaps.append('No insurance payments detected - please confirm your coverage status')
-            return {
-                'score': 30,
-                'status': 'unknown',
-                'data_available': False,
-                'needs_questionnaire': True
-            }
-        
-        # Analyze insurance spending
-        insurance_types = insurance_payments.groupby('description')['amount'].agg(['sum', 'count'])
-        monthly_premium = float(insurance_payments.groupby('month')['amount'].sum().mean())
-        
-        income_df = self.transactions[self.transactions['type'] == 'income']
-        avg_income = float(income_df.groupby('month')['amount'].sum().mean()) if len(income_df) > 0 else 1
-        insurance_ratio = monthly_premium / avg_income if avg_income > 0 else 0
-        
-        # Scoring (having insurance is good, but need to verify types via questionnaire)
-        score = 50  # Base score for having some insurance
-        
-        if len(insurance_types) >= 2:
-            score += 20
-        if insurance_ratio > 0.02 and insurance_ratio < 0.15:
-            score += 30
-        
-        return {
-            'score': score,
-            'status': 'partial',
-            'monthly_premium': monthly_premium,
-            'insurance_types_detected': len(insurance_types),
-            'insurance_ratio': insurance_ratio,
-            'data_available': True,
-            'needs_questionnaire': True
-        }
-    
-    def _diagnose_goals(self):
-        """Category 6: Financial Goals"""
-        
-        # Goals typically require user input
-        user_goals = self.user_profile.get('goals', [])
-        
-        if not user_goals:
-            self.gaps.append('No financial goals defined - goal setting is crucial for financial success')
-            return {
-                'score': 40,
-                'status': 'undefined',
-                'data_available': False,
-                'needs_questionnaire': True
-            }
-        
-        # Analyze progress toward goals (if data available)
-        score = 60  # Base score for having goals
-        
-        # Check savings behavior as proxy for goal progress
-        savings_df = self.transactions[self.transactions['type'] == 'income']
-        expense_df = self.transactions[self.transactions['type'] == 'expense']
-        
-        if len(savings_df) > 0 and len(expense_df) > 0:
-            monthly_savings = savings_df.groupby('month')['amount'].sum() - expense_df.groupby('month')['amount'].sum()
-            avg_savings = float(monthly_savings.mean()) if len(monthly_savings) > 0 else 0
-            
-            if avg_savings > 0:
-                score += 40
-        
-        return {
-            'score': score,
-            'status': 'defined' if user_goals else 'undefined',
-            'goals_count': len(user_goals),
-            'data_available': bool(user_goals),
-            'needs_questionnaire': not bool(user_goals)
-        }
-    
-    def _diagnose_budgeting(self):
-        """Category 7: Budgeting & Spending Control"""
-        
-        income_df = self.transactions[self.transactions['type'] == 'income']
-        expense_df = self.transactions[self.transactions['type'] == 'expense']
-        
-        if len(income_df) == 0 or len(expense_df) == 0:
-            return {'score': 50, 'status': 'unknown', 'data_available': False}
-        
-        monthly_income = income_df.groupby('month')['amount'].sum()
-        monthly_expenses = expense_df.groupby('month')['amount'].sum()
-        monthly_savings = monthly_income - monthly_expenses
-        
-        avg_savings_rate = float(monthly_savings.mean() / monthly_income.mean() * 100) if monthly_income.mean() > 0 else 0
-        
-        # Consistency
-        savings_consistency = 1 - (float(monthly_savings.std()) / float(monthly_savings.mean())) if monthly_savings.mean() != 0 else 0
-        savings_consistency = max(0, min(1, savings_consistency))
-        
-        # Check if spending stays within income
-        overspending_months = sum(monthly_savings < 0)
-        total_months = len(monthly_savings)
-        
-        # Scoring
-        score = 0
-        
-        if avg_savings_rate >= 20:
-            score += 40
-        elif avg_savings_rate >= 15:
-            score += 30
-        elif avg_savings_rate >= 10:
-            score += 20
-        elif avg_savings_rate > 0:
-            score += 10
-        else:
-            self.risks.append(f'Negative savings rate: {avg_savings_rate:.1f}%')
-        
-        if overspending_months == 0:
-            score += 30
-        elif overspending_months <= total_months * 0.2:
-            score += 20
-        elif overspending_months <= total_months * 0.4:
-            score += 10
-        else:
-            self.risks.append(f'Frequent overspending: {overspending_months}/{total_months} months')
-        
-        if savings_consistency > 0.7:
-            score += 30
-        elif savings_consistency > 0.5:
-            score += 20
-        elif savings_consistency > 0.3:
-            score += 10
-        
-        status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
-        
-        return {
-            'score': score,
-            'status': status,
-            'avg_savings_rate': avg_savings_rate,
-            'overspending_months': int(overspending_months),
-            'savings_consistency': savings_consistency,
-            'data_available': True
+            'questionnaire': questionnaire,
+            'timings': self.timings
         }
+        if self.benchmark_store is not None:
+            report['peer_benchmarks'] = self._peer_benchmarks()
+        return report
     
-    def _diagnose_credit(self):
-        """Category 8: Credit Health"""
-        
-        # Look for credit card transactions
-        credit_keywords = ['credit card', 'cc payment', 'visa', 'mastercard', 'amex']
-        credit_txns = self.transactions[
-            self.transactions['description'].str.contains('|'.join(credit_keywords), case=False, na=False)
-        ]
-        
-        if len(credit_txns) == 0:
-            self.gaps.append('No credit card activity detected - unable to assess credit health')
-            return {
-                'score': 60,
-                'status': 'unknown',
-                'data_available': False,
-                'needs_questionnaire': True
-            }
-        
-        # Analyze payment behavior
-        monthly_cc_payments = credit_txns.groupby('month')['amount'].sum()
-        avg_cc_payment = float(monthly_cc_payments.mean())
-        
-        income_df = self.transactions[self.transactions['type'] == 'income']
-        avg_income = float(income_df.groupby('month')['amount'].sum().mean()) if len(income_df) > 0 else 1
-        
-        cc_to_income = avg_cc_payment / avg_income if avg_income > 0 else 0
-        
-        # Scoring
-        score = 50  # Base score
-        
-        if cc_to_income < 0.1:
-            score += 30
-        elif cc_to_income < 0.2:
-            score += 20
-        elif cc_to_income < 0.3:
-            score += 10
-        else:
-            self.risks.append(f'High credit card usage: {cc_to_income*100:.0f}% of income')
-        
-        # Regular payments (good sign)
-        if len(monthly_cc_payments) >= 3:
-            score += 20
-        
-        return {
-            'score': score,
-            'status': 'fair',
-            'avg_monthly_cc_payment': avg_cc_payment,
-            'cc_to_income_ratio': cc_to_income,
-            'data_available': True,
-            'needs_questionnaire': True  # For actual credit score
-        }
+    def _peer_benchmarks(self):
+        """Percentile ranks of the scores within the user's cohort"""
+        cohort = cohort_for(self.user_profile, _average_monthly(self.cube, 'income', 0.0))
+        scores = {'overall_score': self.overall_score}
+        for name, result in self.diagnostics.items():
+            if 'score' in result:
+                scores[f'{name}_score'] = result['score']
+        return self.benchmark_store.benchmark(cohort, scores)
     
-    def _diagnose_taxes(self):
-        """Category 9: Tax Situation"""
-        
-        tax_keywords = ['tax', 'irs', 'hmrc', 'revenue', 'withholding', 'refund']
-        tax_txns = self.transactions[
-            self.transactions['description'].str.contains('|'.join(tax_keywords), case=False, na=False)
-        ]
-        
-        if len(tax_txns) == 0:
-            self.gaps.append('No tax-related transactions detected - please verify your tax compliance')
-            return {
-                'score': 60,
-                'status': 'unknown',
-                'data_available': False,
-                'needs_questionnaire': True
-            }
-        
-        # Analyze tax payments
-        tax_payments = tax_txns[tax_txns['type'] == 'expense']
-        tax_refunds = tax_txns[tax_txns['type'] == 'income']
-        
-        total_tax_paid = float(tax_payments['amount'].sum()) if len(tax_payments) > 0 else 0
-        total_refunds = float(tax_refunds['amount'].sum()) if len(tax_refunds) > 0 else 0
-        
-        income_df = self.transactions[self.transactions['type'] == 'income']
-        total_income = float(income_df['amount'].sum()) if len(income_df) > 0 else 1
-        
-        effective_tax_rate = (total_tax_paid - total_refunds) / total_income if total_income > 0 else 0
-        
-        # Scoring (having tax activity shows compliance)
-        score = 70
-        
-        if len(tax_payments) > 0:
-            score += 20
-        if effective_tax_rate > 0 and effective_tax_rate < 0.4:
-            score += 10
-        
-        return {
-            'score': score,
-            'status': 'compliant',
-            'total_tax_paid': total_tax_paid,
-            'total_refunds': total_refunds,
-            'effective_tax_rate': effective_tax_rate * 100,
-            'data_available': True
+    def _prepare_data(self, plugins):
+        """Build the plugins' inputs (normalizing skipped for PreparedTransactions)"""
+        prepared = self.transactions
+        if not isinstance(prepared, PreparedTransactions):
+            prepared = PreparedTransactions.from_frame(prepared, copy=False)
+        self.prepared = prepared
+        self.transactions = prepared.frame
+        self.cube = prepared.cube
+        self.context = {
+            'transactions': self.transactions,
+            'prepared': prepared,
+            'cube': self.cube,
+            'accounts': self.accounts,
+            'user_profile': self.user_profile,
         }
-    
-    def _diagnose_behavior(self):
-        """Category 10: Financial Behavior Patterns"""
-        
-        df = self.transactions
-        
-        # Analyze spending consistency
-        expense_df = df[df['type'] == 'expense']
-        monthly_expenses = expense_df.groupby('month')['amount'].sum()
-        expense_volatility = float(monthly_expenses.std() / monthly_expenses.mean()) if len(monthly_expenses) > 0 and monthly_expenses.mean() > 0 else 0
-        
-        # Analyze savings behavior
-        income_df = df[df['type'] == 'income']
-        monthly_income = income_df.groupby('month')['amount'].sum()
-        monthly_savings = monthly_income - monthly_expenses
-        
-        positive_savings_months = sum(monthly_savings > 0) if len(monthly_savings) > 0 else 0
-        total_months = len(monthly_savings) if len(monthly_savings) > 0 else 1
         
-        # Transaction patterns
-        avg_transactions_per_month = len(df) / total_months if total_months > 0 else 0
+        # One keyword tagging pass shared by the debt, investment, insurance,
+        # credit and tax diagnostics
+        if any('tags' in plugin.requires for plugin in plugins):
+            self.context['tags'] = tag_descriptions(self.transactions['description'])
         
-        # Scoring
-        score = 0
-        
-        # Spending discipline
-        if expense_volatility < 0.2:
-            score += 30
-        elif expense_volatility < 0.4:
-            score += 20
-        elif expense_volatility < 0.6:
-            score += 10
-        
-        # Savings discipline
-        savings_discipline = positive_savings_months / total_months if total_months > 0 else 0
-        if savings_discipline >= 0.9:
-            score += 40
-        elif savings_discipline >= 0.75:
-            score += 30
-        elif savings_discipline >= 0.5:
-            score += 20
-        elif savings_discipline > 0:
-            score += 10
-        
-        # Transaction awareness (not too many small transactions)
-        if avg_transactions_per_month < 100:
-            score += 30
-        elif avg_transactions_per_month < 200:
-            score += 20
-        elif avg_transactions_per_month < 300:
-            score += 10
-        
-        status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
-        
-        return {
-            'score': score,
-            'status': status,
-            'expense_volatility': expense_volatility,
-            'savings_discipline': savings_discipline,
-            'avg_transactions_per_month': int(avg_transactions_per_month),
-            'data_available': True
-        }
+        # Split income and expenses before plugins may read them concurrently
+        prepared.income, prepared.expenses
     
-    def _calculate_overall_score(self):
+    def _calculate_overall_score(self, plugins):
         """Calculate weighted overall financial health score"""
-        weights = {
-            'income': 0.15,
-            'expenses': 0.10,
-            'debt_liabilities': 0.15,
-            'assets_investments': 0.15,
-            'insurance': 0.05,
-            'financial_goals': 0.05,
-            'budgeting': 0.15,
-            'credit_health': 0.10,
-            'tax_situation': 0.05,
-            'financial_behavior': 0.05
-        }
-        
         total_score = 0
-        for category, weight in weights.items():
-            category_score = self.diagnostics.get(category, {}).get('score', 0)
-            total_score += category_score * weight
+        for plugin in plugins:
+            category_score = self.diagnostics.get(plugin.name, {}).get('score', 0)
+            total_score += category_score * plugin.weight
+        
+        # Rescale when only some diagnostics ran
+        total_weight = sum(plugin.weight for plugin in plugins)
+        if total_weight > 0 and not math.isclose(total_weight, 1.0):
+            total_score /= total_weight
         
         self.overall_score = round(total_score, 1)
     
     def _get_grade(self, score):
         """Convert score to letter grade"""
-        if score >= 90:
-            return 'A+'
-        elif score >= 85:
-            return 'A'
-        elif score >= 80:
-            return 'A-'
-        elif score >= 75:
-            return 'B+'
-        elif score >= 70:
-            return 'B'
-        elif score >= 65:
-            return 'B-'
-        elif score >= 60:
-            return 'C+'
-        elif score >= 55:
-            return 'C'
-        elif score >= 50:
-            return 'C-'
-        elif score >= 45:
-            return 'D+'
-        elif score >= 40:
-            return 'D'
-        else:
-            return 'F'
+        return grade_for(score)
     
     def _generate_recommendations(self):
         """Generate actionable recommendations based on diagnostics"""
@@ -777,3 +423,562 @@ class FinancialDiagnostics:
                 })
         
         return questions
+
+
+# Built-in diagnostics, weighted to a total of 1.0
+@diagnostic('income', requires=['prepared', 'cube'], weight=0.15)
+def _diagnose_income(context, findings):
+    """Category 1: Income Analysis"""
+    df = context['prepared'].income
+    
+    if len(df) == 0:
+        findings.gaps.append('No income data found - unable to assess income stability')
+        return {'score': 0, 'status': 'critical', 'data_available': False}
+    
+    # Extract income sources
+    monthly_income = context['cube'].sums('month', 'income')
+    avg_monthly_income = float(monthly_income.mean()) if len(monthly_income) > 0 else 0
+    income_stability = 1 - (float(monthly_income.std()) / avg_monthly_income if avg_monthly_income > 0 else 1)
+    
+    # Identify income sources (description variants of one payer grouped together)
+    income_sources = (
+        df.assign(merchant=merchant_keys(df['description']))
+        .groupby('merchant', observed=True)
+        .agg(description=('description', 'first'), sum=('amount', 'sum'), count=('amount', 'count'))
+        .reset_index(drop=True)
+    )
+    income_sources = income_sources.sort_values('sum', ascending=False)
+    
+    primary_income = float(income_sources.iloc[0]['sum']) if len(income_sources) > 0 else 0
+    primary_dependency = primary_income / df['amount'].sum() if df['amount'].sum() > 0 else 1
+    
+    # Scoring
+    score = 0
+    if avg_monthly_income > 3000:
+        score += 30
+    elif avg_monthly_income > 2000:
+        score += 20
+    elif avg_monthly_income > 1000:
+        score += 10
+    
+    if income_stability > 0.8:
+        score += 30
+    elif income_stability > 0.6:
+        score += 20
+    elif income_stability > 0.4:
+        score += 10
+    
+    if primary_dependency < 0.8:  # Diversified income is good
+        score += 20
+    elif primary_dependency < 0.95:
+        score += 10
+    
+    # Income growth
+    if len(monthly_income) >= 3:
+        recent_avg = float(monthly_income.iloc[-3:].mean())
+        older_avg = float(monthly_income.iloc[:-3].mean()) if len(monthly_income) > 3 else recent_avg
+        if recent_avg > older_avg * 1.1:
+            score += 20
+        elif recent_avg > older_avg:
+            score += 10
+    
+    status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
+    
+    return {
+        'score': min(score, 100),
+        'status': status,
+        'avg_monthly_income': avg_monthly_income,
+        'stability': income_stability,
+        'sources': len(income_sources),
+        'primary_dependency': primary_dependency,
+        'data_available': True,
+        'details': {
+            'top_sources': income_sources.head(5).to_dict('records')
+        }
+    }
+
+
+@diagnostic('expenses', requires=['prepared', 'cube'], weight=0.10)
+def _diagnose_expenses(context, findings):
+    """Category 2: Expenses Analysis"""
+    df = context['prepared'].expenses
+    
+    if len(df) == 0:
+        return {'score': 50, 'status': 'unknown', 'data_available': False}
+    
+    monthly_expenses = context['cube'].sums('month', 'expense')
+    avg_monthly_expenses = float(monthly_expenses.mean())
+    
+    # Categorize expenses
+    category_spending = context['cube'].sums('category', 'expense').sort_values(ascending=False)
+    
+    # Essential vs discretionary (simple heuristics)
+    essential_spending = sum([float(category_spending.get(cat, 0)) for cat in category_spending.index 
+                             if any(kw in str(cat).lower() for kw in ESSENTIAL_KEYWORDS)])
+    total_spending = float(df['amount'].sum())
+    essential_ratio = essential_spending / total_spending if total_spending > 0 else 0
+    
+    # Get income for comparison
+    avg_income = _average_monthly(context['cube'], 'income', 0)
+    
+    expense_ratio = avg_monthly_expenses / avg_income if avg_income > 0 else 1
+    
+    # Scoring
+    score = 0
+    if expense_ratio < 0.5:
+        score += 40
+    elif expense_ratio < 0.7:
+        score += 30
+    elif expense_ratio < 0.9:
+        score += 20
+    else:
+        score += 0
+        findings.risks.append(f'High expense ratio: {expense_ratio*100:.0f}% of income')
+    
+    if essential_ratio > 0.5 and essential_ratio < 0.8:
+        score += 30
+    elif essential_ratio >= 0.8:
+        score += 20
+    else:
+        score += 10
+    
+    # Expense trend
+    if len(monthly_expenses) >= 3:
+        recent = float(monthly_expenses.iloc[-3:].mean())
+        older = float(monthly_expenses.iloc[:-3].mean()) if len(monthly_expenses) > 3 else recent
+        if recent < older * 1.1:
+            score += 30
+        elif recent < older * 1.2:
+            score += 15
+    
+    status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
+    
+    return {
+        'score': score,
+        'status': status,
+        'avg_monthly_expenses': avg_monthly_expenses,
+        'expense_ratio': expense_ratio,
+        'essential_ratio': essential_ratio,
+        'top_categories': category_spending.head(5).to_dict(),
+        'data_available': True
+    }
+
+
+@diagnostic('debt_liabilities', requires=['transactions', 'cube', 'tags'], weight=0.15)
+def _diagnose_debt(context, findings):
+    """Category 3: Debt & Liabilities"""
+    
+    # Identify debt payments
+    debt_payments = _tagged(context, 'debt')
+    
+    if len(debt_payments) == 0:
+        # Could be good (no debt) or missing data
+        findings.gaps.append('No debt payments detected - please confirm if you have any loans or credit cards')
+        return {'score': 70, 'status': 'assumed_no_debt', 'data_available': False}
+    
+    monthly_debt = debt_payments.groupby('month')['amount'].sum()
+    avg_monthly_debt = float(monthly_debt.mean())
+    
+    avg_income = _average_monthly(context['cube'], 'income', 1)
+    
+    debt_to_income = avg_monthly_debt / avg_income if avg_income > 0 else 0
+    
+    # Scoring
+    score = 100
+    if debt_to_income > 0.5:
+        score = 20
+        findings.risks.append(f'Very high debt-to-income ratio: {debt_to_income*100:.0f}%')
+    elif debt_to_income > 0.36:
+        score = 40
+        findings.risks.append(f'High debt-to-income ratio: {debt_to_income*100:.0f}%')
+    elif debt_to_income > 0.28:
+        score = 60
+    elif debt_to_income > 0.15:
+        score = 80
+    
+    status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
+    
+    return {
+        'score': score,
+        'status': status,
+        'avg_monthly_debt': avg_monthly_debt,
+        'debt_to_income': debt_to_income,
+        'debt_types': len(debt_payments['description'].unique()),
+        'data_available': True
+    }
+
+
+@diagnostic('assets_investments', requires=['transactions', 'cube', 'tags', 'accounts'], weight=0.15)
+def _diagnose_assets(context, findings):
+    """Category 4: Assets & Investments"""
+    
+    # Check account balances
+    total_balance = float(context['accounts']['balance'].sum()) if len(context['accounts']) > 0 else 0
+    
+    # Look for investment transactions
+    investments = _tagged(context, 'investment')
+    
+    has_investments = len(investments) > 0
+    investment_rate = len(investments) / len(context['transactions']) if len(context['transactions']) > 0 else 0
+    
+    # Get monthly income for ratio calculation
+    avg_income = _average_monthly(context['cube'], 'income', 1)
+    
+    # Calculate months of expenses covered by assets
+    avg_expenses = _average_monthly(context['cube'], 'expense', 1)
+    emergency_fund_months = total_balance / avg_expenses if avg_expenses > 0 else 0
+    
+    # Scoring
+    score = 0
+    
+    # Emergency fund scoring
+    if emergency_fund_months >= 6:
+        score += 40
+    elif emergency_fund_months >= 3:
+        score += 30
+    elif emergency_fund_months >= 1:
+        score += 15
+    else:
+        findings.risks.append(f'Insufficient emergency fund: only {emergency_fund_months:.1f} months of expenses')
+    
+    # Investment activity
+    if has_investments:
+        score += 30
+        if investment_rate > 0.05:
+            score += 20
+        elif investment_rate > 0.02:
+            score += 10
+    else:
+        findings.gaps.append('No investment activity detected - consider building an investment portfolio')
+        score += 10
+    
+    # Asset to income ratio
+    asset_to_income = total_balance / (avg_income * 12) if avg_income > 0 else 0
+    if asset_to_income > 1:
+        score += 10
+    
+    status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
+    
+    return {
+        'score': score,
+        'status': status,
+        'total_balance': total_balance,
+        'emergency_fund_months': emergency_fund_months,
+        'has_investments': has_investments,
+        'investment_activity': investment_rate * 100,
+        'data_available': True
+    }
+
+
+@diagnostic('insurance', requires=['transactions', 'cube', 'tags'], weight=0.05)
+def _diagnose_insurance(context, findings):
+    """Category 5: Insurance Coverage"""
+    
+    insurance_payments = _tagged(context, 'insurance')
+    
+    if len(insurance_payments) == 0:
+        findings.gaps.append('No insurance payments detected - please confirm your coverage status')
+        return {
+            'score': 30,
+            'status': 'unknown',
+            'data_available': False,
+            'needs_questionnaire': True
+        }
+    
+    # Analyze insurance spending
+    insurance_types = insurance_payments.groupby('description')['amount'].agg(['sum', 'count'])
+    monthly_premium = float(insurance_payments.groupby('month')['amount'].sum().mean())
+    
+    avg_income = _average_monthly(context['cube'], 'income', 1)
+    insurance_ratio = monthly_premium / avg_income if avg_income > 0 else 0
+    
+    # Scoring (having insurance is good, but need to verify types via questionnaire)
+    score = 50  # Base score for having some insurance
+    
+    if len(insurance_types) >= 2:
+        score += 20
+    if insurance_ratio > 0.02 and insurance_ratio < 0.15:
+        score += 30
+    
+    return {
+        'score': score,
+        'status': 'partial',
+        'monthly_premium': monthly_premium,
+        'insurance_types_detected': len(insurance_types),
+        'insurance_ratio': insurance_ratio,
+        'data_available': True,
+        'needs_questionnaire': True
+    }
+
+
+@diagnostic('financial_goals', requires=['prepared', 'cube', 'user_profile'], weight=0.05)
+def _diagnose_goals(context, findings):
+    """Category 6: Financial Goals"""
+    
+    # Goals typically require user input
+    user_goals = context['user_profile'].get('goals', [])
+    
+    if not user_goals:
+        findings.gaps.append('No financial goals defined - goal setting is crucial for financial success')
+        return {
+            'score': 40,
+            'status': 'undefined',
+            'data_available': False,
+            'needs_questionnaire': True
+        }
+    
+    # Analyze progress toward goals (if data available)
+    score = 60  # Base score for having goals
+    
+    # Check savings behavior as proxy for goal progress
+    savings_df = context['prepared'].income
+    expense_df = context['prepared'].expenses
+    
+    if len(savings_df) > 0 and len(expense_df) > 0:
+        monthly_savings = context['cube'].sums('month', 'income') - context['cube'].sums('month', 'expense')
+        avg_savings = float(monthly_savings.mean()) if len(monthly_savings) > 0 else 0
+        
+        if avg_savings > 0:
+            score += 40
+    
+    return {
+        'score': score,
+        'status': 'defined' if user_goals else 'undefined',
+        'goals_count': len(user_goals),
+        'data_available': bool(user_goals),
+        'needs_questionnaire': not bool(user_goals)
+    }
+
+
+@diagnostic('budgeting', requires=['prepared', 'cube'], weight=0.15)
+def _diagnose_budgeting(context, findings):
+    """Category 7: Budgeting & Spending Control"""
+    
+    income_df = context['prepared'].income
+    expense_df = context['prepared'].expenses
+    
+    if len(income_df) == 0 or len(expense_df) == 0:
+        return {'score': 50, 'status': 'unknown', 'data_available': False}
+    
+    monthly_income = context['cube'].sums('month', 'income')
+    monthly_expenses = context['cube'].sums('month', 'expense')
+    monthly_savings = monthly_income - monthly_expenses
+    
+    avg_savings_rate = float(monthly_savings.mean() / monthly_income.mean() * 100) if monthly_income.mean() > 0 else 0
+    
+    # Consistency
+    savings_consistency = 1 - (float(monthly_savings.std()) / float(monthly_savings.mean())) if monthly_savings.mean() != 0 else 0
+    savings_consistency = max(0, min(1, savings_consistency))
+    
+    # Check if spending stays within income
+    overspending_months = sum(monthly_savings < 0)
+    total_months = len(monthly_savings)
+    
+    # Scoring
+    score = 0
+    
+    if avg_savings_rate >= 20:
+        score += 40
+    elif avg_savings_rate >= 15:
+        score += 30
+    elif avg_savings_rate >= 10:
+        score += 20
+    elif avg_savings_rate > 0:
+        score += 10
+    else:
+        findings.risks.append(f'Negative savings rate: {avg_savings_rate:.1f}%')
+    
+    if overspending_months == 0:
+        score += 30
+    elif overspending_months <= total_months * 0.2:
+        score += 20
+    elif overspending_months <= total_months * 0.4:
+        score += 10
+    else:
+        findings.risks.append(f'Frequent overspending: {overspending_months}/{total_months} months')
+    
+    if savings_consistency > 0.7:
+        score += 30
+    elif savings_consistency > 0.5:
+        score += 20
+    elif savings_consistency > 0.3:
+        score += 10
+    
+    status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
+    
+    return {
+        'score': score,
+        'status': status,
+        'avg_savings_rate': avg_savings_rate,
+        'overspending_months': int(overspending_months),
+        'savings_consistency': savings_consistency,
+        'data_available': True
+    }
+
+
+@diagnostic('credit_health', requires=['transactions', 'cube', 'tags'], weight=0.10)
+def _diagnose_credit(context, findings):
+    """Category 8: Credit Health"""
+    
+    # Look for credit card transactions
+    credit_txns = _tagged(context, 'credit')
+    
+    if len(credit_txns) == 0:
+        findings.gaps.append('No credit card activity detected - unable to assess credit health')
+        return {
+            'score': 60,
+            'status': 'unknown',
+            'data_available': False,
+            'needs_questionnaire': True
+        }
+    
+    # Analyze payment behavior
+    monthly_cc_payments = credit_txns.groupby('month')['amount'].sum()
+    avg_cc_payment = float(monthly_cc_payments.mean())
+    
+    avg_income = _average_monthly(context['cube'], 'income', 1)
+    
+    cc_to_income = avg_cc_payment / avg_income if avg_income > 0 else 0
+    
+    # Scoring
+    score = 50  # Base score
+    
+    if cc_to_income < 0.1:
+        score += 30
+    elif cc_to_income < 0.2:
+        score += 20
+    elif cc_to_income < 0.3:
+        score += 10
+    else:
+        findings.risks.append(f'High credit card usage: {cc_to_income*100:.0f}% of income')
+    
+    # Regular payments (good sign)
+    if len(monthly_cc_payments) >= 3:
+        score += 20
+    
+    return {
+        'score': score,
+        'status': 'fair',
+        'avg_monthly_cc_payment': avg_cc_payment,
+        'cc_to_income_ratio': cc_to_income,
+        'data_available': True,
+        'needs_questionnaire': True  # For actual credit score
+    }
+
+
+@diagnostic('tax_situation', requires=['transactions', 'prepared', 'tags'], weight=0.05)
+def _diagnose_taxes(context, findings):
+    """Category 9: Tax Situation"""
+    
+    tax_txns = _tagged(context, 'tax')
+    
+    if len(tax_txns) == 0:
+        findings.gaps.append('No tax-related transactions detected - please verify your tax compliance')
+        return {
+            'score': 60,
+            'status': 'unknown',
+            'data_available': False,
+            'needs_questionnaire': True
+        }
+    
+    # Analyze tax payments
+    tax_payments = tax_txns[tax_txns['type'] == 'expense']
+    tax_refunds = tax_txns[tax_txns['type'] == 'income']
+    
+    total_tax_paid = float(tax_payments['amount'].sum()) if len(tax_payments) > 0 else 0
+    total_refunds = float(tax_refunds['amount'].sum()) if len(tax_refunds) > 0 else 0
+    
+    income_df = context['prepared'].income
+    total_income = float(income_df['amount'].sum()) if len(income_df) > 0 else 1
+    
+    effective_tax_rate = (total_tax_paid - total_refunds) / total_income if total_income > 0 else 0
+    
+    # Scoring (having tax activity shows compliance)
+    score = 70
+    
+    if len(tax_payments) > 0:
+        score += 20
+    if effective_tax_rate > 0 and effective_tax_rate < 0.4:
+        score += 10
+    
+    return {
+        'score': score,
+        'status': 'compliant',
+        'total_tax_paid': total_tax_paid,
+        'total_refunds': total_refunds,
+        'effective_tax_rate': effective_tax_rate * 100,
+        'data_available': True
+    }
+
+
+@diagnostic('financial_behavior', requires=['transactions', 'cube'], weight=0.05)
+def _diagnose_behavior(context, findings):
+    """Category 10: Financial Behavior Patterns"""
+    
+    df = context['transactions']
+    
+    # Analyze spending consistency
+    monthly_expenses = context['cube'].sums('month', 'expense')
+    expense_volatility = float(monthly_expenses.std() / monthly_expenses.mean()) if len(monthly_expenses) > 0 and monthly_expenses.mean() > 0 else 0
+    
+    # Analyze savings behavior
+    monthly_income = context['cube'].sums('month', 'income')
+    monthly_savings = monthly_income - monthly_expenses
+    
+    positive_savings_months = sum(monthly_savings > 0) if len(monthly_savings) > 0 else 0
+    total_months = len(monthly_savings) if len(monthly_savings) > 0 else 1
+    
+    # Transaction patterns
+    avg_transactions_per_month = len(df) / total_months if total_months > 0 else 0
+    
+    # Scoring
+    score = 0
+    
+    # Spending discipline
+    if expense_volatility < 0.2:
+        score += 30
+    elif expense_volatility < 0.4:
+        score += 20
+    elif expense_volatility < 0.6:
+        score += 10
+    
+    # Savings discipline
+    savings_discipline = positive_savings_months / total_months if total_months > 0 else 0
+    if savings_discipline >= 0.9:
+        score += 40
+    elif savings_discipline >= 0.75:
+        score += 30
+    elif savings_discipline >= 0.5:
+        score += 20
+    elif savings_discipline > 0:
+        score += 10
+    
+    # Transaction awareness (not too many small transactions)
+    if avg_transactions_per_month < 100:
+        score += 30
+    elif avg_transactions_per_month < 200:
+        score += 20
+    elif avg_transactions_per_month < 300:
+        score += 10
+    
+    status = 'excellent' if score >= 80 else 'good' if score >= 60 else 'fair' if score >= 40 else 'poor'
+    
+    return {
+        'score': score,
+        'status': status,
+        'expense_volatility': expense_volatility,
+        'savings_discipline': savings_discipline,
+        'avg_transactions_per_month': int(avg_transactions_per_month),
+        'data_available': True
+    }
+
+
+def run_diagnostics(analysis):
+    """
+    Diagnostic report of an analyze_finances result.
+
+    Returns:
+        The 'diagnostic_report' section, or {} when it was not computed
+    """
+    report = analysis.get('diagnostic_report')
+    return report if isinstance(report, dict) else {}
@@ -5,19 +5,185 @@ Converts various file formats into standardized DataFrames.
 import pandas as pd
 import pdfplumber
 from io import BytesIO
+import codecs
+import csv
 import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from .parse_cache import ParseCache, get_parse_cache
+from .bank_formats import detect_bank_format
 
+# Bump whenever a parser change alters the DataFrames it produces, so that
+# cached parses from the old code are not served
+PARSER_VERSION = 3
 
-def parse_csv(file_content):
-    """Parse CSV file content into DataFrame."""
-    # Try different encodings
-    for encoding in ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']:
-        try:
-            return pd.read_csv(BytesIO(file_content), encoding=encoding)
-        except UnicodeDecodeError:
+# Page-parallel PDF extraction; 1 worker (the default) keeps extraction in-process
+PDF_PARSE_WORKERS = int(os.getenv('PDF_PARSE_WORKERS', '1'))
+PDF_PAGES_PER_CHUNK = int(os.getenv('PDF_PAGES_PER_CHUNK', '8'))
+
+# Bytes inspected by detect_csv_format before the single full parse
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_DELIMITERS = [',', ';', '\t', '|']
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+# Bytes cp1252 leaves undefined; their presence rules it out
+_CP1252_UNDEFINED = {0x81, 0x8D, 0x8F, 0x90, 0x9D}
+
+_COMMA_DECIMAL = re.compile(r'^[-+]?[€$]?\s?\d+,\d{1,2}$')
+_DOT_THOUSANDS_COMMA_DECIMAL = re.compile(r'^[-+]?[€$]?\s?\d{1,3}(?:\.\d{3})+,\d+$')
+_DOT_DECIMAL = re.compile(r'^[-+]?[€$]?\s?\d+\.\d{1,2}$')
+_COMMA_THOUSANDS_DOT_DECIMAL = re.compile(r'^[-+]?[€$]?\s?\d{1,3}(?:,\d{3})+\.\d+$')
+_DOTTED_DATE = re.compile(r'^\d{1,2}\.\d{1,2}\.\d{2,4}$')
+
+
+def _detect_encoding(sample, truncated):
+    """Pick an encoding from a byte prefix: BOM, strict UTF-8, then byte statistics."""
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the prefix boundary is still UTF-8
+        if truncated and e.start >= len(sample) - 3 and e.reason == 'unexpected end of data':
+            return 'utf-8'
+
+    # Not UTF-8: choose between the single-byte Western encodings.
+    # 0x80-0x9F are control characters in latin-1 but printable in cp1252 (e.g. €).
+    high_control = [b for b in sample if 0x80 <= b <= 0x9F]
+    if high_control and not _CP1252_UNDEFINED.intersection(high_control):
+        return 'cp1252'
+    return 'latin-1'
+
+
+def _detect_delimiter(lines):
+    """Pick the delimiter giving the most consistent multi-column rows."""
+    best_delimiter, best_score = ',', (0.0, 0)
+    for delimiter in CSV_DELIMITERS:
+        counts = [len(row) for row in csv.reader(lines, delimiter=delimiter)]
+        if not counts:
             continue
-    # If all encodings fail, try with error handling
-    return pd.read_csv(BytesIO(file_content), encoding='utf-8', errors='ignore')
+        columns = max(set(counts), key=counts.count)
+        if columns < 2:
+            continue
+        score = (counts.count(columns) / len(counts), columns)
+        if score > best_score:
+            best_delimiter, best_score = delimiter, score
+    return best_delimiter
+
+
+def _detect_number_format(lines, delimiter):
+    """
+    Infer (decimal, thousands, text_columns) from numeric-looking fields.
+
+    text_columns lists header names of columns holding dotted dates such as
+    01.02.2024, which must be read as text once '.' is the thousands separator.
+    """
+    comma_decimal = dot_decimal = dot_thousands = comma_thousands = 0
+    dotted_date_columns = set()
+    rows = list(csv.reader(lines, delimiter=delimiter))
+    for row in rows[1:]:
+        for index, field in enumerate(row):
+            field = field.strip()
+            if _DOT_THOUSANDS_COMMA_DECIMAL.match(field):
+                comma_decimal += 1
+                dot_thousands += 1
+            elif _COMMA_DECIMAL.match(field):
+                comma_decimal += 1
+            elif _COMMA_THOUSANDS_DOT_DECIMAL.match(field):
+                dot_decimal += 1
+                comma_thousands += 1
+            elif _DOT_DECIMAL.match(field):
+                dot_decimal += 1
+            elif _DOTTED_DATE.match(field):
+                dotted_date_columns.add(index)
+
+    if delimiter != ',' and comma_decimal > dot_decimal:
+        if not dot_thousands:
+            return ',', None, []
+        header = rows[0] if rows else []
+        text_columns = [header[i] for i in sorted(dotted_date_columns) if i < len(header)]
+        return ',', '.', text_columns
+    thousands = ',' if comma_thousands and delimiter != ',' else None
+    return '.', thousands, []
+
+
+def detect_csv_format(file_content, sample_size=CSV_SNIFF_BYTES):
+    """
+    Detect encoding, delimiter and number format from a bounded prefix.
+
+    Only the first sample_size bytes are inspected, so detection cost does not
+    grow with the file.
+
+    Returns:
+        dict with encoding, delimiter, decimal, thousands and text_columns
+    """
+    sample = file_content[:sample_size]
+    truncated = len(file_content) > sample_size
+    encoding = _detect_encoding(sample, truncated)
+
+    text = sample.decode(encoding, errors='replace')
+    lines = text.splitlines()
+    if truncated and len(lines) > 1:
+        lines = lines[:-1]  # last line may be cut off mid-record
+    lines = [line for line in lines if line.strip()][:200]
+
+    delimiter = _detect_delimiter(lines)
+    decimal, thousands, text_columns = _detect_number_format(lines, delimiter)
+    return {
+        'encoding': encoding,
+        'delimiter': delimiter,
+        'decimal': decimal,
+        'thousands': thousands,
+        'text_columns': text_columns,
+    }
+
+
+def parse_csv(file_content):
+    """
+    Parse CSV file content into DataFrame.
+
+    The format is detected once from a prefix and the file is parsed in a
+    single pass. Detection and parse timings, together with the detected
+    format, are stored in the result's attrs['parse_stats'].
+    """
+    start = time.perf_counter()
+    detected = detect_csv_format(file_content)
+    detect_seconds = time.perf_counter() - start
+
+    read_options = {
+        'sep': detected['delimiter'],
+        'decimal': detected['decimal'],
+        'thousands': detected['thousands'],
+        'dtype': {column: str for column in detected['text_columns']} or None,
+    }
+    start = time.perf_counter()
+    try:
+        df = pd.read_csv(BytesIO(file_content), encoding=detected['encoding'], **read_options)
+    except UnicodeDecodeError:
+        # Non-UTF-8 bytes beyond the sniffed prefix; latin-1 decodes any byte
+        detected['encoding'] = 'latin-1'
+        df = pd.read_csv(BytesIO(file_content), encoding='latin-1', **read_options)
+    parse_seconds = time.perf_counter() - start
+
+    df.attrs['parse_stats'] = {
+        **detected,
+        'detect_seconds': detect_seconds,
+        'parse_seconds': parse_seconds,
+    }
+    return df
 
 
 def parse_excel(file_content):
@@ -64,70 +230,201 @@ def parse_txt(file_content):
         raise ValueError(f"Could not parse TXT file: {str(e)}")
 
 
-def parse_pdf_transactions(file_content):
+def _extract_page_range(file_content, start, stop, tables=True, text=True):
     """
-    Parse PDF bank statement into transactions DataFrame.
-    This is a basic parser that extracts tables from PDF.
-    
-    Expected DataFrame columns: date, description, amount, type, category
-    
-    Note: PDF parsing is complex and depends on bank statement format.
-    This implementation tries to extract tables and assumes common formats.
-    You may need to customize this for specific bank statement layouts.
+    Extract tables and/or text from pages [start, stop) of a PDF.
+
+    Module-level so it can run in a worker process; each worker opens its own
+    handle on the bytes and only touches its own pages.
     """
-    transactions = []
-    
+    pages = []
+    with pdfplumber.open(BytesIO(file_content)) as pdf:
+        for page in pdf.pages[start:stop]:
+            pages.append({
+                'tables': page.extract_tables() if tables else [],
+                'text': (page.extract_text() or '') if text else '',
+            })
+    return pages
+
+
+# Worker pools by size, created on first use and shared by every extraction
+_pdf_pools = {}
+_pdf_pools_lock = threading.Lock()
+
+# Workers start from a fork server (or are spawned), never forked from a threaded server process
+_pdf_pool_context = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+
+def _get_pdf_pool(workers):
+    with _pdf_pools_lock:
+        pool = _pdf_pools.get(workers)
+        if pool is None:
+            pool = _pdf_pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=_pdf_pool_context)
+        return pool
+
+
+def _discard_pdf_pool(workers, pool):
+    with _pdf_pools_lock:
+        if _pdf_pools.get(workers) is pool:
+            del _pdf_pools[workers]
+    pool.shutdown(wait=False)
+
+
+def extract_pdf_pages(file_content, workers=None, chunk_size=None, tables=True, text=True):
+    """
+    Extract every page of a PDF, optionally on a process pool.
+
+    Pages are split into contiguous ranges of chunk_size pages, one task per
+    range, and the results are concatenated back in page order. The worker
+    processes are started once and reused by later calls; a document of at
+    most chunk_size pages is extracted in-process.
+
+    Args:
+        file_content: Raw PDF bytes
+        workers: Worker processes (default PDF_PARSE_WORKERS); 1 runs serially
+        chunk_size: Pages per task (default PDF_PAGES_PER_CHUNK)
+        tables: Whether to run extract_tables() on each page
+        text: Whether to run extract_text() on each page
+    Returns:
+        List of {'tables': [...], 'text': str} dicts, one per page
+    """
+    workers = PDF_PARSE_WORKERS if workers is None else workers
+    chunk_size = max(1, PDF_PAGES_PER_CHUNK if chunk_size is None else chunk_size)
+
     with pdfplumber.open(BytesIO(file_content)) as pdf:
-        for page in pdf.pages:
-            # Try to extract tables
-            tables = page.extract_tables()
+        page_count = len(pdf.pages)
+
+    if workers <= 1 or page_count <= chunk_size:
+        return _extract_page_range(file_content, 0, page_count, tables, text)
+
+    ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+    pool = _get_pdf_pool(workers)
+    try:
+        futures = [
+            pool.submit(_extract_page_range, file_content, start, stop, tables, text)
+            for start, stop in ranges
+        ]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool on the next call
+        _discard_pdf_pool(workers, pool)
+        raise
+    return pages
+
+
+def _transactions_from_tables(tables):
+    """Turn extracted table rows into transaction dicts."""
+    transactions = []
+    for table in tables:
+        # Skip header row if present
+        for row in table[1:] if len(table) > 1 else table:
+            if not row or len(row) < 3:
+                continue
             
-            if tables:
-                for table in tables:
-                    # Skip header row if present
-                    for row in table[1:] if len(table) > 1 else table:
-                        if not row or len(row) < 3:
+            # Try to parse common bank statement formats
+            # Format 1: [Date, Description, Debit, Credit, Balance]
+            # Format 2: [Date, Description, Amount, Type]
+            # Format 3: [Date, Reference, Description, Amount]
+            
+            try:
+                # Assume: date in first column, description in middle, amount somewhere
+                date = row[0] if row[0] else None
+                description = row[1] if len(row) > 1 else 'Unknown'
+                
+                # Try to find amount (look for numeric values)
+                amount = None
+                transaction_type = 'expense'
+                
+                for cell in row[2:]:
+                    if cell and isinstance(cell, (str, float)):
+                        try:
+                            # Clean and parse amount
+                            amount_str = str(cell).replace(',', '').replace('€', '').replace('$', '').strip()
+                            if amount_str and amount_str != '':
+                                parsed = float(amount_str)
+                                if parsed != 0:
+                                    amount = abs(parsed)
+                                    # Negative usually means expense, positive means income
+                                    transaction_type = 'expense' if parsed < 0 else 'income'
+                                    break
+                        except (ValueError, AttributeError):
                             continue
-                        
-                        # Try to parse common bank statement formats
-                        # Format 1: [Date, Description, Debit, Credit, Balance]
-                        # Format 2: [Date, Description, Amount, Type]
-                        # Format 3: [Date, Reference, Description, Amount]
-                        
+                
+                if date and amount:
+                    transactions.append({
+                        'date': date,
+                        'description': description,
+                        'amount': amount,
+                        'type': transaction_type,
+                        'category': 'Uncategorized'
+                    })
+            except Exception:
+                continue
+    return transactions
+
+
+def _accounts_from_text(text):
+    """Pick balance lines out of a page's text."""
+    accounts = []
+    # Try to find balance information (very basic)
+    if 'balance' in text.lower() or 'total' in text.lower():
+        lines = text.split('\n')
+        for line in lines:
+            if 'balance' in line.lower() or 'total' in line.lower():
+                try:
+                    # Very basic extraction - customize based on your PDF format
+                    parts = line.split()
+                    for part in parts:
                         try:
-                            # Assume: date in first column, description in middle, amount somewhere
-                            date = row[0] if row[0] else None
-                            description = row[1] if len(row) > 1 else 'Unknown'
-                            
-                            # Try to find amount (look for numeric values)
-                            amount = None
-                            transaction_type = 'expense'
-                            
-                            for cell in row[2:]:
-                                if cell and isinstance(cell, (str, float)):
-                                    try:
-                                        # Clean and parse amount
-                                        amount_str = str(cell).replace(',', '').replace('€', '').replace('$', '').strip()
-                                        if amount_str and amount_str != '':
-                                            parsed = float(amount_str)
-                                            if parsed != 0:
-                                                amount = abs(parsed)
-                                                # Negative usually means expense, positive means income
-                                                transaction_type = 'expense' if parsed < 0 else 'income'
-                                                break
-                                    except (ValueError, AttributeError):
-                                        continue
-                            
-                            if date and amount:
-                                transactions.append({
-                                    'date': date,
-                                    'description': description,
-                                    'amount': amount,
-                                    'type': transaction_type,
-                                    'category': 'Uncategorized'
-                                })
-                        except Exception:
+                            balance = float(part.replace(',', '').replace('€', '').replace('$', ''))
+                            accounts.append({
+                                'account_name': 'Main Account',
+                                'type': 'checking',
+                                'balance': balance
+                            })
+                            break
+                        except ValueError:
                             continue
+                except Exception:
+                    continue
+    return accounts
+
+
+def _first_page_text(file_content):
+    """Extract the first page's text, used to fingerprint the bank format."""
+    with pdfplumber.open(BytesIO(file_content)) as pdf:
+        if not pdf.pages:
+            return ''
+        return pdf.pages[0].extract_text() or ''
+
+
+def _iter_text_lines(pages):
+    """Stream text lines across pages, in page order."""
+    for page in pages:
+        yield from page['text'].split('\n')
+
+
+def _transactions_frame(pages, bank_format=None, table_pages=None):
+    """
+    Merge per-page results, in page order, into a transactions DataFrame.
+
+    With a bank_format the page text is streamed through its line parser;
+    otherwise, or when that yields no rows (e.g. a layout the format does
+    not know), the extracted tables are used. table_pages() re-extracts the
+    pages with tables when pages were extracted as text only.
+    """
+    transactions = []
+    if bank_format is not None:
+        transactions.extend(bank_format.parse_lines(_iter_text_lines(pages)))
+        if not transactions and table_pages is not None:
+            pages = table_pages()
+    if not transactions:
+        for page in pages:
+            transactions.extend(_transactions_from_tables(page['tables']))
     
     if not transactions:
         # If table extraction failed, try text extraction (fallback)
@@ -141,41 +438,11 @@ def parse_pdf_transactions(file_content):
     return pd.DataFrame(transactions)
 
 
-def parse_pdf_accounts(file_content):
-    """
-    Parse PDF into accounts DataFrame.
-    Expected columns: account_name, type, balance
-    
-    This is simplified - most PDFs contain transactions, not account summaries.
-    """
+def _accounts_frame(pages):
+    """Merge per-page balance lines, in page order, into an accounts DataFrame."""
     accounts = []
-    
-    with pdfplumber.open(BytesIO(file_content)) as pdf:
-        for page in pdf.pages:
-            # Look for account summary information
-            text = page.extract_text()
-            
-            # Try to find balance information (very basic)
-            if 'balance' in text.lower() or 'total' in text.lower():
-                lines = text.split('\n')
-                for line in lines:
-                    if 'balance' in line.lower() or 'total' in line.lower():
-                        try:
-                            # Very basic extraction - customize based on your PDF format
-                            parts = line.split()
-                            for part in parts:
-                                try:
-                                    balance = float(part.replace(',', '').replace('€', '').replace('$', ''))
-                                    accounts.append({
-                                        'account_name': 'Main Account',
-                                        'type': 'checking',
-                                        'balance': balance
-                                    })
-                                    break
-                                except ValueError:
-                                    continue
-                        except Exception:
-                            continue
+    for page in pages:
+        accounts.extend(_accounts_from_text(page['text']))
     
     if not accounts:
         # Return default account structure if not found
@@ -188,16 +455,113 @@ def parse_pdf_accounts(file_content):
     return pd.DataFrame(accounts)
 
 
-def parse_file(file_content, filename, file_type='transactions'):
+def parse_pdf_transactions(file_content, workers=None, chunk_size=None):
+    """
+    Parse PDF bank statement into transactions DataFrame.
+    This is a basic parser that extracts tables from PDF.
+    
+    Expected DataFrame columns: date, description, amount, type, category
+    
+    Note: PDF parsing is complex and depends on bank statement format.
+    This implementation tries to extract tables and assumes common formats.
+    You may need to customize this for specific bank statement layouts.
+
+    Statements from a registered bank format (see bank_formats) are parsed
+    from their text lines instead of extracted tables.
+
+    workers and chunk_size are passed to extract_pdf_pages.
+    """
+    bank_format = detect_bank_format(_first_page_text(file_content))
+    table_pages = partial(extract_pdf_pages, file_content, workers, chunk_size, tables=True, text=False)
+    if bank_format is not None:
+        pages = extract_pdf_pages(file_content, workers, chunk_size, tables=False, text=True)
+    else:
+        pages = table_pages()
+    return _transactions_frame(pages, bank_format, table_pages)
+
+
+def parse_pdf_accounts(file_content, workers=None, chunk_size=None):
+    """
+    Parse PDF into accounts DataFrame.
+    Expected columns: account_name, type, balance
+    
+    This is simplified - most PDFs contain transactions, not account summaries.
+    """
+    pages = extract_pdf_pages(file_content, workers, chunk_size, tables=False, text=True)
+    return _accounts_frame(pages)
+
+
+def parse_pdf_statement(file_content, workers=None, chunk_size=None):
+    """
+    Parse transactions and accounts from a PDF in a single extraction pass.
+
+    Returns:
+        Tuple of (transactions DataFrame, accounts DataFrame)
+    """
+    pages, bank_format = _extract_statement_pages(file_content, workers, chunk_size)
+    table_pages = partial(extract_pdf_pages, file_content, workers, chunk_size, tables=True, text=False)
+    return _transactions_frame(pages, bank_format, table_pages), _accounts_frame(pages)
+
+
+def _extract_statement_pages(file_content, workers=None, chunk_size=None):
+    """Pages with what both DataFrames need, and the statement's bank format (or None)"""
+    bank_format = detect_bank_format(_first_page_text(file_content))
+    pages = extract_pdf_pages(file_content, workers, chunk_size, tables=bank_format is None, text=True)
+    return pages, bank_format
+
+
+def parse_file(file_content, filename, file_type='transactions', use_cache=True, owner=None):
     """
     Parse file based on extension.
     Args:
         file_content: Raw file bytes
         filename: Original filename to detect extension
         file_type: 'transactions' or 'accounts'
+        use_cache: Serve repeated uploads of the same bytes from the parse cache
+        owner: User the upload belongs to; its cache entries are deleted by
+            ParseCache.purge_owner(owner)
     Returns:
         pandas DataFrame with parsed data
     """
+    cache = get_parse_cache() if use_cache else None
+    if cache is None:
+        return _parse_uncached(file_content, filename, file_type)
+
+    key = ParseCache.key(file_content, filename, file_type, PARSER_VERSION)
+    df = cache.get(key, owner)
+    if df is None:
+        if filename.lower().endswith('.pdf'):
+            return _parse_pdf_cached(file_content, filename, file_type, cache, owner)
+        df = _parse_uncached(file_content, filename, file_type)
+        cache.put(key, df, owner)
+    return df
+
+
+def _parse_pdf_cached(file_content, filename, file_type, cache, owner=None):
+    """
+    Parse both DataFrames of a PDF statement in one extraction pass and cache
+    each, so the transactions and the accounts of a statement are extracted once.
+    A statement without transaction data still yields its accounts.
+    """
+    kind = 'transactions' if file_type == 'transactions' else 'accounts'
+    try:
+        pages, bank_format = _extract_statement_pages(file_content)
+        frames = {'accounts': _accounts_frame(pages)}
+        try:
+            table_pages = partial(extract_pdf_pages, file_content, tables=True, text=False)
+            frames['transactions'] = _transactions_frame(pages, bank_format, table_pages)
+        except ValueError:
+            if kind == 'transactions':
+                raise
+    except Exception as e:
+        raise ValueError(f"Error parsing {filename}: {str(e)}") from e
+    for frame_kind, df in frames.items():
+        cache.put(ParseCache.key(file_content, filename, frame_kind, PARSER_VERSION), df, owner)
+    return frames[kind]
+
+
+def _parse_uncached(file_content, filename, file_type):
+    """Dispatch to the parser matching the file extension."""
     filename_lower = filename.lower()
     try:
         if filename_lower.endswith('.csv'):
@@ -0,0 +1,347 @@
+"""
+Incremental analysis for users who upload one new statement at a time.
+Each user's persisted state holds the aggregate cube, recurring-pattern
+candidates, the most unusual expenses so far and the last month of rows, so
+a new statement is folded in at a cost proportional to its own rows and the
+analysis is regenerated from the state without the historical rows.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import AggregateCube, CUBE_KEYS
+from .advanced_analytics import recurring_patterns
+from .analytics import analyze_finances
+from .categorizer import get_categorizer
+from .merchants import merchant_keys
+from .prepared import PreparedTransactions
+from .state_store import JSONStateStore
+
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(__file__), 'data', 'analysis_state')
+
+# Sections regenerated from the state; the rest need the full rows
+INCREMENTAL_SECTIONS = [
+    'totals', 'overspending', 'savings_progress', 'alerts', 'recommendations',
+    'benchmarks', 'income_vs_expenses', 'category_breakdown', 'monthly_trends',
+    'prediction', 'category_predictions', 'category_trends', 'optimization',
+]
+
+# Unusual expenses kept for rescoring as the category statistics move
+MAX_UNUSUAL_CANDIDATES = 100
+
+ROW_COLUMNS = ['date', 'amount', 'type', 'category', 'description']
+
+
+def _fingerprints(dates, amounts, descriptions):
+    """Hash of each row's (date string, rounded amount, stripped description)"""
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        'date': dates.to_numpy(),
+        'amount': amounts.astype(float).round(2).to_numpy(),
+        'description': descriptions.fillna('').astype(str).str.strip().to_numpy(),
+    }), index=False)
+
+
+class AnalysisState:
+    """
+    Everything needed to regenerate a user's analysis without their history.
+
+    - cube: AggregateCube over every row seen (category totals and running
+      per-category sums, counts and sums of squares)
+    - recurring: per-merchant occurrence, amount and interval sums
+    - unusual: expenses that scored above the threshold when they arrived
+    - recent: rows within a month of the latest date, for savings_progress
+      and for skipping rows already folded in
+
+    Batches are expected in date order (each statement after the last), so
+    the latest date folded in is a watermark: rows more than a month before
+    it are taken as already folded in and skipped, and rows within that
+    month are skipped if recent holds the same (date, amount, description).
+    Re-uploading a statement, or one that overlaps the previous statement,
+    therefore does not count rows twice, and the state does not grow with
+    the history. A batch may still hold identical rows (e.g. two equal
+    purchases on one day): they are only added beyond the count in recent.
+    Expenses are rescored against the current category statistics, but only
+    those that were unusual on arrival are kept, so a historical expense that
+    becomes unusual later is not reported.
+    """
+
+    def __init__(self, cube=None, recurring=None, unusual=None, recent=None, threshold=2.0):
+        self.cube = cube
+        self.recurring = recurring if recurring is not None else {}
+        self.unusual = unusual if unusual is not None else []
+        self.recent = recent if recent is not None else pd.DataFrame(columns=ROW_COLUMNS)
+        self.threshold = threshold
+
+    @property
+    def rows(self):
+        """Number of rows folded in so far."""
+        return self.cube.rows if self.cube is not None else 0
+
+    def append(self, transactions_df):
+        """
+        Fold a batch of new transactions into the state.
+
+        Args:
+            transactions_df: New transactions (date, amount, type, category,
+                description), e.g. one monthly statement
+
+        Returns:
+            Number of rows added (rows with invalid dates or amounts, and
+            rows already folded in, are dropped)
+        """
+        categorized = get_categorizer().categorize_dataframe(transactions_df)
+        frame = PreparedTransactions.from_frame(categorized, copy=False).frame
+        if 'description' not in frame.columns:
+            frame = frame.assign(description=None)
+        frame = frame[self._unseen(frame)]
+        if len(frame) == 0:
+            return 0
+        prepared = PreparedTransactions(frame)
+
+        offset = self.rows
+        self.cube = prepared.cube if self.cube is None else self.cube.merge(prepared.cube)
+        positions = offset + np.arange(len(frame))
+        expenses = (frame['type'] == 'expense').to_numpy()
+        self._fold_recurring(frame[expenses], positions[expenses])
+        self._fold_unusual(frame[expenses], positions[expenses])
+        self._fold_recent(frame)
+        return len(frame)
+
+    def _unseen(self, frame):
+        """Mask of the rows not folded in yet"""
+        if len(self.recent) == 0:
+            return np.ones(len(frame), dtype=bool)
+        # recent holds every row folded in since a month before the watermark
+        window_start = pd.to_datetime(self.recent['date'], format='%Y-%m-%d').max() - pd.DateOffset(months=1)
+        seen = _fingerprints(self.recent['date'], self.recent['amount'], self.recent['description']).value_counts()
+        fingerprints = _fingerprints(frame['date'].dt.strftime('%Y-%m-%d'), frame['amount'], frame['description'])
+        # The n-th copy of a fingerprint in the batch is new once n copies were seen
+        occurrence = fingerprints.groupby(fingerprints.to_numpy(), sort=False).cumcount()
+        unseen = (occurrence >= fingerprints.map(seen).fillna(0)).to_numpy()
+        return unseen & (frame['date'] >= window_start).to_numpy()
+
+    def _fold_recurring(self, expense_df, positions):
+        descriptions = expense_df['description'].fillna('').astype(str)
+        frame = pd.DataFrame({
+            'key': merchant_keys(expense_df['description']).astype(object).to_numpy(),
+            'description': descriptions.to_numpy(),
+            'date': expense_df['date'].to_numpy(),
+            'amount': expense_df['amount'].to_numpy(),
+            'position': positions,
+        })
+        frame = frame[frame['key'].notna()].sort_values(['key', 'date'], kind='stable')
+        if len(frame) == 0:
+            return
+
+        # Intervals inside the batch, plus the gap from each key's last known date
+        previous = frame.groupby('key', sort=False)['date'].shift()
+        known_last = frame['key'].map(
+            {key: pd.Timestamp(entry['last_date']) for key, entry in self.recurring.items()}
+        )
+        previous = previous.fillna(pd.to_datetime(known_last))
+        frame['interval'] = (frame['date'] - previous).dt.days
+        frame['amount_sq'] = frame['amount'] ** 2
+        frame['interval_sq'] = frame['interval'] ** 2
+
+        grouped = frame.groupby('key', sort=False)
+        batch = grouped.agg(
+            first_position=('position', 'min'),
+            occurrences=('amount', 'size'),
+            amount_sum=('amount', 'sum'),
+            amount_sumsq=('amount_sq', 'sum'),
+            last_date=('date', 'max'),
+            intervals=('interval', 'count'),
+            interval_sum=('interval', 'sum'),
+            interval_sumsq=('interval_sq', 'sum'),
+        )
+        batch['description'] = frame.set_index('position')['description'].reindex(batch['first_position']).to_numpy()
+        for key, row in zip(batch.index, batch.itertuples(index=False)):
+            entry = self.recurring.get(key)
+            last_date = row.last_date.strftime('%Y-%m-%d')
+            if entry is None:
+                self.recurring[key] = {
+                    'description': row.description,
+                    'first_position': int(row.first_position),
+                    'occurrences': int(row.occurrences),
+                    'amount_sum': float(row.amount_sum),
+                    'amount_sumsq': float(row.amount_sumsq),
+                    'last_date': last_date,
+                    'intervals': int(row.intervals),
+                    'interval_sum': float(row.interval_sum),
+                    'interval_sumsq': float(row.interval_sumsq),
+                }
+                continue
+            entry['occurrences'] += int(row.occurrences)
+            entry['amount_sum'] += float(row.amount_sum)
+            entry['amount_sumsq'] += float(row.amount_sumsq)
+            entry['last_date'] = max(entry['last_date'], last_date)
+            entry['intervals'] += int(row.intervals)
+            entry['interval_sum'] += float(row.interval_sum)
+            entry['interval_sumsq'] += float(row.interval_sumsq)
+
+    def _category_stats(self):
+        """Per-category expense mean and sample std from the cube"""
+        totals = self.cube.totals('category', 'expense')
+        totals.index = totals.index.astype(object)
+        return totals
+
+    def _score(self, candidates, stats):
+        """Z-scores of candidate expenses against their category (NaN if not scorable)"""
+        category_stats = stats.reindex(candidates['category'].astype(object))
+        mean, std = category_stats['mean'].to_numpy(), category_stats['std'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score = (candidates['amount'].to_numpy() - mean) / std
+        valid = (category_stats['count'].to_numpy() >= 3) & (std > 0)
+        return np.where(valid, score, np.nan), mean
+
+    def _fold_unusual(self, expense_df, positions):
+        descriptions = expense_df['description'].fillna('Unknown').astype(str).str[:50]
+        batch = pd.DataFrame({
+            'date': expense_df['date'].dt.strftime('%Y-%m-%d').to_numpy(),
+            'category': expense_df['category'].astype(object).to_numpy(),
+            'description': descriptions.to_numpy(),
+            'amount': expense_df['amount'].to_numpy(),
+            'position': positions,
+        })
+        if self.unusual:
+            candidates = pd.concat([pd.DataFrame(self.unusual, columns=batch.columns), batch], ignore_index=True)
+        else:
+            candidates = batch
+        score, _ = self._score(candidates, self._category_stats())
+        keep = np.flatnonzero(score > self.threshold)
+        keep = keep[np.argsort(-score[keep], kind='stable')][:MAX_UNUSUAL_CANDIDATES]
+        self.unusual = candidates.iloc[np.sort(keep)].to_dict('records')
+
+    def _fold_recent(self, frame):
+        rows = frame.reindex(columns=ROW_COLUMNS).assign(
+            date=frame['date'].dt.strftime('%Y-%m-%d'),
+            type=frame['type'].astype(object),
+            category=frame['category'].astype(object),
+        )
+        recent = pd.concat([self.recent, rows], ignore_index=True) if len(self.recent) else rows
+        dates = pd.to_datetime(recent['date'], format='%Y-%m-%d')
+        one_month_ago = dates.max() - pd.DateOffset(months=1)
+        self.recent = recent[(dates >= one_month_ago).to_numpy()].reset_index(drop=True)
+
+    def recurring_transactions(self, min_occurrences=3, tolerance_days=3):
+        """Recurring patterns, as detect_recurring_transactions reports them."""
+        if not self.recurring:
+            return []
+        stats = pd.DataFrame.from_dict(self.recurring, orient='index')
+        stats['avg_amount'] = stats['amount_sum'] / stats['occurrences']
+        amount_variance = stats['amount_sumsq'] / stats['occurrences'] - stats['avg_amount'] ** 2
+        stats['std_amount'] = np.sqrt(amount_variance.clip(lower=0))
+        stats['avg_interval'] = stats['interval_sum'] / stats['intervals'].where(stats['intervals'] > 0)
+        interval_variance = stats['interval_sumsq'] / stats['intervals'].where(stats['intervals'] > 0) - stats['avg_interval'] ** 2
+        stats['std_interval'] = np.sqrt(interval_variance.clip(lower=0))
+        stats['last_date'] = pd.to_datetime(stats['last_date'], format='%Y-%m-%d')
+        return recurring_patterns(stats, min_occurrences, tolerance_days)
+
+    def unusual_transactions(self, top_k=10):
+        """Most unusual expenses, as detect_unusual_spending reports them (zscore method)."""
+        if not self.unusual or top_k <= 0:
+            return []
+        stats = self._category_stats()
+        candidates = pd.DataFrame(self.unusual)
+        score, typical = self._score(candidates, stats)
+
+        # Highest score first; ties keep category first-appearance order, then row order
+        selected = np.flatnonzero(score > self.threshold)
+        category_first = stats['first'].reindex(candidates['category']).to_numpy()
+        order = np.lexsort((
+            candidates['position'].to_numpy()[selected], category_first[selected], -score[selected]
+        ))
+        selected = selected[order][:top_k]
+        return [
+            {
+                'date': candidates['date'].iat[i],
+                'category': candidates['category'].iat[i],
+                'description': candidates['description'].iat[i],
+                'amount': float(candidates['amount'].iat[i]),
+                'typical_amount': float(typical[i]),
+                'deviation': float(score[i])
+            }
+            for i in selected
+        ]
+
+    def analyze(self, accounts_df=None, profile=None, benchmark_store=None):
+        """
+        Regenerate the analysis from the state.
+
+        Args:
+            accounts_df: Accounts (balance, type)
+            profile: User profile for peer benchmarks; see analyze_finances
+            benchmark_store: Optional BenchmarkStore; see analyze_finances
+
+        Returns:
+            analyze_finances-style result with INCREMENTAL_SECTIONS plus
+            recurring_transactions and unusual_transactions
+        """
+        if self.cube is None:
+            raise ValueError('No transactions have been added')
+        recent = PreparedTransactions.from_frame(self.recent, copy=True)
+        prepared = PreparedTransactions(recent.frame, cube=self.cube)
+
+        result = analyze_finances(None, accounts_df, sections=INCREMENTAL_SECTIONS, prepared=prepared,
+                                  profile=profile, benchmark_store=benchmark_store)
+        result['recurring_transactions'] = self.recurring_transactions()
+        result['unusual_transactions'] = self.unusual_transactions()
+        return result
+
+    def to_dict(self):
+        table = self.cube.table.reset_index() if self.cube is not None else None
+        if table is not None:
+            table['month'] = table['month'].astype(str)
+            for key in ('category', 'type'):
+                table[key] = table[key].astype(object)
+        return {
+            'threshold': self.threshold,
+            'cube': {
+                'rows': self.cube.rows,
+                'cells': table.to_dict('records'),
+            } if table is not None else None,
+            'recurring': self.recurring,
+            'unusual': self.unusual,
+            'recent': self.recent.to_dict('records'),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        cube = None
+        if data['cube'] is not None:
+            table = pd.DataFrame(data['cube']['cells'], columns=CUBE_KEYS + ['sum', 'count', 'sumsq', 'first'])
+            table['month'] = pd.PeriodIndex(table['month'], freq='M')
+            cube = AggregateCube(table.set_index(CUBE_KEYS), rows=data['cube']['rows'])
+        return cls(
+            cube=cube,
+            recurring=data['recurring'],
+            unusual=data['unusual'],
+            recent=pd.DataFrame(data['recent'], columns=ROW_COLUMNS),
+            threshold=data['threshold'],
+        )
+
+
+class AnalysisStateStore(JSONStateStore):
+    """Per-user AnalysisState as JSON files; see JSONStateStore."""
+
+    state_class = AnalysisState
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        super().__init__(state_dir)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_analysis_store():
+    """Return the process-wide analysis state store (directory from ANALYSIS_STATE_DIR)."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = AnalysisStateStore(os.getenv('ANALYSIS_STATE_DIR', DEFAULT_STATE_DIR))
+    return _default_store
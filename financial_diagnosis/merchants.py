@@ -0,0 +1,99 @@
+"""
+Merchant normalization for noisy card and transfer descriptions.
+Terminal IDs, dates, card suffixes, references and city names are stripped
+so that every variant of a merchant maps to one canonical merchant key.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Trailing place and country tokens that card terminals append
+_PLACES = (
+    'lisboa', 'lisbon', 'porto', 'braga', 'coimbra', 'faro', 'aveiro', 'setubal',
+    'funchal', 'amadora', 'almada', 'oeiras', 'cascais', 'sintra', 'loures',
+    'leiria', 'evora', 'viseu', 'guimaraes', 'matosinhos', 'odivelas', 'dublin',
+    'pt', 'prt', 'ie', 'irl', 'es', 'esp', 'eu',
+)
+
+# Digit runs are collapsed before the rules run: references and terminal IDs
+# make most raw descriptions unique, and every rule treats a run as a whole
+DIGIT_RUN = re.compile(r'\d+')
+
+# (pattern, replacement) pairs applied in order to lower-cased descriptions
+MERCHANT_RULES = [
+    # Noise tokens: masked card numbers (****1234, *1234), dates and times
+    # (12/03, 2024-03-12, 14:05), labelled references (ref 123, nr:45,
+    # terminal 8831), any other token containing a digit, and punctuation
+    (re.compile(
+        r'(?:[x*]{2,}|\*)\d+\b'
+        r'|\b\d+[/.-]\d+(?:[/.-]\d+)?\b'
+        r'|\b\d+:\d+(?::\d+)?\b'
+        r'|\b(?:ref|nr|no|id|doc|aut|terminal|tpa)\.?\s*[:#]?\s*\w*\d\w*'
+        r'|\b\w*\d\w*\b'
+        r'|[^\w\s]|_'
+    ), ' '),
+    # Card purchase prefixes
+    (re.compile(r'^\s*(?:compra|card|pos|tpa|purchase)\b'), ' '),
+    (re.compile(r'(?:\s+(?:' + '|'.join(_PLACES) + r'))+\s*$'), ''),
+]
+
+
+def merchant_keys(descriptions):
+    """
+    Map raw descriptions to canonical merchant keys.
+
+    The rules run once per distinct description skeleton (lower-cased, digit
+    runs collapsed), so cost scales with the number of merchants rather than
+    rows or raw strings.
+
+    Args:
+        descriptions: Series of transaction descriptions
+
+    Returns:
+        Categorical Series of merchant keys aligned with descriptions;
+        missing descriptions stay missing
+    """
+    codes, uniques = pd.factorize(descriptions)
+    if len(uniques) == 0:
+        # Empty or all missing
+        merchants = pd.Categorical.from_codes(np.full(len(codes), -1), categories=pd.Index([], dtype=object))
+        return pd.Series(merchants, index=descriptions.index, name='merchant')
+    lowered = pd.Series(uniques, dtype=object).astype(str).str.lower()
+    skeleton_codes, skeletons = pd.factorize(lowered.str.replace(DIGIT_RUN, '0', regex=True))
+
+    keys = pd.Series(skeletons, dtype=object)
+    for pattern, replacement in MERCHANT_RULES:
+        keys = keys.str.replace(pattern, replacement, regex=True)
+    unique_keys = keys.str.split().str.join(' ').to_numpy()[skeleton_codes]
+
+    # Descriptions that are nothing but noise keep their normalized text
+    empty = unique_keys == ''
+    if empty.any():
+        unique_keys[empty] = lowered[empty].str.split().str.join(' ')
+
+    unique_merchants = pd.Categorical(unique_keys)
+    missing = codes == -1
+    merchant_codes = unique_merchants.codes[np.where(missing, 0, codes)]
+    merchant_codes[missing] = -1
+    merchants = pd.Categorical.from_codes(merchant_codes, unique_merchants.categories)
+    return pd.Series(merchants, index=descriptions.index, name='merchant')
+
+
+def merchant_compression(descriptions):
+    """
+    Report how many distinct descriptions collapse into each merchant key.
+
+    Returns:
+        Dict with raw_descriptions, merchant_keys and compression_ratio
+        (raw distinct descriptions per merchant key)
+    """
+    keys = merchant_keys(descriptions)
+    raw_count = int(descriptions.nunique())
+    key_count = int(keys.nunique())
+    return {
+        'raw_descriptions': raw_count,
+        'merchant_keys': key_count,
+        'compression_ratio': float(raw_count / key_count) if key_count else 1.0,
+    }
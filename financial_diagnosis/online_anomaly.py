@@ -0,0 +1,319 @@
+"""
+Online anomaly detection for newly arriving transactions.
+Per-category and per-merchant amount statistics are updated one transaction
+at a time and persisted per user, so a new expense can be scored on ingest
+without re-running detect_unusual_spending over the full history.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .categorizer import get_categorizer
+from .merchants import merchant_keys
+from .state_store import JSONStateStore
+
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(__file__), 'data', 'anomaly_state')
+
+# Observations after which a past amount's weight in the quantile sketch halves
+DEFAULT_HALF_LIFE = 200
+
+# Merchant profiles kept per user; the least recently observed are dropped
+DEFAULT_MAX_MERCHANTS = 500
+
+
+class RunningStats:
+    """Streaming count, mean and variance (Welford's algorithm)."""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        """Sample standard deviation (0 with fewer than 2 values)."""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def zscore(self, value):
+        std = self.std
+        return (value - self.mean) / std if std > 0 else 0.0
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['count'], data['mean'], data['m2'])
+
+
+class DecayedQuantileSketch:
+    """
+    Exponentially decayed histogram of amounts over log-spaced bins.
+
+    Recent amounts weigh more, so quantiles follow changes in spending.
+    Instead of decaying every bin on each update, the weight added per
+    observation grows by 1/decay and the bins are rescaled only when it gets
+    large, so updates are O(1).
+    """
+
+    MIN_AMOUNT = 0.01
+    BINS_PER_DECADE = 16
+    NUM_BINS = 8 * BINS_PER_DECADE  # 0.01 to 1,000,000
+    RESCALE_AT = 1e100
+
+    def __init__(self, half_life=DEFAULT_HALF_LIFE, weights=None, increment=1.0):
+        self.half_life = half_life
+        self.decay = 0.5 ** (1.0 / half_life)
+        self.weights = weights if weights is not None else {}
+        self.increment = increment
+
+    def _bin(self, amount):
+        if amount <= self.MIN_AMOUNT:
+            return 0
+        index = int(math.log10(amount / self.MIN_AMOUNT) * self.BINS_PER_DECADE)
+        return min(index, self.NUM_BINS - 1)
+
+    def _bin_value(self, index):
+        """Geometric midpoint of a bin"""
+        return self.MIN_AMOUNT * 10 ** ((index + 0.5) / self.BINS_PER_DECADE)
+
+    def update(self, amount):
+        self.increment /= self.decay
+        index = self._bin(amount)
+        self.weights[index] = self.weights.get(index, 0.0) + self.increment
+        if self.increment > self.RESCALE_AT:
+            scale = 1.0 / self.increment
+            self.weights = {i: w * scale for i, w in self.weights.items() if w * scale > 1e-12}
+            self.increment = 1.0
+
+    def rank(self, amount):
+        """Decayed fraction of past amounts below amount (half of its own bin)."""
+        total = sum(self.weights.values())
+        if total <= 0:
+            return 0.0
+        index = self._bin(amount)
+        below = sum(w for i, w in self.weights.items() if i < index)
+        return (below + 0.5 * self.weights.get(index, 0.0)) / total
+
+    def quantile(self, q):
+        total = sum(self.weights.values())
+        if total <= 0:
+            return None
+        cumulative = 0.0
+        for index in sorted(self.weights):
+            cumulative += self.weights[index]
+            if cumulative >= q * total:
+                return self._bin_value(index)
+        return self._bin_value(max(self.weights))
+
+    def to_dict(self):
+        return {
+            'half_life': self.half_life,
+            'weights': {str(i): w for i, w in self.weights.items()},
+            'increment': self.increment,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        weights = {int(i): w for i, w in data['weights'].items()}
+        return cls(data['half_life'], weights, data['increment'])
+
+
+class AmountProfile:
+    """Running statistics and decayed quantiles of one category's or merchant's amounts."""
+
+    def __init__(self, half_life=DEFAULT_HALF_LIFE, stats=None, sketch=None):
+        self.stats = stats or RunningStats()
+        self.sketch = sketch or DecayedQuantileSketch(half_life)
+
+    def update(self, amount):
+        self.stats.update(amount)
+        self.sketch.update(amount)
+
+    def to_dict(self):
+        return {'stats': self.stats.to_dict(), 'sketch': self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            stats=RunningStats.from_dict(data['stats']),
+            sketch=DecayedQuantileSketch.from_dict(data['sketch'])
+        )
+
+
+class OnlineAnomalyDetector:
+    """
+    Per-category and per-merchant anomaly detector for expenses.
+
+    An expense is unusual when, at either level, it lies more than
+    threshold standard deviations above the mean (after min_count
+    transactions), or above the decayed quantile_threshold of recent
+    amounts (after min_quantile_count transactions).
+
+    Descriptions yield an open-ended set of merchants, so only the
+    max_merchants most recently observed merchant profiles are kept.
+    """
+
+    def __init__(self, threshold=2.0, min_count=3, quantile_threshold=0.99,
+                 min_quantile_count=20, half_life=DEFAULT_HALF_LIFE, max_merchants=DEFAULT_MAX_MERCHANTS):
+        self.threshold = threshold
+        self.min_count = min_count
+        self.quantile_threshold = quantile_threshold
+        self.min_quantile_count = min_quantile_count
+        self.half_life = half_life
+        self.max_merchants = max_merchants
+        # Least recently observed first
+        self.profiles = {'category': OrderedDict(), 'merchant': OrderedDict()}
+
+    def _keys(self, transactions):
+        """Category and merchant keys of each transaction, matched in one pass"""
+        descriptions = pd.Series([transaction.get('description') for transaction in transactions], dtype=object)
+        categories = get_categorizer().match_categories(descriptions)
+        merchants = merchant_keys(descriptions).astype(object)
+        return [
+            {
+                'category': category if pd.notna(category) else (transaction.get('category') or 'Uncategorized'),
+                'merchant': merchant if pd.notna(merchant) else None,
+            }
+            for transaction, category, merchant in zip(transactions, categories, merchants)
+        ]
+
+    def _score_profile(self, profile, amount):
+        stats = profile.stats
+        zscore = stats.zscore(amount)
+        rank = profile.sketch.rank(amount)
+        unusual = (
+            (stats.count >= self.min_count and zscore > self.threshold)
+            or (stats.count >= self.min_quantile_count and rank > self.quantile_threshold)
+        )
+        return {
+            'count': stats.count,
+            'typical_amount': stats.mean,
+            'zscore': zscore,
+            'quantile_rank': rank,
+            'p95': profile.sketch.quantile(0.95),
+            'unusual': bool(unusual),
+        }
+
+    def observe(self, transaction, update=True):
+        """
+        Score a transaction against the history so far, then add it to the history.
+
+        Args:
+            transaction: Dict with amount, type and optionally date,
+                description and category
+            update: Whether to add the transaction to the profiles
+
+        Returns:
+            Dict with the transaction's category and merchant, per-level
+            scores and an overall 'unusual' flag; non-expenses are not scored
+        """
+        return self.observe_many([transaction], update)[0]
+
+    def observe_many(self, transactions, update=True):
+        """
+        Score transactions in order, as observe() does one at a time.
+
+        Descriptions are categorized and mapped to merchants in one batch
+        before scoring.
+
+        Returns:
+            List of observe() results, one per transaction
+        """
+        return [
+            self._observe(transaction, keys, update)
+            for transaction, keys in zip(transactions, self._keys(transactions))
+        ]
+
+    def _observe(self, transaction, keys, update):
+        amount = abs(float(transaction['amount']))
+        result = {
+            'date': transaction.get('date'),
+            'description': transaction.get('description'),
+            'amount': amount,
+            'category': keys['category'],
+            'merchant': keys['merchant'],
+            'scored': False,
+            'unusual': False,
+            'scores': {},
+        }
+        if str(transaction.get('type', 'expense')).lower() != 'expense':
+            return result
+
+        for level, key in keys.items():
+            if key is None:
+                continue
+            profiles = self.profiles[level]
+            profile = profiles.get(key)
+            if profile is not None:
+                result['scores'][level] = self._score_profile(profile, amount)
+            if update:
+                if profile is None:
+                    profile = profiles[key] = AmountProfile(self.half_life)
+                profile.update(amount)
+                profiles.move_to_end(key)
+                if level == 'merchant' and len(profiles) > self.max_merchants:
+                    profiles.popitem(last=False)
+
+        result['scored'] = True
+        result['unusual'] = any(score['unusual'] for score in result['scores'].values())
+        return result
+
+    def to_dict(self):
+        return {
+            'threshold': self.threshold,
+            'min_count': self.min_count,
+            'quantile_threshold': self.quantile_threshold,
+            'min_quantile_count': self.min_quantile_count,
+            'half_life': self.half_life,
+            'max_merchants': self.max_merchants,
+            'profiles': {
+                level: {key: profile.to_dict() for key, profile in profiles.items()}
+                for level, profiles in self.profiles.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        detector = cls(
+            data['threshold'], data['min_count'], data['quantile_threshold'],
+            data['min_quantile_count'], data['half_life'],
+            data.get('max_merchants', DEFAULT_MAX_MERCHANTS)
+        )
+        for level, profiles in data['profiles'].items():
+            for key, profile in profiles.items():
+                detector.profiles[level][key] = AmountProfile.from_dict(profile)
+        return detector
+
+
+class AnomalyStateStore(JSONStateStore):
+    """Per-user OnlineAnomalyDetector state as JSON files; see JSONStateStore."""
+
+    state_class = OnlineAnomalyDetector
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        super().__init__(state_dir)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_anomaly_store():
+    """Return the process-wide detector state store (directory from ANOMALY_STATE_DIR)."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = AnomalyStateStore(os.getenv('ANOMALY_STATE_DIR', DEFAULT_STATE_DIR))
+    return _default_store
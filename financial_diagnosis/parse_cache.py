@@ -0,0 +1,207 @@
+"""
+Content-addressed cache for parsed bank statements.
+Parsed DataFrames are stored on disk as Arrow IPC files, keyed by the SHA-256
+of the uploaded bytes, and memory-mapped back on a cache hit.
+"""
+import hashlib
+import os
+import re
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pyarrow is optional; without it the cache stays disabled
+    pa = None
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'data', 'parse_cache')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ParseCache:
+    """
+    On-disk parse cache with size-bounded LRU eviction.
+
+    Each entry is one Arrow IPC file. A hit touches the file's mtime, so
+    eviction removes the least recently used files first until the cache fits
+    in max_bytes.
+
+    Entries are shared by everyone uploading the same bytes; get() and put()
+    with an owner record the key in that owner's index, so purge_owner() can
+    delete every entry parsed from their uploads.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(cache_dir, 'owners'), exist_ok=True)
+
+    @staticmethod
+    def key(file_content, filename, file_type, parser_version):
+        """
+        Build the cache key for an upload.
+
+        The extension is part of the key because it selects the parser.
+        """
+        digest = hashlib.sha256(file_content).hexdigest()
+        extension = os.path.splitext(filename.lower())[1].lstrip('.') or 'none'
+        return f'{digest}-v{parser_version}-{file_type}-{extension}'
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.arrow')
+
+    def _owner_path(self, owner):
+        safe_id = re.sub(r'[^\w-]', '_', str(owner))
+        return os.path.join(self.cache_dir, 'owners', f'{safe_id}.keys')
+
+    def _add_owner(self, key, owner):
+        path = self._owner_path(owner)
+        with self._lock:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    if key in f.read().split():
+                        return
+            except FileNotFoundError:
+                pass
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(f'{key}\n')
+
+    def get(self, key, owner=None):
+        """Return the cached DataFrame for key, or None on a miss; a hit is recorded for owner."""
+        path = self._path(key)
+        try:
+            with pa.memory_map(path, 'r') as source:
+                df = pa.ipc.open_file(source).read_all().to_pandas()
+            os.utime(path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        if owner is not None:
+            self._add_owner(key, owner)
+        return df
+
+    def put(self, key, df, owner=None):
+        """
+        Store a parsed DataFrame under key, recorded for owner.
+
+        Frames Arrow cannot represent (e.g. columns mixing numbers and
+        strings) are skipped rather than failing the upload.
+        """
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowException, TypeError, ValueError):
+            return False
+
+        path = self._path(key)
+        # Unique per process and thread; os.replace publishes the file atomically
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, path)
+        finally:
+            # A failed write (e.g. a full disk) must not leave a file _evict() never sees
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if owner is not None:
+            self._add_owner(key, owner)
+        self._evict()
+        return True
+
+    def purge_owner(self, owner):
+        """
+        Delete every entry recorded for owner, and their index.
+
+        Returns:
+            Number of entries deleted (evicted ones are skipped)
+        """
+        path = self._owner_path(owner)
+        with self._lock:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    keys = set(f.read().split())
+            except FileNotFoundError:
+                return 0
+            removed = 0
+            for key in keys:
+                try:
+                    os.remove(self._path(key))
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+            os.remove(path)
+        return removed
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.arrow'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        """Return entry count, size on disk and hit/miss/eviction counters."""
+        sizes = [
+            os.path.getsize(os.path.join(self.cache_dir, name))
+            for name in os.listdir(self.cache_dir) if name.endswith('.arrow')
+        ]
+        with self._lock:
+            return {
+                'entries': len(sizes),
+                'size_bytes': sum(sizes),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_parse_cache():
+    """
+    Return the process-wide parse cache, or None when it is unavailable.
+
+    Configured with PARSE_CACHE_DIR and PARSE_CACHE_MAX_BYTES; set
+    PARSE_CACHE_MAX_BYTES=0 to disable caching.
+    """
+    global _default_cache
+    max_bytes = int(os.getenv('PARSE_CACHE_MAX_BYTES', str(DEFAULT_MAX_BYTES)))
+    if pa is None or max_bytes <= 0:
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ParseCache(
+                    os.getenv('PARSE_CACHE_DIR', DEFAULT_CACHE_DIR),
+                    max_bytes
+                )
+    return _default_cache
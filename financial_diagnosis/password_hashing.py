@@ -0,0 +1,152 @@
+"""
+Bounded pool for password hashing.
+werkzeug's password hashes are deliberately expensive key derivations. They
+run on a few dedicated threads (hashlib releases the GIL while deriving)
+behind a bounded queue. When the queue is full, new work is rejected at once
+with PasswordHashingBusy, so a login burst gets fast 429s instead of tying up
+every request thread.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+# Recent hash latencies kept for the percentiles in stats()
+LATENCY_WINDOW = 1000
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer HTTP 429."""
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+class PasswordHashingPool:
+    """
+    Thread pool for password hashing with a bounded queue.
+
+    At most workers hashes run at once and max_queue more wait; further
+    submissions raise PasswordHashingBusy. hash() and check() block the
+    calling thread for the result; hash_async() and check_async() can be
+    awaited from asyncio code.
+    """
+
+    def __init__(self, workers=None, max_queue=32):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        # (seconds waiting in the queue, seconds hashing) of recent hashes
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def submit(self, func, *args):
+        """
+        Run func(*args) on the pool.
+
+        Returns:
+            concurrent.futures.Future of the result
+
+        Raises:
+            PasswordHashingBusy: workers are busy and max_queue calls wait
+        """
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHashingBusy('Too many password operations in progress, retry shortly')
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return self._executor.submit(self._run, time.perf_counter(), func, args)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+
+    def _run(self, submitted, func, args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self._latencies.append((started - submitted, finished - started))
+
+    def hash(self, password, timeout=None):
+        """generate_password_hash on the pool"""
+        return self.submit(generate_password_hash, password).result(timeout)
+
+    def check(self, password_hash, password, timeout=None):
+        """check_password_hash on the pool"""
+        return self.submit(check_password_hash, password_hash, password).result(timeout)
+
+    async def hash_async(self, password):
+        """Awaitable generate_password_hash on the pool"""
+        return await asyncio.wrap_future(self.submit(generate_password_hash, password))
+
+    async def check_async(self, password_hash, password):
+        """Awaitable check_password_hash on the pool"""
+        return await asyncio.wrap_future(self.submit(check_password_hash, password_hash, password))
+
+    def stats(self):
+        """Return queue depth, counters and recent latency percentiles (milliseconds)"""
+        with self._lock:
+            in_flight = self.in_flight
+            counters = {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': in_flight,
+                'queue_depth': max(0, in_flight - self.workers),
+                'peak_in_flight': self.peak_in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+            latencies = list(self._latencies)
+        waits = sorted(wait * 1000 for wait, _ in latencies)
+        totals = sorted((wait + hashing) * 1000 for wait, hashing in latencies)
+        hashing = sorted(hashing * 1000 for _, hashing in latencies)
+        return {
+            **counters,
+            'queue_wait_ms': {'p50': _percentile(waits, 0.5), 'p95': _percentile(waits, 0.95)},
+            'hash_ms': {'p50': _percentile(hashing, 0.5), 'p95': _percentile(hashing, 0.95)},
+            'latency_ms': {'p50': _percentile(totals, 0.5), 'p95': _percentile(totals, 0.95),
+                           'max': totals[-1] if totals else None},
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """Return the process-wide hashing pool (sized by PASSWORD_HASH_WORKERS and PASSWORD_HASH_QUEUE)."""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                workers = os.getenv('PASSWORD_HASH_WORKERS')
+                _default_pool = PasswordHashingPool(
+                    workers=int(workers) if workers else None,
+                    max_queue=int(os.getenv('PASSWORD_HASH_QUEUE', '32'))
+                )
+    return _default_pool
+
+
+def password_hashing_stats():
+    """Return queue depth and latency metrics of the process-wide hashing pool"""
+    return get_hashing_pool().stats()
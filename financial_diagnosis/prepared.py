@@ -0,0 +1,108 @@
+"""
+Canonical, prepared transaction frame shared by all analytics stages.
+Dates, amounts, types, categories and the month key are normalized once per
+analysis instead of once per stage.
+"""
+from functools import cached_property
+
+import pandas as pd
+
+from .aggregates import AggregateCube
+
+
+def _parse_dates(values):
+    """
+    Parse a date column of mixed formats.
+
+    ISO (year-first) dates are parsed as such; everything else is parsed
+    day-first, as Portuguese statements write dates. Parsing ISO dates with
+    dayfirst=True would swap their month and day.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    dates = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    rest = dates.isna() & values.notna()
+    if rest.any():
+        # Flexible date parsing - handle multiple formats
+        try:
+            dates[rest] = pd.to_datetime(values[rest], format='mixed', dayfirst=True, errors='coerce')
+        except (TypeError, ValueError):
+            # Fallback: try common formats
+            dates[rest] = pd.to_datetime(values[rest], errors='coerce')
+    return dates
+
+
+class PreparedTransactions:
+    """
+    Read-only, normalized view of a transactions DataFrame.
+
+    The frame holds datetime64 'date', float 'amount', categorical 'type'
+    (lower-cased) and 'category', and a Period[M] 'month' column. Rows with
+    unparseable dates or amounts are dropped. Stages must treat the frame as
+    read-only and copy it before adding columns.
+
+    Because 'type' and 'category' are categorical, group by them with
+    observed=True so unused categories do not show up as empty groups.
+    """
+
+    def __init__(self, frame, cube=None):
+        object.__setattr__(self, '_frame', frame)
+        if cube is not None:
+            # Precomputed cube, e.g. one covering history no longer held as rows
+            self.__dict__['cube'] = cube
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PreparedTransactions is immutable')
+
+    @classmethod
+    def from_frame(cls, df, copy=True):
+        """
+        Normalize a raw transactions DataFrame.
+
+        Args:
+            df: DataFrame with date, amount, type and optionally category
+            copy: Copy df first; pass False when df is a private frame
+        """
+        df = df.copy() if copy else df
+
+        df['date'] = _parse_dates(df['date'])
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').astype('float64')
+        # Remove rows with invalid dates or amounts
+        df = df.dropna(subset=['date', 'amount'])
+
+        df['type'] = df['type'].astype(str).str.lower().astype('category')
+        if 'category' not in df.columns:
+            df['category'] = 'Uncategorized'
+        df['category'] = df['category'].astype(object).fillna('Uncategorized').astype('category')
+        df['month'] = df['date'].dt.to_period('M')
+        return cls(df)
+
+    @property
+    def frame(self):
+        """The normalized DataFrame (do not mutate)."""
+        return self._frame
+
+    @cached_property
+    def income(self):
+        """Rows of type 'income'."""
+        return self._frame[self._frame['type'] == 'income']
+
+    @cached_property
+    def expenses(self):
+        """Rows of type 'expense'."""
+        return self._frame[self._frame['type'] == 'expense']
+
+    @cached_property
+    def cube(self):
+        """Month x category x type AggregateCube, built on first use."""
+        return AggregateCube.from_frame(self._frame)
+
+    def __len__(self):
+        return len(self._frame)
+
+
+def prepare_transactions(transactions):
+    """Return transactions as PreparedTransactions, normalizing a raw DataFrame once."""
+    if isinstance(transactions, PreparedTransactions):
+        return transactions
+    return PreparedTransactions.from_frame(transactions)
@@ -0,0 +1,72 @@
+"""
+Per-user state persisted as JSON files.
+Shared by the online anomaly detector and incremental analysis, whose
+per-user state is loaded, updated with new transactions and saved back.
+"""
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+
+
+class JSONStateStore:
+    """
+    Per-user state as JSON files, one per user in state_dir.
+
+    Subclasses set state_class to a class with to_dict() and from_dict();
+    a user without stored state gets state_class().
+
+    Writes go to a temporary file that replaces the old state atomically.
+    lock(user_id) serializes load-update-save cycles for one user within the
+    process.
+    """
+
+    state_class = None
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self._locks = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _path(self, user_id):
+        safe_id = re.sub(r'[^\w-]', '_', str(user_id))
+        return os.path.join(self.state_dir, f'{safe_id}.json')
+
+    def lock(self, user_id):
+        with self._locks_lock:
+            return self._locks[str(user_id)]
+
+    def load(self, user_id):
+        """Return the user's stored state, or a new one if none is stored."""
+        data = self.load_dict(user_id)
+        return self.state_class() if data is None else self.state_class.from_dict(data)
+
+    def load_dict(self, user_id):
+        """Return the user's stored state as saved by to_dict(), or None if none is stored."""
+        try:
+            with open(self._path(user_id), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, user_id):
+        """Delete the user's stored state; returns whether there was one."""
+        with self.lock(user_id):
+            try:
+                os.remove(self._path(user_id))
+            except FileNotFoundError:
+                return False
+        return True
+
+    def save(self, user_id, state):
+        path = self._path(user_id)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state.to_dict(), f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
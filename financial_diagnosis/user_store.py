@@ -1,15 +1,182 @@
 import sqlite3
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .cohort_benchmarks import benchmarks_enabled, get_benchmark_store
+from .incremental import get_analysis_store
+from .online_anomaly import get_anomaly_store
+from .parse_cache import get_parse_cache
+from .password_hashing import get_hashing_pool
 
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'users.db')
 
+# How long a writer waits for the database lock before failing
+BUSY_TIMEOUT_MS = 5000
+# Prepared statements kept per connection
+CACHED_STATEMENTS = 64
+
+_local = threading.local()
+
+
+class UserCache:
+    """
+    Bounded, thread-safe TTL cache of user records by email
+
+    A cached value of None means no such user. Writers call invalidate()
+    after committing; a lookup that started before an invalidation does not
+    store its (possibly stale) result. sync() drops every entry when the
+    database's users generation moved, i.e. another worker wrote a user.
+    """
+
+    def __init__(self, ttl=30.0, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = 0
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Look up a key
+
+        Returns:
+            Tuple of (found, user); user is a copy the caller may modify
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                user = entry[1]
+                return True, dict(user) if user else user
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, user, version):
+        """Store a user read when the cache was at version, unless invalidated since"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, dict(user) if user else user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a key after its user record changed"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self.version += 1
+            self.invalidations += 1
+
+    def sync(self, generation):
+        """Drop all entries if the users generation differs from the one they were read at"""
+        with self._lock:
+            if generation != self.generation:
+                self._entries.clear()
+                self.generation = generation
+                self.version += 1
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.version += 1
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        """Return size and hit/miss/eviction/invalidation counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+# Process-wide cache of user records; USER_CACHE_TTL=0 disables it
+user_cache = UserCache(ttl=float(os.getenv('USER_CACHE_TTL', '30')),
+                       max_size=int(os.getenv('USER_CACHE_SIZE', '10000')))
+
+
+def user_cache_stats():
+    """Return hit/miss/eviction counters of the user record cache"""
+    return user_cache.stats()
+
+
+def _invalidate_user(email):
+    user_cache.invalidate((DB_PATH, email))
+
+
+def get_connection():
+    """
+    Return this thread's connection to DB_PATH, opening it on first use.
+
+    Each thread keeps one connection for its lifetime (it is closed when the
+    thread ends). Connections use WAL journaling, so reads don't block on a
+    writer, synchronous=NORMAL (durable in WAL mode apart from the last
+    commits on power loss), and wait up to BUSY_TIMEOUT_MS for the write
+    lock instead of failing with 'database is locked'.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        _local.conn, _local.path = conn, DB_PATH
+    return conn
+
+
+def close_connection():
+    """Close this thread's connection, if open."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+@contextmanager
+def transaction():
+    """Run statements on this thread's connection; commits, or rolls back on error."""
+    conn = get_connection()
+    with conn:
+        yield conn
+
+
+def _fetch_one(sql, params=()):
+    # fetchall() finishes the statement, so no read snapshot is left open
+    rows = get_connection().execute(sql, params).fetchall()
+    return dict(rows[0]) if rows else None
+
 
 def init_db():
     """Initialize the database and create users table if it doesn't exist."""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -46,77 +213,96 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
     ''')
+    # Every change to users bumps the generation, which tells other workers' caches to drop their entries
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            generation INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO users_generation (id, generation) VALUES (0, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS users_generation_{event.lower()} AFTER {event} ON users
+            BEGIN UPDATE users_generation SET generation = generation + 1; END
+        ''')
+    # token is UNIQUE and so already indexed; expiry and per-user cleanup are not
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reset_tokens_expires_at ON reset_tokens (expires_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reset_tokens_user_id ON reset_tokens (user_id)')
     conn.commit()
     
     # Insert demo user if not exists
     try:
-        cursor.execute('INSERT INTO users (email, password_hash, paid) VALUES (?, ?, ?)',
-                      ('demo@example.com', generate_password_hash('Demo123!'), 1))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute('INSERT INTO users (email, password_hash, paid) VALUES (?, ?, ?)',
+                         ('demo@example.com', get_hashing_pool().hash('Demo123!'), 1))
     except sqlite3.IntegrityError:
         pass  # User already exists
-    
-    conn.close()
+    else:
+        _invalidate_user('demo@example.com')
 
 
 def get_user_by_email(email):
-    """Retrieve user by email."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
-    user = cursor.fetchone()
-    conn.close()
-    return dict(user) if user else None
+    """Retrieve user by email (served from user_cache when no worker has changed users since)."""
+    key = (DB_PATH, email)
+    if user_cache.ttl > 0:
+        generation = get_connection().execute('SELECT generation FROM users_generation').fetchone()[0]
+        user_cache.sync((DB_PATH, generation))
+    found, user = user_cache.get(key)
+    if found:
+        return user
+    version = user_cache.version
+    user = _fetch_one('SELECT * FROM users WHERE email = ?', (email,))
+    user_cache.put(key, user, version)
+    return user
+
+
+def get_user_by_id(user_id):
+    """Retrieve user by id."""
+    return _fetch_one('SELECT * FROM users WHERE id = ?', (user_id,))
 
 
 def verify_user(email, password):
-    """Verify user credentials."""
+    """Verify user credentials (raises PasswordHashingBusy when the hashing pool is full)."""
     user = get_user_by_email(email)
-    if user and check_password_hash(user['password_hash'], password):
+    if user and get_hashing_pool().check(user['password_hash'], password):
         return user
     return None
 
 
 def create_user(email, password):
     """Create a new user."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    password_hash = get_hashing_pool().hash(password)
     try:
-        cursor.execute('INSERT INTO users (email, password_hash, paid) VALUES (?, ?, 0)',
-                  (email, generate_password_hash(password)))
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
-        return get_user_by_email(email)
+        with transaction() as conn:
+            conn.execute('INSERT INTO users (email, password_hash, paid) VALUES (?, ?, 0)',
+                         (email, password_hash))
     except sqlite3.IntegrityError:
-        conn.close()
         return None  # User already exists
+    _invalidate_user(email)
+    return get_user_by_email(email)
 
 
 def create_admin(email, password):
     """Create or update an admin user. Marks paid and admin flags."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    password_hash = get_hashing_pool().hash(password)
     existing = get_user_by_email(email)
-    if existing:
-        cursor.execute('UPDATE users SET password_hash = ?, paid = 1, is_admin = 1 WHERE email = ?',
-                       (generate_password_hash(password), email))
-    else:
-        cursor.execute('INSERT INTO users (email, password_hash, paid, is_admin) VALUES (?, ?, 1, 1)',
-                       (email, generate_password_hash(password)))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        if existing:
+            conn.execute('UPDATE users SET password_hash = ?, paid = 1, is_admin = 1 WHERE email = ?',
+                         (password_hash, email))
+        else:
+            conn.execute('INSERT INTO users (email, password_hash, paid, is_admin) VALUES (?, ?, 1, 1)',
+                         (email, password_hash))
+    _invalidate_user(email)
     return get_user_by_email(email)
 
 
 def mark_paid(email):
     """Mark a user's account as paid (beta access granted)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE users SET paid = 1 WHERE email = ?', (email,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('UPDATE users SET paid = 1 WHERE email = ?', (email,))
+    _invalidate_user(email)
 
 
 def has_paid(email):
@@ -143,12 +329,9 @@ def create_reset_token(email):
     token = secrets.token_urlsafe(32)
     expires_at = datetime.now() + timedelta(hours=1)
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO reset_tokens (user_id, token, expires_at) VALUES (?, ?, ?)',
-                  (user['id'], token, expires_at))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('INSERT INTO reset_tokens (user_id, token, expires_at) VALUES (?, ?, ?)',
+                     (user['id'], token, expires_at))
     return token
 
 
@@ -156,17 +339,11 @@ def verify_reset_token(token):
     """Verify and return user for valid reset token."""
     from datetime import datetime
     
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('''
+    return _fetch_one('''
         SELECT rt.*, u.email FROM reset_tokens rt
         JOIN users u ON rt.user_id = u.id
         WHERE rt.token = ? AND rt.used = 0 AND rt.expires_at > ?
     ''', (token, datetime.now()))
-    result = cursor.fetchone()
-    conn.close()
-    return dict(result) if result else None
 
 
 def reset_password(token, new_password):
@@ -175,13 +352,12 @@ def reset_password(token, new_password):
     if not token_data:
         return False
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE users SET password_hash = ? WHERE id = ?',
-                  (generate_password_hash(new_password), token_data['user_id']))
-    cursor.execute('UPDATE reset_tokens SET used = 1 WHERE token = ?', (token,))
-    conn.commit()
-    conn.close()
+    password_hash = get_hashing_pool().hash(new_password)
+    with transaction() as conn:
+        conn.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                     (password_hash, token_data['user_id']))
+        conn.execute('UPDATE reset_tokens SET used = 1 WHERE token = ?', (token,))
+    _invalidate_user(token_data['email'])
     return True
 
 
@@ -194,7 +370,11 @@ def export_user_data(email):
     return {
         'email': user['email'],
         'created_at': user['created_at'],
-        'note': 'Financial transaction data is not stored on server; only uploaded temporarily for analysis.'
+        'analysis_state': get_analysis_store().load_dict(user['id']),
+        'anomaly_state': get_anomaly_store().load_dict(user['id']),
+        'benchmark_metrics': get_benchmark_store().user_metrics(user['id']) if benchmarks_enabled() else None,
+        'note': ('Uploaded statements are parsed for analysis; parsed copies kept in the parse cache '
+                 'are deleted with the account.')
     }
 
 
@@ -204,21 +384,24 @@ def delete_user_account(email):
     if not user:
         return False
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM reset_tokens WHERE user_id = ?', (user['id'],))
-    cursor.execute('DELETE FROM users WHERE id = ?', (user['id'],))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute('DELETE FROM reset_tokens WHERE user_id = ?', (user['id'],))
+        conn.execute('DELETE FROM users WHERE id = ?', (user['id'],))
+    _invalidate_user(email)
+
+    get_analysis_store().delete(user['id'])
+    get_anomaly_store().delete(user['id'])
+    if benchmarks_enabled():
+        get_benchmark_store().delete(user['id'])
+    parse_cache = get_parse_cache()
+    if parse_cache is not None:
+        parse_cache.purge_owner(user['id'])
     return True
 
 
 def list_users():
     """List all users for admin view."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, email, created_at, paid, is_admin FROM users ORDER BY created_at DESC')
-    rows = cursor.fetchall()
-    conn.close()
+    rows = get_connection().execute(
+        'SELECT id, email, created_at, paid, is_admin FROM users ORDER BY created_at DESC'
+    ).fetchall()
     return [dict(r) for r in rows]
@@ -11,17 +11,31 @@ import pandas as pd
 import json
 from datetime import datetime
 import io
-from financial_diagnosis.analytics import analyze_finances
+from financial_diagnosis.analytics import analyze_finances, resolve_sections
 from financial_diagnosis.file_parsers import parse_file
-from financial_diagnosis.user_store import UserStore
+from financial_diagnosis.parse_cache import get_parse_cache
+from financial_diagnosis.online_anomaly import get_anomaly_store
+from financial_diagnosis.incremental import AnalysisState, get_analysis_store
+from financial_diagnosis.batch import score_households
+from financial_diagnosis.cohort_benchmarks import benchmark_metrics, benchmarks_enabled, get_benchmark_store
+from financial_diagnosis import user_store
+from financial_diagnosis.password_hashing import PasswordHashingBusy, password_hashing_stats
 from financial_diagnosis.diagnostic_engine import run_diagnostics
+from financial_diagnosis.categorizer import get_categorizer, categorizer_cache_stats
 
 app = Flask(__name__)
 app.secret_key = os.getenv('FINANCE_DIAGNOSIS_SECRET_KEY', 'change-this-in-production')
 
 # Separate database for financial diagnosis users
-DIAGNOSIS_DB_PATH = 'financial_diagnosis_users.db'
-user_store = UserStore(DIAGNOSIS_DB_PATH)
+DIAGNOSIS_DB_PATH = os.path.abspath(os.getenv('DIAGNOSIS_DB_PATH', 'financial_diagnosis_users.db'))
+user_store.DB_PATH = DIAGNOSIS_DB_PATH
+user_store.init_db()
+
+# Peer benchmarks are opt-in: only with a configured BENCHMARK_DB_PATH (and BENCHMARK_SALT)
+benchmark_store = get_benchmark_store() if benchmarks_enabled() else None
+
+# Compile the categorizer once; its description cache is shared by all requests
+get_categorizer()
 
 # Upload configuration
 UPLOAD_FOLDER = 'uploads/financial_diagnosis'
@@ -43,6 +57,11 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+@app.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(e):
+    """Password hashing pool saturated (e.g. a login burst); ask the client to retry"""
+    return jsonify({'error': str(e)}), 429, {'Retry-After': '1'}
+
 # ==================== AUTHENTICATION ENDPOINTS ====================
 
 @app.route('/api/diagnosis/register', methods=['POST'])
@@ -51,7 +70,6 @@ def register():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
-    name = data.get('name', '')
     
     if not email or not password:
         return jsonify({'error': 'Email and password required'}), 400
@@ -61,12 +79,14 @@ def register():
     if existing_user:
         return jsonify({'error': 'User already exists'}), 409
     
-    # Create user
-    user_id = user_store.create_user(email, password, name)
+    # Create user (None if another request registered the email first)
+    user = user_store.create_user(email, password)
+    if not user:
+        return jsonify({'error': 'User already exists'}), 409
     
     return jsonify({
         'message': 'Registration successful',
-        'user_id': user_id
+        'user_id': user['id']
     }), 201
 
 @app.route('/api/diagnosis/login', methods=['POST'])
@@ -140,10 +160,12 @@ def upload_file():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         unique_filename = f"{session['diagnosis_user_id']}_{timestamp}_{filename}"
         filepath = os.path.join(UPLOAD_FOLDER, unique_filename)
-        file.save(filepath)
+        file_content = file.read()
+        with open(filepath, 'wb') as f:
+            f.write(file_content)
         
-        # Parse file
-        parsed_data = parse_file(filepath)
+        # Parse file (repeated uploads of the same bytes hit the parse cache)
+        parsed_data = parse_file(file_content, filename, owner=session['diagnosis_user_id'])
         
         return jsonify({
             'message': 'File uploaded successfully',
@@ -177,8 +199,22 @@ def analyze():
         
         accounts_df = pd.DataFrame(accounts_data) if accounts_data else None
         
-        # Run analysis
-        analysis_result = analyze_finances(transactions_df, accounts_df)
+        # Optional subset of sections, e.g. ['income_vs_expenses']
+        sections = data.get('sections')
+        try:
+            resolve_sections(sections)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Run analysis (profile: optional age and household for peer benchmarks)
+        analysis_result = analyze_finances(transactions_df, accounts_df, sections=sections,
+                                           profile=data.get('profile'), benchmark_store=benchmark_store)
+        
+        # Add the user's anonymized metrics to the peer benchmarks
+        benchmarks = analysis_result.get('benchmarks')
+        if benchmark_store is not None and isinstance(benchmarks, dict) and 'cohort' in benchmarks:
+            benchmark_store.record(session['diagnosis_user_id'], benchmarks['cohort'],
+                                   benchmark_metrics(analysis_result))
         
         # Run diagnostics
         diagnostics = run_diagnostics(analysis_result)
@@ -205,21 +241,28 @@ def quick_analyze():
     """
     data = request.get_json()
     filename = data.get('filename')
+    sections = data.get('sections')
     
     if not filename:
         return jsonify({'error': 'Filename required'}), 400
     
+    try:
+        resolve_sections(sections)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     
     if not os.path.exists(filepath):
         return jsonify({'error': 'File not found'}), 404
     
     try:
-        # Parse file
-        parsed_data = parse_file(filepath)
+        # Parse file (served from the parse cache if it was parsed on upload)
+        with open(filepath, 'rb') as f:
+            parsed_data = parse_file(f.read(), filename, owner=session['diagnosis_user_id'])
         
         # Assume it's transactions data
-        analysis_result = analyze_finances(parsed_data, None)
+        analysis_result = analyze_finances(parsed_data, None, sections=sections)
         
         # Run diagnostics
         diagnostics = run_diagnostics(analysis_result)
@@ -236,6 +279,118 @@ def quick_analyze():
     except Exception as e:
         return jsonify({'error': f'Analysis error: {str(e)}'}), 500
 
+@app.route('/api/diagnosis/analyze/incremental', methods=['POST'])
+@login_required
+def analyze_incremental():
+    """
+    Incremental analysis of a new statement
+    Folds only the new transactions into the user's stored analysis state
+    and regenerates the analysis from it; 'reset' starts a new history.
+    Statements are expected in date order: transactions more than a month
+    before the latest one folded in, or repeating one from that month (same
+    date, amount and description), are skipped, so re-uploading or
+    overlapping statements are not counted twice; 'rows_added' reports how
+    many rows were new
+    """
+    data = request.get_json() or {}
+    transactions_data = data.get('transactions', [])
+    accounts_data = data.get('accounts', [])
+    
+    if not transactions_data:
+        return jsonify({'error': 'No transaction data provided'}), 400
+    
+    try:
+        user_id = session['diagnosis_user_id']
+        accounts_df = pd.DataFrame(accounts_data) if accounts_data else None
+        store = get_analysis_store()
+        with store.lock(user_id):
+            state = AnalysisState() if data.get('reset') else store.load(user_id)
+            added = state.append(pd.DataFrame(transactions_data))
+            store.save(user_id, state)
+        
+        analysis_result = state.analyze(accounts_df, data.get('profile'), benchmark_store)
+        diagnostics = run_diagnostics(analysis_result)
+        
+        result = {
+            **analysis_result,
+            'diagnostics': diagnostics,
+            'rows_added': added,
+            'rows_total': state.rows,
+            'analyzed_at': datetime.now().isoformat(),
+            'user_id': user_id
+        }
+        
+        return jsonify(result), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Analysis error: {str(e)}'}), 500
+
+@app.route('/api/diagnosis/analyze/batch', methods=['POST'])
+@login_required
+def analyze_batch():
+    """
+    Batch scoring of many households
+    Accepts transactions of several clients, each row with a user_id, plus
+    optional accounts (with user_id) and profiles keyed by user_id
+    """
+    data = request.get_json() or {}
+    transactions_data = data.get('transactions', [])
+    accounts_data = data.get('accounts', [])
+
+    if not transactions_data:
+        return jsonify({'error': 'No transaction data provided'}), 400
+
+    try:
+        accounts_df = pd.DataFrame(accounts_data) if accounts_data else None
+        results = score_households(pd.DataFrame(transactions_data), accounts_df, data.get('profiles'))
+
+        return jsonify({
+            'households': [{'user_id': user_id, **result} for user_id, result in results.items()],
+            'analyzed_at': datetime.now().isoformat()
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Analysis error: {str(e)}'}), 500
+
+@app.route('/api/diagnosis/transactions/score', methods=['POST'])
+@login_required
+def score_transactions():
+    """
+    Score newly arriving transactions for unusual spending
+    Uses the user's per-category and per-merchant history, then adds the
+    transactions to it unless 'update' is false
+    """
+    data = request.get_json() or {}
+    transactions = data.get('transactions') or ([data['transaction']] if data.get('transaction') else [])
+    update = bool(data.get('update', True))
+    
+    if not transactions:
+        return jsonify({'error': 'No transaction data provided'}), 400
+    
+    try:
+        user_id = session['diagnosis_user_id']
+        store = get_anomaly_store()
+        with store.lock(user_id):
+            detector = store.load(user_id)
+            results = detector.observe_many(transactions, update=update)
+            if update:
+                store.save(user_id, detector)
+        
+        return jsonify({
+            'results': results,
+            'unusual_count': sum(1 for result in results if result['unusual']),
+            'scored_at': datetime.now().isoformat()
+        }), 200
+    
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid transaction: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Scoring error: {str(e)}'}), 500
+
 @app.route('/api/diagnosis/export-report', methods=['POST'])
 @login_required
 def export_report():
@@ -305,11 +460,15 @@ def get_history():
 @app.route('/api/diagnosis/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    parse_cache = get_parse_cache()
     return jsonify({
         'status': 'healthy',
         'service': 'Financial Diagnosis API',
         'version': '1.0.0',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'categorizer_cache': categorizer_cache_stats(),
+        'password_hashing': password_hashing_stats(),
+        'parse_cache': parse_cache.stats() if parse_cache else None
     }), 200
 
 if __name__ == '__main__':
@@ -0,0 +1,40 @@
+"""
+Tests for the Monte Carlo savings goal simulation
+"""
+
+import pandas as pd
+
+from financial_diagnosis.advanced_analytics import simulate_savings_goals
+
+
+def make_history(income, expense, months=12):
+    dates = pd.date_range('2024-01-01', periods=months, freq='MS').tolist()
+    return pd.DataFrame({
+        'date': dates * 2,
+        'amount': [income] * months + [expense] * months,
+        'type': ['income'] * months + ['expense'] * months,
+        'description': ['Salary'] * months + ['Rent'] * months,
+    })
+
+
+def test_unreachable_goal_with_deadline_beyond_horizon_fails():
+    history = make_history(income=100, expense=200)
+    goal = {'name': 'Unreachable', 'target': 1e9, 'deadline': '2045-01-01'}
+    result = simulate_savings_goals(history, 0, [goal], simulations=200, horizon_months=12, seed=1)[0]
+    assert result['success_probability'] == 0.0
+    assert result['completion_dates']['p50'] is None
+
+
+def test_goal_already_met_succeeds():
+    history = make_history(income=100, expense=200)
+    goal = {'name': 'Met', 'target': 500, 'deadline': '2045-01-01'}
+    result = simulate_savings_goals(history, 1000, [goal], simulations=200, horizon_months=12, seed=1)[0]
+    assert result['success_probability'] == 1.0
+
+
+def test_steady_saver_reaches_goal_within_horizon():
+    history = make_history(income=3000, expense=2000)
+    goal = {'name': 'Car', 'target': 5000}
+    result = simulate_savings_goals(history, 0, [goal], simulations=200, horizon_months=12, seed=1)[0]
+    assert result['success_probability'] == 1.0
+    assert result['success_curve'][4] == 1.0 and result['success_curve'][3] == 0.0
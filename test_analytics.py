@@ -0,0 +1,35 @@
+"""
+Tests for running analysis sections on the shared worker pool
+"""
+
+import pandas as pd
+
+from financial_diagnosis import analytics
+from financial_diagnosis.analytics import analyze_finances
+
+ACCOUNTS = pd.DataFrame({'name': ['Main'], 'balance': [5000.0], 'type': ['cash']})
+
+
+def make_transactions(months=6):
+    dates = pd.date_range('2024-01-01', periods=months, freq='MS').tolist()
+    return pd.DataFrame({
+        'date': dates * 3,
+        'amount': [2500.0] * months + [900.0] * months + [12.99] * months,
+        'type': ['income'] * months + ['expense'] * (2 * months),
+        'description': ['Salario Empresa'] * months + ['Renda Casa'] * months + ['Netflix.com'] * months,
+    })
+
+
+def test_parallel_sections_reuse_one_pool_and_match_serial():
+    df = make_transactions()
+    serial = analyze_finances(df, ACCOUNTS, workers=1)
+    first = analyze_finances(df, ACCOUNTS, workers=2, executor='thread')
+    pool = analytics._pools[('thread', 2)]
+    second = analyze_finances(df, ACCOUNTS, workers=2, executor='thread')
+    assert analytics._pools[('thread', 2)] is pool
+    for result in (first, second):
+        assert result.keys() == serial.keys()
+        for name in serial.keys() - {'section_timings', 'diagnostic_report'}:
+            assert str(result[name]) == str(serial[name]), name
+        report = dict(result['diagnostic_report'], timings=None)
+        assert str(report) == str(dict(serial['diagnostic_report'], timings=None))
@@ -0,0 +1,73 @@
+"""
+Tests for batch scoring of many households
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from financial_diagnosis.batch import score_households
+from financial_diagnosis.categorizer import get_categorizer
+from financial_diagnosis.diagnostic_engine import FinancialDiagnostics
+from financial_diagnosis.prepared import PreparedTransactions
+
+DESCRIPTIONS = [
+    'COMPRA LIDL LISBOA', 'Renda Casa', 'EDP Comercial', 'Mortgage Payment', 'Car Insurance Premium',
+    'VISA Credit Card', 'Netflix.com', 'Galp Energia', 'IRS Pagamento', 'Transferencia Poupanca',
+    'Farmacia Central',
+]
+
+
+def make_households(n_users=12, rows_per_user=60, seed=3):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for user in range(n_users):
+        months = int(rng.integers(1, 8))
+        dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 30 * months, rows_per_user), unit='D')
+        # Users draw from different subsets of merchants, so diagnostics differ
+        merchants = rng.choice(DESCRIPTIONS, size=int(rng.integers(2, len(DESCRIPTIONS))), replace=False)
+        frame = pd.DataFrame({
+            'user_id': user,
+            'date': dates,
+            'description': rng.choice(merchants, rows_per_user),
+            'amount': rng.gamma(2.0, 40.0, rows_per_user).round(2),
+            'type': 'expense',
+        })
+        if user % 4:
+            # Every fourth user has no income
+            salaries = pd.DataFrame({
+                'user_id': user,
+                'date': pd.date_range('2024-01-01', periods=months, freq='MS'),
+                'description': 'Salario Empresa',
+                'amount': float(rng.integers(800, 4000)),
+                'type': 'income',
+            })
+            frame = pd.concat([frame, salaries], ignore_index=True)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_batch_scores_match_per_user_diagnostics():
+    df = make_households()
+    accounts = pd.DataFrame({'user_id': np.arange(12), 'balance': np.linspace(0, 20000, 12)})
+    profiles = {1: {'goals': [{'name': 'Car', 'target': 5000}]}}
+    batch = score_households(df, accounts, profiles)
+
+    categorized = get_categorizer().categorize_dataframe(df)
+    for user, rows in categorized.groupby('user_id', sort=False):
+        report = FinancialDiagnostics(
+            PreparedTransactions.from_frame(rows.drop(columns='user_id')),
+            accounts[accounts['user_id'] == user].drop(columns='user_id'),
+            profiles.get(user)
+        ).run_full_diagnostic()
+        result = batch[user]
+        assert result['overall_score'] == report['overall_score'], user
+        assert result['grade'] == report['grade'], user
+        for name, diagnostic in result['diagnostics'].items():
+            assert diagnostic['score'] == pytest.approx(report['diagnostics'][name]['score']), (user, name)
+            assert diagnostic['status'] == report['diagnostics'][name]['status'], (user, name)
+
+
+def test_requires_user_id():
+    with pytest.raises(ValueError):
+        score_households(pd.DataFrame({'date': [], 'amount': [], 'type': []}))
@@ -0,0 +1,60 @@
+"""
+Tests for the combined-pattern categorizer and its description cache
+"""
+
+import numpy as np
+import pandas as pd
+
+from financial_diagnosis.categorizer import CategoryCache, PortugueseTransactionCategorizer
+
+
+def make_descriptions(categorizer, seed=0):
+    """Every keyword alone, in context, upper-cased and paired with another keyword"""
+    rng = np.random.default_rng(seed)
+    keywords = [keyword for keywords in categorizer.CATEGORY_KEYWORDS.values() for keyword in keywords]
+    descriptions = []
+    for keyword in keywords:
+        other = keywords[rng.integers(len(keywords))]
+        descriptions += [
+            keyword,
+            f'COMPRA {keyword.upper()}  LISBOA 1234',
+            f'{other} {keyword}',
+            f'{keyword}x',  # not a whole word
+        ]
+    return descriptions + ['', '   ', 'no keyword here', None, np.nan]
+
+
+def test_combined_pattern_matches_per_row_categorization():
+    categorizer = PortugueseTransactionCategorizer()
+    descriptions = make_descriptions(categorizer)
+    df = pd.DataFrame({'description': descriptions, 'category': ['Existing'] * len(descriptions)})
+    result = categorizer.categorize_dataframe(df)
+    expected = [categorizer.categorize_transaction(description, 'Existing') for description in descriptions]
+    assert result['category'].tolist() == expected
+
+
+def test_small_cache_gives_same_categories():
+    uncached = PortugueseTransactionCategorizer()
+    cached = PortugueseTransactionCategorizer(cache=CategoryCache(max_size=10))
+    descriptions = pd.Series(make_descriptions(uncached))
+    expected = uncached.match_categories(descriptions).tolist()
+    # Second pass runs against a cache that evicted most entries
+    assert cached.match_categories(descriptions).tolist() == expected
+    assert cached.match_categories(descriptions).tolist() == expected
+    stats = cached.cache.stats()
+    assert stats['size'] == 10
+    assert stats['evictions'] > 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = CategoryCache(max_size=2)
+    cache.put_many({'lidl': 'Groceries', 'edp': 'Utilities'})
+    cache.get_many(['lidl'])
+    cache.put_many({'galp': 'Transport'})
+    found, missing = cache.get_many(['lidl', 'edp', 'galp'])
+    assert found == {'lidl': 'Groceries', 'galp': 'Transport'}
+    assert missing == ['edp']
+    assert cache.stats()['evictions'] == 1
+
+    cache.clear()
+    assert cache.stats() == {'size': 0, 'max_size': 2, 'hits': 0, 'misses': 0, 'evictions': 0, 'hit_rate': 0.0}
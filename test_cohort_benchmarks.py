@@ -0,0 +1,110 @@
+"""
+Tests for the peer benchmark store and its use in the analysis
+"""
+
+import pickle
+
+import pandas as pd
+import pytest
+
+from financial_diagnosis.analytics import DEFAULT_AGE_GROUP_AVERAGE, analyze_finances
+from financial_diagnosis.cohort_benchmarks import UNKNOWN, BenchmarkStore
+
+COHORT = {'age_band': '25-34', 'income_band': '2000-3000', 'household': 'single'}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BenchmarkStore(str(tmp_path / 'benchmarks.db'), refresh_batch=1000, min_cohort_size=3, salt='test')
+
+
+def make_transactions():
+    dates = pd.date_range('2024-01-01', periods=6, freq='MS').tolist()
+    return pd.DataFrame({
+        'date': dates * 2,
+        'amount': [2500.0] * 6 + [2000.0] * 6,
+        'type': ['income'] * 6 + ['expense'] * 6,
+        'description': ['Salary'] * 6 + ['Rent'] * 6,
+    })
+
+
+ACCOUNTS = pd.DataFrame({'name': ['Main'], 'balance': [5000.0], 'type': ['cash']})
+
+
+def test_percentile_within_cohort(store):
+    store.record_many((f'user{i}', COHORT, {'savings_rate': float(i)}) for i in range(10))
+    store.refresh()
+    result = store.percentile(COHORT, 'savings_rate', 4.5)
+    assert result['cohort_size'] == 10
+    assert result['percentile'] == pytest.approx(50, abs=1)
+    assert result['mean'] == pytest.approx(4.5)
+
+
+def test_single_user_is_not_exposed(store):
+    # One user is below min_cohort_size at every level, including the global table
+    store.record('only-user', COHORT, {'savings_rate': 37.5})
+    store.refresh()
+    result = store.percentile(COHORT, 'savings_rate', 10.0)
+    assert result == {'percentile': None, 'cohort': None, 'cohort_size': 0, 'median': None, 'mean': None}
+
+
+def test_falls_back_to_broader_cohort_with_enough_users(store):
+    couple = dict(COHORT, household='couple')
+    store.record_many([('a', COHORT, {'savings_rate': 1.0}), ('b', couple, {'savings_rate': 2.0}),
+                       ('c', couple, {'savings_rate': 3.0})])
+    store.refresh()
+    result = store.percentile(COHORT, 'savings_rate', 2.0)
+    assert result['cohort'] == 'age_band=25-34|income_band=2000-3000'
+    assert result['cohort_size'] == 3
+
+
+def test_pending_records_survive_restart(tmp_path):
+    path = str(tmp_path / 'benchmarks.db')
+    first = BenchmarkStore(path, refresh_batch=4, min_cohort_size=1, salt='test')
+    first.record_many((f'user{i}', COHORT, {'savings_rate': float(i)}) for i in range(3))
+    assert first.pending == 3
+
+    # A new store on the same file (a restart or another worker) carries on counting
+    second = BenchmarkStore(path, refresh_batch=4, min_cohort_size=1, salt='test')
+    assert second.percentile(COHORT, 'savings_rate', 1.0)['percentile'] is None
+    second.record('user3', COHORT, {'savings_rate': 3.0})
+    assert second.pending == 0
+    assert second.percentile(COHORT, 'savings_rate', 1.0)['cohort_size'] == 4
+
+
+def test_refresh_by_another_store_is_picked_up(tmp_path):
+    path = str(tmp_path / 'benchmarks.db')
+    reader = BenchmarkStore(path, min_cohort_size=1, salt='test', reload_interval=0)
+    assert reader.percentile(COHORT, 'savings_rate', 1.0)['percentile'] is None
+
+    writer = BenchmarkStore(path, min_cohort_size=1, salt='test')
+    writer.record_many((f'user{i}', COHORT, {'savings_rate': float(i)}) for i in range(3))
+    writer.refresh()
+    assert reader.percentile(COHORT, 'savings_rate', 1.0)['cohort_size'] == 3
+
+
+def test_salt_is_required(tmp_path, monkeypatch):
+    monkeypatch.delenv('BENCHMARK_SALT', raising=False)
+    with pytest.raises(ValueError):
+        BenchmarkStore(str(tmp_path / 'benchmarks.db'))
+
+
+def test_analysis_without_store_uses_default_average():
+    result = analyze_finances(make_transactions(), ACCOUNTS, sections=['benchmarks'])
+    assert result['benchmarks'] == {'your_savings_rate': 20.0, 'age_group_average': DEFAULT_AGE_GROUP_AVERAGE}
+
+
+def test_analysis_with_store_ranks_against_peers(store):
+    cohort = {'age_band': UNKNOWN, 'income_band': '2000-3000', 'household': UNKNOWN}
+    store.record_many((f'user{i}', cohort, {'savings_rate': 10.0 + 2 * i}) for i in range(5))
+    store.refresh()
+    result = analyze_finances(make_transactions(), ACCOUNTS, sections=['benchmarks'], benchmark_store=store)
+    assert result['benchmarks']['peer_count'] == 5
+    assert result['benchmarks']['age_group_average'] == pytest.approx(14.0)
+
+
+def test_store_pickles_for_process_executor(store):
+    copy = pickle.loads(pickle.dumps(store))
+    assert copy.db_path == store.db_path
+    assert copy.percentile(COHORT, 'savings_rate', 1.0)['percentile'] is None
+
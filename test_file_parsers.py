@@ -0,0 +1,165 @@
+"""
+Tests for PDF statement parsing and the parse cache
+"""
+
+import os
+import re
+import time
+
+import pandas as pd
+import pytest
+
+from financial_diagnosis import bank_formats, file_parsers, parse_cache
+from financial_diagnosis.bank_formats import BankFormat
+from financial_diagnosis.parse_cache import ParseCache
+
+
+def make_pdf(pages):
+    """Minimal PDF with one line of Helvetica text per entry of each page's list"""
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [%s] /Count %d >>' % (' '.join(f'{4 + 2 * i} 0 R' for i in range(len(pages))),
+                                                     len(pages)),
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for i, lines in enumerate(pages):
+        stream = 'BT /F1 10 Tf 50 750 Td 14 TL ' + ' '.join(f'({line}) Tj T*' for line in lines) + ' ET'
+        objects.append('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>')
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+
+    pdf = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f'{number} 0 obj\n{body}\nendobj\n'.encode()
+    xref = len(pdf)
+    pdf += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    pdf += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+    pdf += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return pdf
+
+
+class PlainTextFormat(BankFormat):
+    """Lines of "YYYY-MM-DD description amount" under a PLAINBANK header"""
+
+    name = 'plain'
+    LINE = re.compile(r'^(\d{4}-\d{2}-\d{2}) (.+) (-?\d+\.\d{2})$')
+
+    def matches(self, first_page_text):
+        return 'PLAINBANK' in first_page_text
+
+    def parse_lines(self, lines):
+        for line in lines:
+            match = self.LINE.match(line)
+            if match:
+                amount = float(match.group(3))
+                yield {'date': match.group(1), 'description': match.group(2), 'amount': abs(amount),
+                       'type': 'income' if amount > 0 else 'expense', 'category': 'Other'}
+
+
+STATEMENT = make_pdf([
+    ['PLAINBANK statement', '2024-01-01 Salary 2500.00', '2024-01-03 Rent -900.00'],
+    ['2024-01-05 Groceries -54.20', 'Checking Balance: 1,545.80'],
+])
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(bank_formats, 'BANK_FORMATS', [PlainTextFormat()])
+    cache = ParseCache(str(tmp_path / 'cache'))
+    monkeypatch.setattr(parse_cache, '_default_cache', cache)
+    return cache
+
+
+def test_statement_is_extracted_once_for_both_frames(cache, monkeypatch):
+    calls = []
+    extract = file_parsers.extract_pdf_pages
+
+    def counting_extract(*args, **kwargs):
+        calls.append(args)
+        return extract(*args, **kwargs)
+
+    monkeypatch.setattr(file_parsers, 'extract_pdf_pages', counting_extract)
+
+    transactions = file_parsers.parse_file(STATEMENT, 'statement.pdf')
+    accounts = file_parsers.parse_file(STATEMENT, 'statement.pdf', file_type='accounts')
+    assert len(calls) == 1
+    assert transactions['amount'].tolist() == [2500.0, 900.0, 54.2]
+    assert accounts['balance'].tolist() == [1545.8]
+    assert cache.stats()['hits'] == 1
+
+
+def test_pdf_without_transactions_still_parses_accounts(cache):
+    pdf = make_pdf([['Checking Balance: 100.00']])
+    assert file_parsers.parse_file(pdf, 'balances.pdf', file_type='accounts')['balance'].tolist() == [100.0]
+    with pytest.raises(ValueError):
+        file_parsers.parse_file(pdf, 'balances.pdf')
+
+
+def test_matched_format_without_rows_falls_back_to_tables(cache, monkeypatch):
+    row = {'date': '2024-01-02', 'description': 'Lidl', 'amount': 5.0, 'type': 'expense', 'category': 'Other'}
+    monkeypatch.setattr(file_parsers, '_transactions_from_tables', lambda tables: [row])
+    pdf = make_pdf([['PLAINBANK statement', 'A layout the format does not know']])
+    assert file_parsers.parse_file(pdf, 'other.pdf')['description'].tolist() == ['Lidl']
+    assert file_parsers.parse_pdf_transactions(pdf)['description'].tolist() == ['Lidl']
+
+
+def test_unreadable_pdf_is_not_parsed_twice(cache, monkeypatch):
+    monkeypatch.setattr(file_parsers, '_parse_uncached', lambda *args: pytest.fail('parsed twice'))
+    with pytest.raises(ValueError, match='Error parsing broken.pdf'):
+        file_parsers.parse_file(b'not a pdf', 'broken.pdf')
+
+
+def test_parallel_extraction_reuses_the_worker_pool():
+    pdf = make_pdf([[f'Page {i}'] for i in range(4)])
+    first = file_parsers.extract_pdf_pages(pdf, workers=2, chunk_size=1, tables=False)
+    pool = file_parsers._pdf_pools[2]
+    second = file_parsers.extract_pdf_pages(pdf, workers=2, chunk_size=1, tables=False)
+    assert file_parsers._pdf_pools[2] is pool
+    assert [page['text'] for page in first] == [page['text'] for page in second] == [f'Page {i}' for i in range(4)]
+
+
+def test_parse_cache_evicts_least_recently_used(tmp_path):
+    frames = {name: pd.DataFrame({'amount': [float(i) for i in range(100)], 'name': name}) for name in 'abc'}
+    cache = ParseCache(str(tmp_path))
+    for name, df in frames.items():
+        cache.put(name, df)
+    entry_size = cache.stats()['size_bytes'] // 3
+    os.utime(cache._path('a'), (time.time() - 60, time.time() - 60))
+    os.utime(cache._path('b'), (time.time() - 30, time.time() - 30))
+    cache.get('a')  # a hit makes 'a' the most recently used
+
+    cache.max_bytes = 2 * entry_size
+    cache.put('c', frames['c'])
+    assert cache.get('b') is None
+    assert cache.get('a').equals(frames['a'])
+    assert cache.stats()['evictions'] == 1
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path))
+
+    def failing_new_file(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(parse_cache.pa.ipc, 'new_file', failing_new_file)
+    with pytest.raises(OSError):
+        cache.put('a', pd.DataFrame({'amount': [1.0]}))
+    assert [path.name for path in tmp_path.iterdir()] == ['owners']
+
+
+def test_parser_version_is_part_of_the_key():
+    assert ParseCache.key(b'x', 'a.csv', 'transactions', 1) != ParseCache.key(b'x', 'a.csv', 'transactions', 2)
+    assert ParseCache.key(b'x', 'a.csv', 'transactions', 1) != ParseCache.key(b'x', 'a.txt', 'transactions', 1)
+
+
+def test_purge_owner_deletes_only_their_entries(cache):
+    file_parsers.parse_file(b'date,description,amount\n2024-01-01,Lidl,-5.00\n', 'a.csv', owner=1)
+    file_parsers.parse_file(b'date,description,amount\n2024-01-02,Galp,-40.00\n', 'b.csv', owner=2)
+    # A hit on another user's upload records it for them too
+    file_parsers.parse_file(b'date,description,amount\n2024-01-02,Galp,-40.00\n', 'b.csv', owner=1)
+    assert cache.purge_owner(1) == 2
+    assert cache.stats()['entries'] == 0
+    assert cache.purge_owner(1) == 0
+    assert cache.purge_owner(2) == 0
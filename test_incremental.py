@@ -0,0 +1,100 @@
+"""
+Tests for incremental analysis state
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from financial_diagnosis.analytics import analyze_finances
+from financial_diagnosis.incremental import INCREMENTAL_SECTIONS, AnalysisState
+
+ACCOUNTS = pd.DataFrame({'name': ['Main'], 'balance': [5000.0], 'type': ['cash']})
+
+TOTALS = ['total_income', 'total_expenses', 'net_savings', 'savings_rate']
+SECTIONS = ['charts', 'monthly_trends', 'category_trends', 'recurring_transactions', 'unusual_transactions']
+
+
+def make_history(months=6, seed=7):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for start in pd.date_range('2024-01-01', periods=months, freq='MS'):
+        rows.append((start, 'Salario Empresa', 2500.0, 'income'))
+        rows.append((start + pd.Timedelta(days=2), 'Renda Casa', 900.0, 'expense'))
+        rows.append((start + pd.Timedelta(days=9), 'Netflix.com', 12.99, 'expense'))
+        for day in rng.integers(0, 28, 12):
+            rows.append((start + pd.Timedelta(days=int(day)), f'COMPRA LIDL LISBOA {rng.integers(1000)}',
+                         round(float(rng.gamma(2.0, 20.0)), 2), 'expense'))
+    # One unusually large expense
+    rows.append((pd.Timestamp('2024-01-15'), 'Continente', 950.0, 'expense'))
+    return (pd.DataFrame(rows, columns=['date', 'description', 'amount', 'type'])
+            .sort_values('date', kind='stable').reset_index(drop=True))
+
+
+def statements(df):
+    month = df['date'].dt.to_period('M')
+    return [df[month == period].reset_index(drop=True) for period in month.unique()]
+
+
+def assert_same(full, incremental):
+    for total in TOTALS:
+        assert incremental[total] == pytest.approx(full[total]), total
+    for section in SECTIONS:
+        assert incremental[section] == full[section], section
+
+
+def test_monthly_statements_match_full_analysis():
+    df = make_history()
+    full = analyze_finances(df, ACCOUNTS, sections=INCREMENTAL_SECTIONS + ['recurring_transactions',
+                                                                          'unusual_transactions'])
+    state = AnalysisState()
+    for statement in statements(df):
+        # Persist between statements, as the API does
+        state = AnalysisState.from_dict(state.to_dict())
+        state.append(statement)
+    assert state.rows == len(df)
+    assert_same(full, state.analyze(ACCOUNTS))
+
+
+def test_reuploaded_statement_is_not_counted_twice():
+    df = make_history(months=2)
+    first, second = statements(df)
+    state = AnalysisState()
+    state.append(first)
+    state.append(second)
+    before = state.analyze(ACCOUNTS)
+
+    state = AnalysisState.from_dict(state.to_dict())
+    assert state.append(second) == 0
+    assert state.rows == len(df)
+    assert_same(before, state.analyze(ACCOUNTS))
+
+
+def test_overlapping_statement_adds_only_new_rows():
+    df = make_history(months=2)
+    first, second = statements(df)
+    overlapping = pd.concat([first.tail(5), second], ignore_index=True)
+    state = AnalysisState()
+    state.append(first)
+    assert state.append(overlapping) == len(second)
+    assert state.rows == len(df)
+
+
+def test_identical_rows_within_a_statement_are_kept():
+    purchase = {'date': '2024-01-05', 'description': 'Cafe', 'amount': 1.2, 'type': 'expense'}
+    state = AnalysisState()
+    assert state.append(pd.DataFrame([purchase, purchase])) == 2
+    # A later statement repeating both, plus a third identical purchase
+    assert state.append(pd.DataFrame([purchase] * 3)) == 1
+    assert state.rows == 3
+
+
+def test_rows_before_the_overlap_window_are_skipped():
+    df = make_history(months=3)
+    state = AnalysisState()
+    for statement in statements(df):
+        state.append(statement)
+    state = AnalysisState.from_dict(state.to_dict())
+    assert state.append(df) == 0
+    assert state.rows == len(df)
+    assert len(state.recent) < len(df)
@@ -0,0 +1,38 @@
+"""
+Tests for merchant key normalization
+"""
+
+import numpy as np
+import pandas as pd
+
+from financial_diagnosis.diagnostic_engine import FinancialDiagnostics
+from financial_diagnosis.merchants import merchant_keys
+
+
+def test_variants_share_a_key_and_match_single_lookup():
+    descriptions = pd.Series(['COMPRA LIDL LISBOA 4411', 'Lidl Porto', None, 'Netflix.com REF123'])
+    keys = merchant_keys(descriptions)
+    assert keys.iloc[0] == keys.iloc[1] == 'lidl'
+    assert pd.isna(keys.iloc[2])
+    assert keys.iloc[3] == 'netflix com'
+    assert keys.iloc[3] == merchant_keys(descriptions.iloc[3:]).iloc[0]
+
+
+def test_all_missing_or_empty_input():
+    missing = merchant_keys(pd.Series([np.nan, None], index=[5, 6]))
+    assert missing.index.tolist() == [5, 6]
+    assert missing.isna().all()
+    assert len(merchant_keys(pd.Series([], dtype=object))) == 0
+
+
+def test_income_diagnostic_without_descriptions():
+    transactions = pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=4, freq='MS'),
+        'amount': [2500.0, 2500.0, 800.0, 900.0],
+        'type': ['income', 'income', 'expense', 'expense'],
+        'description': [None, None, 'Rent', 'Rent'],
+    })
+    accounts = pd.DataFrame({'balance': [1000.0]})
+    report = FinancialDiagnostics(transactions, accounts).run_full_diagnostic()
+    assert 'error' not in report['diagnostics']['income']
+    assert report['diagnostics']['income']['sources'] == 0
@@ -0,0 +1,55 @@
+"""
+Tests for online anomaly scoring of incoming transactions
+"""
+
+import pandas as pd
+
+from financial_diagnosis.categorizer import get_categorizer
+from financial_diagnosis.merchants import merchant_keys
+from financial_diagnosis.online_anomaly import AnomalyStateStore, OnlineAnomalyDetector
+
+TRANSACTIONS = [
+    {'amount': 30.0, 'type': 'expense', 'description': 'COMPRA LIDL LISBOA 1234'},
+    {'amount': 35.0, 'type': 'expense', 'description': 'Lidl Porto'},
+    {'amount': 32.0, 'type': 'expense', 'description': 'LIDL 0042'},
+    {'amount': 300.0, 'type': 'expense', 'description': 'LIDL 9981'},
+    {'amount': 10.0, 'type': 'expense', 'description': None, 'category': 'Food'},
+    {'amount': 50.0, 'type': 'expense', 'description': 'xyzzy', 'category': 'Custom'},
+    {'amount': 2500.0, 'type': 'income', 'description': 'Salary'},
+]
+
+
+def test_batch_matches_one_at_a_time():
+    batch = OnlineAnomalyDetector().observe_many(TRANSACTIONS)
+    single = OnlineAnomalyDetector()
+    assert batch == [single.observe(transaction) for transaction in TRANSACTIONS]
+    assert [result['unusual'] for result in batch] == [False, False, False, True, False, False, False]
+
+
+def test_keys_match_per_row_categorizer():
+    categorizer = get_categorizer()
+    for transaction, result in zip(TRANSACTIONS, OnlineAnomalyDetector().observe_many(TRANSACTIONS)):
+        description = transaction.get('description')
+        assert result['category'] == categorizer.categorize_transaction(
+            description, transaction.get('category') or 'Uncategorized')
+        merchant = merchant_keys(pd.Series([description], dtype=object)).iloc[0]
+        assert result['merchant'] == (merchant if pd.notna(merchant) else None)
+
+
+def test_least_recently_observed_merchants_are_dropped():
+    detector = OnlineAnomalyDetector(max_merchants=2)
+    detector.observe_many([{'amount': 5.0, 'type': 'expense', 'description': name}
+                           for name in ('Lidl', 'Galp', 'Lidl', 'Zara')])
+    assert list(detector.profiles['merchant']) == ['lidl', 'zara']
+    restored = OnlineAnomalyDetector.from_dict(detector.to_dict())
+    assert list(restored.profiles['merchant']) == ['lidl', 'zara']
+    assert restored.max_merchants == 2
+
+
+def test_state_round_trip(tmp_path):
+    store = AnomalyStateStore(str(tmp_path))
+    detector = OnlineAnomalyDetector()
+    detector.observe_many(TRANSACTIONS[:3])
+    store.save('user-1', detector)
+    assert store.load('user-1').to_dict() == detector.to_dict()
+    assert [path.name for path in tmp_path.iterdir()] == ['user-1.json']
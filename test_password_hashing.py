@@ -0,0 +1,67 @@
+"""
+Tests for the bounded password hashing pool and its HTTP 429 back-pressure
+"""
+
+import asyncio
+import importlib
+import threading
+
+import pytest
+
+from financial_diagnosis import password_hashing
+from financial_diagnosis.password_hashing import PasswordHashingBusy, PasswordHashingPool
+
+
+@pytest.fixture
+def blocked_pool():
+    """A one-worker pool without a queue whose worker is kept busy"""
+    pool = PasswordHashingPool(workers=1, max_queue=0)
+    release = threading.Event()
+    pool.submit(release.wait)
+    yield pool
+    release.set()
+    pool.shutdown()
+
+
+def test_pool_rejects_when_saturated(blocked_pool):
+    with pytest.raises(PasswordHashingBusy):
+        blocked_pool.hash('secret')
+    stats = blocked_pool.stats()
+    assert stats['rejected'] == 1
+    assert stats['in_flight'] == 1
+
+
+def test_pool_hashes_and_checks():
+    pool = PasswordHashingPool(workers=1, max_queue=1)
+    password_hash = pool.hash('secret')
+    assert pool.check(password_hash, 'secret')
+    assert not pool.check(password_hash, 'wrong')
+    assert pool.stats()['completed'] == 3
+    pool.shutdown()
+
+
+def test_async_check():
+    pool = PasswordHashingPool(workers=1, max_queue=1)
+    password_hash = pool.hash('secret')
+    assert asyncio.run(pool.check_async(password_hash, 'secret'))
+    pool.shutdown()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('DIAGNOSIS_DB_PATH', str(tmp_path / 'users.db'))
+    api = importlib.import_module('financial_diagnosis_api')
+    api = importlib.reload(api)
+    return api.app.test_client()
+
+
+def test_login_returns_429_when_hashing_pool_is_full(client, blocked_pool, monkeypatch):
+    # Logging in the demo user created by init_db checks its password on the process-wide pool
+    monkeypatch.setattr(password_hashing, '_default_pool', blocked_pool)
+    response = client.post('/api/diagnosis/login', json={'email': 'demo@example.com', 'password': 'Demo123!'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+
+    health = client.get('/api/diagnosis/health').get_json()
+    assert health['password_hashing']['rejected'] == 1
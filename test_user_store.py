@@ -0,0 +1,120 @@
+"""
+Tests for the user record cache and its invalidation by writes
+"""
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from financial_diagnosis import cohort_benchmarks, incremental, online_anomaly, parse_cache, user_store
+from financial_diagnosis.cohort_benchmarks import BenchmarkStore
+from financial_diagnosis.incremental import AnalysisState, AnalysisStateStore
+from financial_diagnosis.online_anomaly import AnomalyStateStore, OnlineAnomalyDetector
+from financial_diagnosis.parse_cache import ParseCache
+from financial_diagnosis.user_store import UserCache
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_store, 'DB_PATH', str(tmp_path / 'users.db'))
+    monkeypatch.setattr(parse_cache, '_default_cache', ParseCache(str(tmp_path / 'parse_cache')))
+    monkeypatch.setattr(online_anomaly, '_default_store', AnomalyStateStore(str(tmp_path / 'anomaly_state')))
+    monkeypatch.setattr(incremental, '_default_store', AnalysisStateStore(str(tmp_path / 'analysis_state')))
+    monkeypatch.setenv('BENCHMARK_DB_PATH', str(tmp_path / 'benchmarks.db'))
+    monkeypatch.setattr(cohort_benchmarks, '_default_store', BenchmarkStore(str(tmp_path / 'benchmarks.db'), salt='s'))
+    monkeypatch.setattr(user_store, 'user_cache', UserCache(ttl=60, max_size=100))
+    user_store.init_db()
+    yield user_store
+    user_store.close_connection()
+
+
+def test_cache_evicts_least_recently_used():
+    cache = UserCache(ttl=60, max_size=2)
+    cache.put('a', {'id': 1}, cache.version)
+    cache.put('b', {'id': 2}, cache.version)
+    cache.get('a')
+    cache.put('c', {'id': 3}, cache.version)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, {'id': 1})
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(user_store.time, 'monotonic', lambda: now[0])
+    cache = UserCache(ttl=30, max_size=10)
+    cache.put('a', None, cache.version)
+    assert cache.get('a') == (True, None)
+    now[0] += 31
+    assert cache.get('a') == (False, None)
+
+
+def test_lookup_started_before_invalidation_is_not_stored():
+    cache = UserCache(ttl=60, max_size=10)
+    version = cache.version
+    cache.invalidate('a')
+    cache.put('a', {'paid': 0}, version)
+    assert cache.get('a') == (False, None)
+
+
+def test_writes_invalidate_cached_users(store):
+    assert store.get_user_by_email('new@example.com') is None
+    store.create_user('new@example.com', 'secret')
+    assert not store.has_paid('new@example.com')
+
+    store.mark_paid('new@example.com')
+    assert store.has_paid('new@example.com')
+
+    store.create_admin('new@example.com', 'other')
+    assert store.is_admin('new@example.com')
+
+    store.delete_user_account('new@example.com')
+    assert store.get_user_by_email('new@example.com') is None
+    assert store.user_cache.stats()['hits'] > 0
+
+
+def test_writes_by_another_worker_are_seen(store):
+    assert store.has_paid('demo@example.com')
+    # Another process writing through its own connection
+    conn = sqlite3.connect(store.DB_PATH)
+    with conn:
+        conn.execute("UPDATE users SET paid = 0 WHERE email = 'demo@example.com'")
+    assert not store.has_paid('demo@example.com')
+    with conn:
+        conn.execute("DELETE FROM users WHERE email = 'demo@example.com'")
+    conn.close()
+    assert store.get_user_by_email('demo@example.com') is None
+
+
+def test_cached_user_is_a_copy(store):
+    user = store.get_user_by_email('demo@example.com')
+    user['paid'] = 0
+    assert store.has_paid('demo@example.com')
+
+
+def test_delete_purges_stored_user_data(store):
+    store.create_user('gone@example.com', 'secret')
+    user_id = store.get_user_by_email('gone@example.com')['id']
+    cache = parse_cache.get_parse_cache()
+    cache.put('statement', pd.DataFrame({'amount': [1.0]}), owner=user_id)
+    detector = OnlineAnomalyDetector()
+    detector.observe({'amount': 12.5, 'type': 'expense', 'description': 'Lidl'})
+    online_anomaly.get_anomaly_store().save(user_id, detector)
+    state = AnalysisState()
+    state.append(pd.DataFrame({'date': ['2024-01-05'], 'description': ['Lidl'], 'amount': [12.5],
+                               'type': ['expense']}))
+    incremental.get_analysis_store().save(user_id, state)
+    cohort = cohort_benchmarks.cohort_for({'age': 30}, 1500)
+    cohort_benchmarks.get_benchmark_store().record(user_id, cohort, {'savings_rate': 12.0})
+
+    exported = store.export_user_data('gone@example.com')
+    assert exported['anomaly_state'] == detector.to_dict()
+    assert exported['analysis_state']['cube']['rows'] == 1
+    assert exported['benchmark_metrics'] == {'cohort': cohort, 'metrics': {'savings_rate': 12.0}}
+
+    store.delete_user_account('gone@example.com')
+    assert cache.get('statement') is None
+    assert online_anomaly.get_anomaly_store().load_dict(user_id) is None
+    assert incremental.get_analysis_store().load_dict(user_id) is None
+    assert cohort_benchmarks.get_benchmark_store().user_metrics(user_id) is None